@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BaristaAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'barista_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401 — сводные таблицы продаж
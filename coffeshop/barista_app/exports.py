@@ -0,0 +1,145 @@
+"""
+Потоковая выгрузка заказов для бухгалтерии (CSV / JSONL, опционально gzip).
+
+Заказы читаются keyset-чанками по id из живой и архивной таблиц и
+сливаются по id; позиции подтягиваются одним запросом на чанк. В памяти
+одновременно живёт не больше одного чанка на таблицу, поэтому расход
+памяти не зависит от размера выгрузки.
+"""
+import csv
+import datetime
+import heapq
+import json
+import zlib
+from decimal import Decimal
+
+from django.utils import timezone
+
+from bot.archive import ORDER_SOURCES
+from .reports import local_midnight
+
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+
+ORDER_FIELDS = (
+    'id', 'created_at', 'status', 'channel', 'order_type', 'address', 'total_price',
+    'customer_id', 'customer__name', 'customer__phone',
+    'customer__telegram_user__chat_id', 'customer__user__username',
+)
+
+CSV_HEADER = (
+    'order_id', 'created_at', 'status', 'channel', 'order_type', 'address', 'total_price',
+    'customer_id', 'customer_name', 'customer_phone', 'telegram_chat_id', 'username',
+    'item_id', 'item_name', 'quantity', 'price',
+)
+
+
+def order_querysets(since=None, until=None, status=None):
+    """Выборки заказов из живой и архивной таблиц; since/until — локальные даты, включительно"""
+    querysets = []
+    for model in ORDER_SOURCES:
+        queryset = model.objects.all()
+        if since:
+            queryset = queryset.filter(created_at__gte=local_midnight(since))
+        if until:
+            queryset = queryset.filter(created_at__lt=local_midnight(until + datetime.timedelta(days=1)))
+        if status:
+            queryset = queryset.filter(status=status)
+        querysets.append(queryset)
+    return querysets
+
+
+def iter_orders(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Словари заказов с ключом items; keyset-проход по id"""
+    last_id = 0
+    while True:
+        chunk = list(
+            queryset.filter(id__gt=last_id).order_by('id').values(*ORDER_FIELDS)[:chunk_size]
+            .iterator(chunk_size=chunk_size)
+        )
+        if not chunk:
+            return
+        items = {}
+        line_model, price_field = ORDER_SOURCES[queryset.model]
+        lines = line_model.objects.using(queryset.db).filter(order_id__in=[order['id'] for order in chunk]).order_by('id').values_list(
+            'order_id', 'item_id', 'item__name', 'quantity', price_field
+        )
+        for order_id, item_id, name, quantity, price in lines.iterator(chunk_size=chunk_size):
+            items.setdefault(order_id, []).append(
+                {'item_id': item_id, 'name': name, 'quantity': quantity, 'price': price}
+            )
+        for order in chunk:
+            order['created_at'] = timezone.localtime(order['created_at'])
+            order['items'] = items.get(order['id'], [])
+            yield order
+        last_id = chunk[-1]['id']
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: write() возвращает строку, а не пишет её"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in orders:
+        head = [order[field] for field in ORDER_FIELDS]
+        head[1] = order['created_at'].isoformat()
+        # Одна строка на позицию заказа; заказ без позиций — одна строка с пустыми полями
+        for line in order['items'] or [None]:
+            tail = [line['item_id'], line['name'], line['quantity'], line['price']] if line else ['', '', '', '']
+            yield writer.writerow(head + tail)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def jsonl_lines(orders):
+    for order in orders:
+        yield json.dumps(order, ensure_ascii=False, default=_json_default) + '\n'
+
+
+def encode(lines, compress=False, buffer_size=64 * 1024):
+    """Строки -> чанки байт примерно по buffer_size; compress — gzip-поток через zlib"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            block = b''.join(buffer)
+            buffer, size = [], 0
+            if compressor:
+                block = compressor.compress(block)
+            if block:
+                yield block
+    block = b''.join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
+
+
+def export(querysets, fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Генератор байт выгрузки в формате fmt; заказы из всех выборок — по возрастанию id"""
+    orders = heapq.merge(*(iter_orders(queryset, chunk_size) for queryset in querysets), key=lambda o: o['id'])
+    lines = csv_lines(orders) if fmt == 'csv' else jsonl_lines(orders)
+    return encode(lines, compress)
+
+
+def filename(fmt, compress, since=None, until=None):
+    parts = ['orders']
+    if since:
+        parts.append(since.isoformat())
+    if until:
+        parts.append(until.isoformat())
+    return '_'.join(parts) + f'.{fmt}' + ('.gz' if compress else '')
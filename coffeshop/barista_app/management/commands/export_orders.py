@@ -0,0 +1,41 @@
+import datetime
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from barista_app import exports
+from bot.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка заказов с позициями в CSV или JSONL (опционально gzip)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--since', type=datetime.date.fromisoformat, help='С даты (ГГГГ-ММ-ДД), включительно')
+        parser.add_argument('--until', type=datetime.date.fromisoformat, help='По дату (ГГГГ-ММ-ДД), включительно')
+        parser.add_argument('--status', choices=[value for value, _ in Order.STATUS_CHOICES])
+        parser.add_argument('--gzip', action='store_true', help='Сжимать вывод gzip')
+        parser.add_argument('--chunk-size', type=int, default=exports.EXPORT_CHUNK_SIZE, help='Заказов на чанк')
+        parser.add_argument('-o', '--output', help='Файл вывода (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size должен быть положительным')
+        orders = exports.order_querysets(options['since'], options['until'], options['status'])
+        stream = exports.export(orders, options['format'], options['gzip'], options['chunk_size'])
+
+        started = time.monotonic()
+        written = 0
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for block in stream:
+                out.write(block)
+                written += len(block)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+        self.stderr.write(f'Записано {written / 1024 / 1024:.1f} MB за {time.monotonic() - started:.1f} с')
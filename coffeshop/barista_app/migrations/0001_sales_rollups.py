@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('bot', '0005_order_channel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('channel', models.CharField(choices=[('bot', 'Telegram-бот'), ('web', 'Сайт'), ('barista', 'Бариста')], max_length=10, verbose_name='Канал')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('items', models.PositiveIntegerField(default=0, verbose_name='Позиций')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'ordering': ['-date', 'channel'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'channel'), name='daily_sales_date_channel_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='Час')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи за час',
+                'verbose_name_plural': 'Продажи по часам',
+                'ordering': ['-date', 'hour'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'hour'), name='hourly_sales_date_hour_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Продано')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bot.menuitem', verbose_name='Позиция')),
+            ],
+            options={
+                'verbose_name': 'Продажи позиции за день',
+                'verbose_name_plural': 'Продажи по позициям',
+                'ordering': ['-date', '-quantity'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'item'), name='item_sales_date_item_uniq')],
+            },
+        ),
+    ]
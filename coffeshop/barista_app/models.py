@@ -1,3 +1,63 @@
 from django.db import models
 
-# Create your models here.
+from bot.models import MenuItem, Order
+
+# Сводные таблицы продаж. Обновляются при завершении заказа
+# (barista_app.reports) и пересобираются командой rebuild_sales.
+# День и час — по локальному времени (TIME_ZONE), по дате оформления заказа.
+
+
+class DailySales(models.Model):
+    date = models.DateField("Дата")
+    channel = models.CharField("Канал", max_length=10, choices=Order.CHANNEL_CHOICES)
+    orders = models.PositiveIntegerField("Заказов", default=0)
+    items = models.PositiveIntegerField("Позиций", default=0)
+    revenue = models.DecimalField("Выручка", max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Продажи за день"
+        verbose_name_plural = "Продажи по дням"
+        ordering = ['-date', 'channel']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'channel'], name='daily_sales_date_channel_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.channel}: {self.revenue}"
+
+
+class HourlySales(models.Model):
+    date = models.DateField("Дата")
+    hour = models.PositiveSmallIntegerField("Час")
+    orders = models.PositiveIntegerField("Заказов", default=0)
+    revenue = models.DecimalField("Выручка", max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Продажи за час"
+        verbose_name_plural = "Продажи по часам"
+        ordering = ['-date', 'hour']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'hour'], name='hourly_sales_date_hour_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}:00: {self.revenue}"
+
+
+class ItemSales(models.Model):
+    date = models.DateField("Дата")
+    item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+', verbose_name="Позиция")
+    quantity = models.PositiveIntegerField("Продано", default=0)
+    # Позиции заказа не хранят цену — берётся цена позиции на момент подсчёта
+    revenue = models.DecimalField("Выручка", max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Продажи позиции за день"
+        verbose_name_plural = "Продажи по позициям"
+        ordering = ['-date', '-quantity']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'item'], name='item_sales_date_item_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} #{self.item_id}: {self.quantity}"
@@ -0,0 +1,152 @@
+"""
+Инкрементальные сводные таблицы продаж.
+
+Завершённые заказы раскладываются по дню/каналу, часу и позиции меню и
+прибавляются к счётчикам одним INSERT ... ON CONFLICT DO UPDATE на таблицу.
+Отчёты читают только сводные таблицы — их размер зависит от числа дней,
+а не от числа заказов.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from bot.archive import ORDER_SOURCES
+from bot.models import Order
+from .models import DailySales, HourlySales, ItemSales
+
+# Сколько заказов читать за раз при пересборке
+REBUILD_CHUNK_SIZE = 5000
+
+_ZERO = Decimal('0')
+
+
+class SalesCounters:
+    """Накопитель приращений для сводных таблиц"""
+
+    def __init__(self):
+        self.daily = defaultdict(lambda: [0, 0, _ZERO])    # (date, channel) -> orders, items, revenue
+        self.hourly = defaultdict(lambda: [0, _ZERO])      # (date, hour) -> orders, revenue
+        self.by_item = defaultdict(lambda: [0, _ZERO])     # (date, item_id) -> quantity, revenue
+
+    def add(self, orders, lines):
+        """orders — (id, created_at, channel, total_price); lines — (order_id, item_id, quantity, price)"""
+        keys = {}
+        for order_id, created_at, channel, total_price in orders:
+            local = timezone.localtime(created_at) if timezone.is_aware(created_at) else created_at
+            keys[order_id] = (local.date(), channel)
+            daily = self.daily[local.date(), channel]
+            daily[0] += 1
+            daily[2] += total_price
+            hourly = self.hourly[local.date(), local.hour]
+            hourly[0] += 1
+            hourly[1] += total_price
+        for order_id, item_id, quantity, price in lines:
+            date, channel = keys[order_id]
+            self.daily[date, channel][1] += quantity
+            by_item = self.by_item[date, item_id]
+            by_item[0] += quantity
+            by_item[1] += price * quantity
+
+    def __bool__(self):
+        return bool(self.daily)
+
+
+def _upsert(model, key_fields, value_fields, rows):
+    """INSERT ... ON CONFLICT (ключ) DO UPDATE SET поле = поле + excluded.поле"""
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = [*key_fields, *value_fields]
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    updates = ', '.join(f'{qn(f)} = {table}.{qn(f)} + excluded.{qn(f)}' for f in value_fields)
+    # SQLite ограничивает число параметров в запросе — пишем пачками
+    batch_size = max(1, 900 // len(columns))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(qn(c) for c in columns)}) '
+                f'VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({", ".join(qn(f) for f in key_fields)}) DO UPDATE SET {updates}',
+                [value for row in batch for value in row],
+            )
+
+
+def apply(counters):
+    """Прибавляет накопленные приращения к сводным таблицам"""
+    with transaction.atomic():
+        _upsert(DailySales, ('date', 'channel'), ('orders', 'items', 'revenue'),
+                [(*key, *values) for key, values in counters.daily.items()])
+        _upsert(HourlySales, ('date', 'hour'), ('orders', 'revenue'),
+                [(*key, *values) for key, values in counters.hourly.items()])
+        _upsert(ItemSales, ('date', 'item_id'), ('quantity', 'revenue'),
+                [(*key, *values) for key, values in counters.by_item.items()])
+
+
+def _collect(counters, queryset):
+    orders = list(queryset.values_list('id', 'created_at', 'channel', 'total_price'))
+    if not orders:
+        return orders
+    line_model, price_field = ORDER_SOURCES[queryset.model]
+    lines = line_model.objects.filter(order_id__in=[row[0] for row in orders]).values_list(
+        'order_id', 'item_id', 'quantity', price_field
+    )
+    counters.add(orders, lines)
+    return orders
+
+
+def record_completed(order_ids):
+    """Учитывает только что завершённые заказы"""
+    counters = SalesCounters()
+    for start in range(0, len(order_ids), REBUILD_CHUNK_SIZE):
+        chunk = order_ids[start:start + REBUILD_CHUNK_SIZE]
+        _collect(counters, Order.objects.filter(id__in=chunk, status='completed'))
+    if counters:
+        apply(counters)
+
+
+def local_midnight(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def rebuild(since=None, until=None):
+    """
+    Пересобирает сводные таблицы за даты [since, until] (включительно) с нуля —
+    по живым и архивным заказам. Без границ — за всю историю.
+    Возвращает число учтённых заказов.
+
+    История читается вне транзакции; блокировка записи SQLite берётся только
+    на замену строк сводки. Заказ, завершённый в момент чтения, может
+    разойтись на одну запись — запускайте вне часов пик.
+    """
+    counted = 0
+    counters = SalesCounters()
+    for model in ORDER_SOURCES:
+        orders = model.objects.filter(status='completed').order_by('id')
+        if since:
+            orders = orders.filter(created_at__gte=local_midnight(since))
+        if until:
+            orders = orders.filter(created_at__lt=local_midnight(until + datetime.timedelta(days=1)))
+        last_id = 0
+        # Keyset-проход по id: без OFFSET и без загрузки всей истории в память
+        while True:
+            chunk = _collect(counters, orders.filter(id__gt=last_id)[:REBUILD_CHUNK_SIZE])
+            if not chunk:
+                break
+            counted += len(chunk)
+            last_id = chunk[-1][0]
+
+    rollups = [DailySales.objects.all(), HourlySales.objects.all(), ItemSales.objects.all()]
+    if since:
+        rollups = [qs.filter(date__gte=since) for qs in rollups]
+    if until:
+        rollups = [qs.filter(date__lte=until) for qs in rollups]
+    with transaction.atomic():
+        for qs in rollups:
+            qs.delete()
+        apply(counters)
+    return counted
@@ -0,0 +1,19 @@
+import logging
+
+from django.dispatch import receiver
+
+from bot.services import order_status_changed
+from . import reports
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(order_status_changed)
+def update_sales_rollups(sender, order_ids, to_status, **kwargs):
+    if to_status != 'completed':
+        return
+    try:
+        reports.record_completed(order_ids)
+    except Exception:
+        # Сводка не должна ломать смену статуса; расхождение чинится rebuild_sales
+        logger.exception('Не удалось обновить сводные таблицы для заказов %s', order_ids)
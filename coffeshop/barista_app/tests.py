@@ -1,3 +1,375 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import json
+import re
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from barista_app import exports, reports
+from barista_app.models import DailySales, HourlySales, ItemSales
+from bot.archive import archive_orders
+from bot.models import Category, Customer, MenuItem, Order, OrderItem, OrderRequest
+from bot.services import InvalidTransition, order_status_changed, transition_orders
+from config import db_router
+
+
+class BaristaTestCase(TestCase):
+    """Меню из двух позиций и залогиненный бариста"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Кофе')
+        cls.latte = MenuItem.objects.create(name='Латте', price=Decimal('200.00'), category=cls.category)
+        cls.cookie = MenuItem.objects.create(name='Печенье', price=Decimal('50.00'), category=cls.category)
+        cls.barista = User.objects.create_user('barista', is_staff=True)
+        cls.customer = Customer.objects.create(name='Гость')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.barista)
+
+    def make_order(self, status='pending', lines=None, created_at=None, **fields):
+        lines = lines or [(self.latte, 1)]
+        order = Order.objects.create(
+            customer=self.customer, order_type=Order.PICKUP, status=status,
+            total_price=sum(item.price * quantity for item, quantity in lines), **fields,
+        )
+        OrderItem.objects.bulk_create([OrderItem(order=order, item=item, quantity=quantity) for item, quantity in lines])
+        if created_at is not None:
+            # auto_now_add не даёт задать дату при создании
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            order.created_at = created_at
+        return order
+
+
+class PosSubmitTests(BaristaTestCase):
+    url = reverse('barista_app:pos_submit')
+
+    def submit(self, **data):
+        payload = {
+            'phone': '+79990001122',
+            'order_type': Order.PICKUP,
+            'items': [{'id': self.latte.id, 'quantity': 2}, {'id': self.cookie.id, 'quantity': 1}],
+            'request_token': 'pos-token-0001',
+            **data,
+        }
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_creates_order_with_prices_from_db(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual(order.total_price, Decimal('450.00'))
+        self.assertEqual(order.channel, Order.BARISTA)
+        self.assertEqual(order.customer.phone, '+79990001122')
+        self.assertEqual(
+            sorted(order.items.values_list('item_id', 'quantity')),
+            sorted([(self.latte.id, 2), (self.cookie.id, 1)]),
+        )
+
+    def test_repeated_submit_returns_same_order(self):
+        first = self.submit()
+        second = self.submit()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['order_id'], first.json()['order_id'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_duplicate_lines_are_summed(self):
+        response = self.submit(items=[{'id': self.latte.id, 'quantity': 1}, {'id': self.latte.id, 'quantity': 2}])
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual(list(order.items.values_list('item_id', 'quantity')), [(self.latte.id, 3)])
+
+    def test_unavailable_item_is_rejected(self):
+        MenuItem.objects.filter(pk=self.cookie.pk).update(is_available=False)
+        response = self.submit()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['unavailable'], [self.cookie.id])
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_input(self):
+        cases = {
+            'phone': {'phone': ' '},
+            'order_type': {'order_type': 'takeaway'},
+            'address': {'order_type': Order.DELIVERY, 'address': ''},
+            'empty': {'items': [{'id': self.latte.id, 'quantity': 0}]},
+            'malformed': {'items': [{'id': 'латте', 'quantity': 1}]},
+        }
+        for name, data in cases.items():
+            with self.subTest(name):
+                self.assertEqual(self.submit(**data).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderRequest.objects.exists())
+
+    def test_requires_staff(self):
+        self.client.logout()
+        response = self.submit()
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderPanelTests(BaristaTestCase):
+    url = reverse('barista_app:order_panel')
+
+    def counts(self, response):
+        return re.findall(r'section-count">([^<]*)<', response.content.decode('utf-8'))
+
+    def test_section_counts(self):
+        for status in ('pending', 'pending', 'pending', 'confirmed', 'completed', 'canceled'):
+            self.make_order(status=status)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(response), ['3', '1', '2'])
+        self.assertEqual(self.counts(self.client.get(self.url, {'status': 'confirmed'})), ['0', '1', '0'])
+
+
+class PosMenuTests(BaristaTestCase):
+    url = reverse('barista_app:pos_menu')
+
+    def prices(self, response):
+        return {item['name']: item['price'] for category in response.json()['categories'] for item in category['items']}
+
+    def test_menu_edit_is_visible_at_once(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.prices(first)['Латте'], '200.00')
+        self.latte.price = Decimal('230.00')
+        self.latte.save()
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.prices(second)['Латте'], '230.00')
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header):
+                self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=header).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    @override_settings(DB_REPLICA_READ_PATHS=['/orderPanel/'])
+    def test_live_views_skip_replica(self):
+        # Реплики в тестах нет: любой запрос к ней упал бы с ConnectionDoesNotExist
+        self.make_order()
+        client = Client()
+        client.force_login(self.barista)
+        with mock.patch.object(db_router, '_replica_ready', return_value=True):
+            self.assertEqual(client.get(self.url).status_code, 200)
+            self.assertEqual(client.get(reverse('barista_app:order_panel')).status_code, 200)
+
+
+class TransitionTests(BaristaTestCase):
+    def update(self, order_id, status, **data):
+        return self.client.post(reverse('barista_app:update_status', args=[order_id, status]), data)
+
+    def bulk(self, **data):
+        return self.client.post(reverse('barista_app:bulk_update_status'), data)
+
+    def test_update_status(self):
+        order = self.make_order()
+        response = self.update(order.id, 'confirmed', expected='pending')
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'confirmed')
+
+    def test_stale_expected_status_conflicts(self):
+        # Второй бариста видел заказ ещё в pending, а его уже подтвердили
+        order = self.make_order(status='confirmed')
+        response = self.update(order.id, 'canceled', expected='pending')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], 'confirmed')
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'confirmed')
+
+    def test_forbidden_transition(self):
+        order = self.make_order()
+        response = self.update(order.id, 'completed', expected='pending')
+        self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+
+    def test_missing_order(self):
+        self.assertEqual(self.update(10 ** 6, 'confirmed').status_code, 404)
+        self.assertEqual(self.update(10 ** 6, 'confirmed', expected='pending').status_code, 404)
+
+    def test_bulk_reports_skipped_orders(self):
+        pending = [self.make_order(), self.make_order()]
+        confirmed = self.make_order(status='confirmed')
+        response = self.bulk(
+            from_status='pending', to_status='confirmed',
+            order_ids=[pending[0].id, pending[1].id, confirmed.id, pending[0].id],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()['updated']), [order.id for order in pending])
+        self.assertEqual(response.json()['skipped'], [confirmed.id])
+        self.assertEqual(Order.objects.filter(status='confirmed').count(), 3)
+
+    def test_bulk_all(self):
+        for _ in range(3):
+            self.make_order()
+        completed = self.make_order(status='completed')
+        response = self.bulk(from_status='pending', to_status='canceled', all='1')
+        self.assertEqual(len(response.json()['updated']), 3)
+        self.assertEqual(Order.objects.filter(status='canceled').count(), 3)
+        completed.refresh_from_db()
+        self.assertEqual(completed.status, 'completed')
+
+    def test_bulk_invalid_input(self):
+        order = self.make_order()
+        cases = {
+            'no ids': {'from_status': 'pending', 'to_status': 'confirmed'},
+            'bad id': {'from_status': 'pending', 'to_status': 'confirmed', 'order_ids': ['x']},
+            'forbidden': {'from_status': 'completed', 'to_status': 'pending', 'order_ids': [order.id]},
+        }
+        for name, data in cases.items():
+            with self.subTest(name):
+                self.assertEqual(self.bulk(**data).status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+
+    def test_signal_after_commit_with_changed_orders_only(self):
+        changed = self.make_order()
+        untouched = self.make_order(status='canceled')
+        received = []
+
+        def receiver(sender, order_ids, from_status, to_status, **kwargs):
+            received.append((order_ids, from_status, to_status))
+
+        order_status_changed.connect(receiver)
+        self.addCleanup(order_status_changed.disconnect, receiver)
+        with self.captureOnCommitCallbacks() as callbacks:
+            updated = transition_orders([changed.id, untouched.id], 'pending', 'confirmed')
+        self.assertEqual(updated, [changed.id])
+        # До коммита сигнал не отправлен
+        self.assertEqual(received, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(received, [([changed.id], 'pending', 'confirmed')])
+
+    def test_transition_rules(self):
+        with self.assertRaises(InvalidTransition):
+            transition_orders(None, 'canceled', 'pending')
+        self.assertEqual(transition_orders([], 'pending', 'confirmed'), [])
+
+
+class SalesRollupTests(BaristaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = timezone.make_aware(datetime.datetime(2026, 3, 2, 9, 30))
+
+    def complete(self, *orders):
+        ids = [order.id for order in orders]
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders(ids, 'pending', 'confirmed')
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders(ids, 'confirmed', 'completed')
+
+    def rollups(self):
+        return (
+            sorted(DailySales.objects.values_list('date', 'channel', 'orders', 'items', 'revenue')),
+            sorted(HourlySales.objects.values_list('date', 'hour', 'orders', 'revenue')),
+            sorted(ItemSales.objects.values_list('date', 'item_id', 'quantity', 'revenue')),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        first = self.make_order(lines=[(self.latte, 2), (self.cookie, 1)], created_at=self.day)
+        second = self.make_order(lines=[(self.cookie, 3)], created_at=self.day + datetime.timedelta(hours=1))
+        third = self.make_order(lines=[(self.latte, 1)], created_at=self.day + datetime.timedelta(days=1),
+                                channel=Order.BARISTA)
+        self.make_order(status='canceled', lines=[(self.latte, 5)], created_at=self.day)
+        self.complete(first, second)
+        self.complete(third)
+        # Часть завершённых заказов уже в архиве — rebuild читает обе таблицы
+        self.assertEqual(archive_orders(before=self.day + datetime.timedelta(hours=12)), 3)
+
+        incremental = self.rollups()
+        daily, hourly, by_item = incremental
+        date = self.day.date()
+        self.assertEqual(daily, [
+            (date, Order.BOT, 2, 6, Decimal('600.00')),
+            (date + datetime.timedelta(days=1), Order.BARISTA, 1, 1, Decimal('200.00')),
+        ])
+        self.assertEqual([row[1:] for row in hourly], [(9, 1, Decimal('450.00')), (10, 1, Decimal('150.00')),
+                                                      (9, 1, Decimal('200.00'))])
+        self.assertIn((date, self.cookie.id, 4, Decimal('200.00')), by_item)
+
+        self.assertEqual(reports.rebuild(), 3)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_rebuild_range_keeps_other_days(self):
+        inside = self.make_order(created_at=self.day)
+        outside = self.make_order(lines=[(self.cookie, 2)], created_at=self.day + datetime.timedelta(days=2))
+        self.complete(inside, outside)
+        DailySales.objects.update(orders=99)
+
+        self.assertEqual(reports.rebuild(since=self.day.date(), until=self.day.date()), 1)
+        orders = dict(DailySales.objects.values_list('date', 'orders'))
+        self.assertEqual(orders[self.day.date()], 1)
+        self.assertEqual(orders[self.day.date() + datetime.timedelta(days=2)], 99)
+
+    def test_other_statuses_are_not_counted(self):
+        order = self.make_order()
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders([order.id], 'pending', 'canceled')
+        self.assertEqual(self.rollups(), ([], [], []))
+
+
+class ExportTests(BaristaTestCase):
+    url = reverse('barista_app:export_orders')
+
+    def setUp(self):
+        super().setUp()
+        old = timezone.now() - datetime.timedelta(days=400)
+        self.archived = self.make_order(status='completed', lines=[(self.latte, 2)], created_at=old)
+        self.live = self.make_order(lines=[(self.latte, 1), (self.cookie, 2)])
+        self.empty = self.make_order(status='canceled', lines=[(self.cookie, 1)])
+        self.empty.items.all().delete()
+        archive_orders(before=old + datetime.timedelta(days=1))
+        # В архиве осталась цена на момент архивации
+        MenuItem.objects.filter(pk=self.latte.pk).update(price=Decimal('250.00'))
+
+    def download(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_merges_live_and_archive(self):
+        rows = list(csv.DictReader(io.StringIO(self.download(format='csv').decode('utf-8'))))
+        self.assertEqual(
+            [(row['order_id'], row['item_id'], row['quantity'], row['price']) for row in rows],
+            [
+                (str(self.archived.id), str(self.latte.id), '2', '200.00'),
+                (str(self.live.id), str(self.latte.id), '1', '250.00'),
+                (str(self.live.id), str(self.cookie.id), '2', '50.00'),
+                (str(self.empty.id), '', '', ''),
+            ],
+        )
+
+    def test_gzip_jsonl(self):
+        body = gzip.decompress(self.download(format='jsonl', gzip='1'))
+        orders = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        self.assertEqual([order['id'] for order in orders], [self.archived.id, self.live.id, self.empty.id])
+        self.assertEqual(orders[0]['items'], [
+            {'item_id': self.latte.id, 'name': 'Латте', 'quantity': 2, 'price': '200.00'},
+        ])
+        self.assertEqual(orders[2]['items'], [])
+
+    def test_status_filter(self):
+        body = self.download(format='jsonl', status='completed')
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.archived.id])
+
+    def test_chunking_does_not_change_output(self):
+        querysets = exports.order_querysets()
+        whole = b''.join(exports.export(querysets, 'jsonl'))
+        self.assertEqual(b''.join(exports.export(querysets, 'jsonl', chunk_size=1)), whole)
+
+    def test_invalid_params(self):
+        for params in ({'format': 'xml'}, {'status': 'lost'}, {'since': '01.01.2026'}):
+            with self.subTest(params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
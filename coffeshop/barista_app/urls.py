@@ -10,5 +10,11 @@ urlpatterns = [
     path('accept/cart/update/', views.cart_update, name='cart_update'),
     path('accept/cart/clear/', views.cart_clear, name='cart_clear'),
     path('accept/create/', views.create_order, name='create_order'),
+    path('pos/', views.pos, name='pos'),
+    path('pos/menu.json', views.pos_menu, name='pos_menu'),
+    path('pos/submit/', views.pos_submit, name='pos_submit'),
     path('update/<int:order_id>/<str:status>/', views.update_status, name='update_status'),
+    path('reports/', views.sales_report, name='sales_report'),
+    path('reports/export/', views.export_orders, name='export_orders'),
+    path('update/bulk/', views.bulk_update_status, name='bulk_update_status'),
 ]
\ No newline at end of file
@@ -1,14 +1,59 @@
 import hashlib
+import json
+from datetime import date, timedelta
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpResponse, JsonResponse
-from django.db import transaction
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.db.models import Prefetch, Sum
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_POST
 from django.contrib import messages
+from bot.menu import get_menu_version
 from bot.models import Customer, TelegramUser, Category, MenuItem, Cart, CartItem, Order, OrderItem
+from bot.services import (
+    InvalidTransition, form_request_key, new_request_token, place_order, placed_order, transition_orders,
+)
+from config.http import etag_matches
+from monitoring.metrics import record_cache
+from . import exports
+from .models import DailySales, HourlySales, ItemSales
+
+POS_MENU_CACHE_TIMEOUT = 60 * 60
+
+# Панель и смена статусов — асинхронные (под ASGI не занимают поток на время запросов к БД);
+# шаблоны рендерятся в потоке, переходы статусов с транзакциями — через sync_to_async
+arender = sync_to_async(render)
+
+def get_phone_customer(phone):
+    """Клиент, оформленный баристой по номеру телефона"""
+    # Генерируем уникальный chat_id на основе телефона (хеш)
+    hash_id = int(hashlib.md5(phone.encode()).hexdigest()[:12], 16)
+    # Делаем его отрицательным, чтобы отличать от настоящих Telegram ID
+    fake_chat_id = -abs(hash_id)
+
+    # Находим или создаём клиента
+    telegram_user, created = TelegramUser.objects.get_or_create(
+        phone=phone,
+        defaults={
+            'name': 'Клиент',
+            'chat_id': fake_chat_id
+        }
+    )
+
+    customer, _ = Customer.objects.get_or_create(
+        telegram_user=telegram_user,
+        defaults={'name': 'Клиент', 'phone': phone}
+    )
+    return customer
 
 @staff_member_required(login_url='/login/')
-def order_panel(request):
-    orders = Order.objects.select_related(
+async def order_panel(request):
+    # Живая очередь — всегда из основной БД: снимок реплики отстаёт на DB_REPLICA_REFRESH_INTERVAL
+    orders = Order.objects.using(DEFAULT_DB_ALIAS).select_related(
         'customer',
         'customer__user',           # если заказ от веб-пользователя
         'customer__telegram_user'   # если заказ от Telegram)
@@ -23,29 +68,65 @@ def order_panel(request):
     elif status and status in dict(Order.STATUS_CHOICES):
         orders = orders.filter(status=status)
 
-    # ✅ Группировка по секциям
-    pending_orders = orders.filter(status='pending')          # Ожидает
-    active_orders = orders.filter(status__in=['confirmed'])   # В работе (только "Подтверждён")
-    completed_orders = orders.filter(status__in=['completed', 'canceled'])  # Готов / Отменён
+    # ✅ Группировка по секциям (загружаются здесь, шаблон получает готовые списки)
+    pending_orders = [order async for order in orders.filter(status='pending')]          # Ожидает
+    active_orders = [order async for order in orders.filter(status__in=['confirmed'])]   # В работе (только "Подтверждён")
+    completed_orders = [order async for order in orders.filter(status__in=['completed', 'canceled'])]  # Готов / Отменён
 
-    return render(request, 'barista_app/orderPanel.html', {
+    return await arender(request, 'barista_app/orderPanel.html', {
         'pending_orders': pending_orders,
         'active_orders': active_orders,
         'completed_orders': completed_orders,
         'status_choices': Order.STATUS_CHOICES,
+        'transitions': Order.ALLOWED_TRANSITIONS,
         'current_filters': {
             'order_id': order_id or '',
             'status': status or '',
         }
     })
 
+def order_status(order_id):
+    return Order.objects.filter(id=order_id).values_list('status', flat=True).afirst()
+
 @staff_member_required
-def update_status(request, order_id, status):
-    order = get_object_or_404(Order, id=order_id)
-    if status in dict(Order.STATUS_CHOICES):
-        order.status = status
-        order.save()
-    return redirect('barista_app:order_panel')
+@require_POST
+async def update_status(request, order_id, status):
+    """Смена статуса одного заказа; expected — статус, который видел бариста"""
+    expected = request.POST.get('expected')
+    if expected is None:
+        expected = await order_status(order_id)
+        if expected is None:
+            return JsonResponse({'error': 'Заказ не найден'}, status=404)
+    try:
+        updated = await sync_to_async(transition_orders)([order_id], expected, status)
+    except InvalidTransition as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not updated:
+        current = await order_status(order_id)
+        return JsonResponse(
+            {'error': 'Статус заказа уже изменён', 'order_id': order_id, 'status': current},
+            status=409 if current else 404,
+        )
+    return JsonResponse({'order_id': order_id, 'status': status})
+
+@staff_member_required
+@require_POST
+async def bulk_update_status(request):
+    """Массовый переход одним UPDATE: выбранные заказы или все в статусе from_status"""
+    from_status = request.POST.get('from_status')
+    to_status = request.POST.get('to_status')
+    order_ids = request.POST.getlist('order_ids')
+    apply_to_all = request.POST.get('all') == '1'
+    try:
+        if not apply_to_all and not order_ids:
+            return JsonResponse({'error': 'Не выбраны заказы'}, status=400)
+        updated = await sync_to_async(transition_orders)(None if apply_to_all else order_ids, from_status, to_status)
+    except InvalidTransition as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'Некорректный номер заказа'}, status=400)
+    skipped = [] if apply_to_all else sorted({int(pk) for pk in order_ids} - set(updated))
+    return JsonResponse({'status': to_status, 'updated': updated, 'skipped': skipped})
 
 @staff_member_required
 def accept_order(request):
@@ -53,23 +134,24 @@ def accept_order(request):
         items__is_available=True
     ).distinct().order_by('order', 'name')
 
-    # Получаем корзину из сессии
+    # Получаем корзину из сессии (все позиции — одним запросом)
     cart = request.session.get('barista_cart', [])
+    menu_items = MenuItem.objects.in_bulk([entry['id'] for entry in cart])
     cart_items = []
     total = 0
     for item_data in cart:
-        try:
-            item = MenuItem.objects.get(id=item_data['id'])
-            qty = item_data['quantity']
-            cart_items.append({'item': item, 'quantity': qty, 'total_price': item.price * qty})
-            total += item.price * qty
-        except MenuItem.DoesNotExist:
+        item = menu_items.get(item_data['id'])
+        if item is None:
             continue
+        qty = item_data['quantity']
+        cart_items.append({'item': item, 'quantity': qty, 'total_price': item.price * qty})
+        total += item.price * qty
 
     return render(request, 'barista_app/acceptOrder.html', {
         'categories': categories,
         'cart_items': cart_items,
         'cart_total': total,
+        'request_token': new_request_token(),
     })
 
 @staff_member_required
@@ -136,24 +218,14 @@ def create_order(request):
             messages.error(request, "Телефон обязателен")
             return redirect('barista_app:accept_order')
 
-        # Генерируем уникальный chat_id на основе телефона (хеш)
-        hash_id = int(hashlib.md5(phone.encode()).hexdigest()[:12], 16)
-        # Делаем его отрицательным, чтобы отличать от настоящих Telegram ID
-        fake_chat_id = -abs(hash_id)
-
-        # Находим или создаём клиента
-        telegram_user, created = TelegramUser.objects.get_or_create(
-            phone=phone,
-            defaults={
-                'name': 'Клиент',
-                'chat_id': fake_chat_id
-            }
-        )
+        # Повторная отправка формы — тот же заказ (корзина в сессии к этому моменту уже пуста)
+        key = form_request_key(Order.BARISTA, request.user.pk, request.POST.get('request_token'))
+        order = placed_order(key)
+        if order is not None:
+            messages.success(request, f"Заказ #{order.id} успешно создан!")
+            return redirect('barista_app:order_panel')
 
-        customer, _ = Customer.objects.get_or_create(
-            telegram_user=telegram_user,
-            defaults={'name': 'Клиент', 'phone': phone}
-        )
+        customer = get_phone_customer(phone)
 
         # Берём корзину из сессии
         cart = request.session.get('barista_cart', [])
@@ -161,38 +233,18 @@ def create_order(request):
             messages.error(request, "Корзина пуста")
             return redirect('barista_app:accept_order')
 
-        # Считаем итог и собираем позиции
-        total = 0
-        items_data = []
-        for entry in cart:
-            try:
-                item = MenuItem.objects.get(id=entry['id'])
-                qty = entry['quantity']
-                items_data.append((item, qty))
-                total += item.price * qty
-            except MenuItem.DoesNotExist:
-                continue
+        # Собираем позиции (одним запросом)
+        menu_items = MenuItem.objects.in_bulk([entry['id'] for entry in cart])
+        items_data = [
+            (menu_items[entry['id']], entry['quantity'])
+            for entry in cart if entry['id'] in menu_items
+        ]
 
         if not items_data:
             messages.error(request, "Нет доступных позиций")
             return redirect('barista_app:accept_order')
 
-        # Создаём заказ
-        order = Order.objects.create(
-            customer=customer,
-            order_type=order_type,
-            address=address,
-            total_price=total,
-            status='pending'
-        )
-
-        # Добавляем позиции
-        for item, qty in items_data:
-            OrderItem.objects.create(
-                order=order,
-                item=item,
-                quantity=qty
-            )
+        order = place_order(customer, order_type, address, items_data, channel='barista', idempotency_key=key)
 
         # Очищаем корзину
         request.session['barista_cart'] = []
@@ -201,4 +253,189 @@ def create_order(request):
         messages.success(request, f"Заказ #{order.id} успешно создан!")
         return redirect('barista_app:order_panel')
 
-    return redirect('barista_app:accept_order')
\ No newline at end of file
+    return redirect('barista_app:accept_order')
+
+# === POS-режим: меню в JSON, корзина на клиенте, один POST на заказ ===
+
+def get_pos_menu():
+    """Сериализованное меню для POS (bytes) и его версия; кэшируется до изменения меню"""
+    version = get_menu_version()
+    key = f'pos_menu:{version}'
+    body = cache.get(key)
+    record_cache('pos_menu', body is not None)
+    if body is None:
+        # Из основной БД: устаревший снимок реплики попал бы в кэш под новой версией меню
+        categories = Category.objects.using(DEFAULT_DB_ALIAS).prefetch_related(
+            Prefetch('items', queryset=MenuItem.objects.filter(is_available=True))
+        ).order_by('order', 'name')
+        data = {
+            'version': version,
+            'categories': [
+                {
+                    'id': category.id,
+                    'name': category.name,
+                    'emoji': category.emoji,
+                    'items': [
+                        {
+                            'id': item.id,
+                            'name': item.name,
+                            'description': item.description[:300],
+                            'price': item.price,
+                            'image': item.image_url,
+                        }
+                        for item in category.items.all()
+                    ],
+                }
+                for category in categories
+            ],
+        }
+        body = json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder).encode('utf-8')
+        cache.set(key, body, POS_MENU_CACHE_TIMEOUT)
+    return version, body
+
+@staff_member_required
+def pos(request):
+    return render(request, 'barista_app/pos.html', {
+        'order_types': Order.ORDER_TYPES,
+    })
+
+@staff_member_required
+def pos_menu(request):
+    version, body = get_pos_menu()
+    etag = f'"menu-{version}"'
+    if etag_matches(request.headers.get('If-None-Match'), (etag,)):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@sync_to_async
+def place_pos_order(phone, order_type, address, lines, key):
+    with transaction.atomic():
+        customer = get_phone_customer(phone)
+        return place_order(customer, order_type, address, lines, channel='barista', idempotency_key=key)
+
+@staff_member_required
+@require_POST
+async def pos_submit(request):
+    try:
+        data = json.loads(request.body)
+        phone = str(data.get('phone', '')).strip()
+        order_type = data.get('order_type')
+        address = str(data.get('address') or '').strip()
+        quantities = {}
+        for entry in data.get('items', []):
+            item_id, quantity = int(entry['id']), int(entry['quantity'])
+            if quantity > 0:
+                quantities[item_id] = quantities.get(item_id, 0) + quantity
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'error': 'Некорректные данные заказа'}, status=400)
+
+    if not phone:
+        return JsonResponse({'error': 'Телефон обязателен'}, status=400)
+    if order_type not in dict(Order.ORDER_TYPES):
+        return JsonResponse({'error': 'Неизвестный тип заказа'}, status=400)
+    if order_type == Order.DELIVERY and not address:
+        return JsonResponse({'error': 'Укажите адрес доставки'}, status=400)
+    if not quantities:
+        return JsonResponse({'error': 'Корзина пуста'}, status=400)
+
+    user = await request.auser()
+    key = form_request_key(Order.BARISTA, user.pk, data.get('request_token'))
+    order = await sync_to_async(placed_order)(key)
+    if order is not None:
+        return JsonResponse({'order_id': order.id, 'total': order.total_price}, status=200)
+
+    # Цены и доступность — только из БД, одним запросом
+    menu_items = await MenuItem.objects.filter(is_available=True).ain_bulk(list(quantities))
+    unavailable = [item_id for item_id in quantities if item_id not in menu_items]
+    if unavailable:
+        return JsonResponse(
+            {'error': 'Некоторые позиции недоступны', 'unavailable': unavailable}, status=409
+        )
+
+    order = await place_pos_order(
+        phone, order_type, address,
+        [(menu_items[item_id], quantity) for item_id, quantity in quantities.items()],
+        key,
+    )
+    return JsonResponse({'order_id': order.id, 'total': order.total_price}, status=201)
+
+REPORT_PERIODS = (7, 30, 90, 365)
+
+@staff_member_required(login_url='/login/')
+def sales_report(request):
+    """Отчёт по продажам — только из сводных таблиц (см. barista_app.reports)"""
+    days = request.GET.get('days', '')
+    days = int(days) if days.isdigit() and int(days) in REPORT_PERIODS else 30
+    until = timezone.localdate()
+    since = until - timedelta(days=days - 1)
+
+    daily = DailySales.objects.filter(date__range=(since, until))
+    totals = daily.aggregate(orders=Sum('orders'), items=Sum('items'), revenue=Sum('revenue'))
+    by_day = list(daily.values('date').annotate(orders=Sum('orders'), revenue=Sum('revenue')).order_by('date'))
+    channels = list(
+        daily.values('channel').annotate(orders=Sum('orders'), revenue=Sum('revenue')).order_by('-revenue')
+    )
+    channel_names = dict(Order.CHANNEL_CHOICES)
+    for row in channels:
+        row['name'] = channel_names.get(row['channel'], row['channel'])
+
+    top_items = list(
+        ItemSales.objects.filter(date__range=(since, until))
+        .values('item_id', 'item__name')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-quantity')[:10]
+    )
+    hours = {
+        row['hour']: row for row in
+        HourlySales.objects.filter(date__range=(since, until))
+        .values('hour').annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+    }
+    peak_hours = [hours.get(hour, {'hour': hour, 'orders': 0, 'revenue': 0}) for hour in range(24)]
+
+    # Ширина полос в процентах от максимума
+    for rows, key in ((by_day, 'revenue'), (peak_hours, 'orders'), (top_items, 'quantity')):
+        peak = max((row[key] for row in rows), default=0) or 1
+        for row in rows:
+            row['share'] = round(100 * row[key] / peak)
+
+    orders_count = totals['orders'] or 0
+    return render(request, 'barista_app/sales_report.html', {
+        'days': days,
+        'periods': REPORT_PERIODS,
+        'since': since,
+        'until': until,
+        'totals': totals,
+        'average_check': (totals['revenue'] / orders_count) if orders_count else None,
+        'by_day': by_day,
+        'channels': channels,
+        'top_items': top_items,
+        'peak_hours': [row for row in peak_hours if row['orders']],
+    })
+
+@staff_member_required(login_url='/login/')
+def export_orders(request):
+    """Потоковая выгрузка заказов: ?format=csv|jsonl&since=&until=&status=&gzip=1"""
+    fmt = request.GET.get('format', 'csv')
+    status = request.GET.get('status') or None
+    try:
+        since = date.fromisoformat(request.GET['since']) if request.GET.get('since') else None
+        until = date.fromisoformat(request.GET['until']) if request.GET.get('until') else None
+    except ValueError:
+        return HttpResponseBadRequest('Даты — в формате ГГГГ-ММ-ДД')
+    if fmt not in exports.FORMATS or (status and status not in dict(Order.STATUS_CHOICES)):
+        return HttpResponseBadRequest('Неизвестный формат или статус')
+    compress = request.GET.get('gzip') == '1'
+
+    # Тело ответа читается уже после выхода из view — фиксируем БД (реплику) сейчас
+    orders = [qs.using(router.db_for_read(qs.model)) for qs in exports.order_querysets(since, until, status)]
+    if compress:
+        content_type = 'application/gzip'
+    else:
+        content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(exports.export(orders, fmt, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(fmt, compress, since, until)}"'
+    return response
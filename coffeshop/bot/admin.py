@@ -1,8 +1,67 @@
 # bot_app/admin.py
 from django.contrib import admin
-from .models import TelegramUser, Customer, Category, MenuItem, Cart, CartItem, Order, OrderItem
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from .models import (
+    TelegramUser, Customer, Category, MenuItem, Cart, CartItem, Order, OrderItem,
+    ArchivedOrder, ArchivedOrderItem,
+)
 from django.utils.html import format_html
 
+# До этого порога считаем строки точно, дальше — оценка/«не меньше N»
+EXACT_COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: не делает COUNT(*) по миллионам строк.
+
+    Без фильтров берёт оценку числа строк из статистики СУБД
+    (sqlite_stat1 после ANALYZE, pg_class.reltuples в PostgreSQL).
+    С фильтрами считает не дальше EXACT_COUNT_LIMIT + 1 строк.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            estimate = self._estimate(self.object_list.model._meta.db_table, self.object_list.db)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return self.object_list.order_by()[:EXACT_COUNT_LIMIT + 1].count()
+
+    @staticmethod
+    def _estimate(table, using):
+        connection = connections[using]
+        if connection.vendor == 'sqlite':
+            sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+        elif connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+        else:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            # sqlite_stat1 появляется только после ANALYZE
+            return None
+        if not row or row[0] is None:
+            return None
+        value = int(str(row[0]).split()[0])
+        return value if value >= 0 else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Общие настройки списков для таблиц, которые растут вместе с заказами"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    # Без сортировки по id SQLite сортирует всю выборку во временном B-дереве
+    ordering = ('-id',)
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug', 'emoji', 'order')
@@ -12,8 +71,15 @@ class CategoryAdmin(admin.ModelAdmin):
 class MenuItemAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'is_available', 'image_thumbnail']
     list_filter = ['category', 'is_available']
+    list_select_related = ['category']
+    search_fields = ['name']
     readonly_fields = ['image_preview']
 
+    def get_search_results(self, request, queryset, search_term):
+        # В виджете автодополнения MenuItem.__str__ обращается к категории
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        return queryset.select_related('category'), may_have_duplicates
+
     def image_thumbnail(self, obj):
         if obj.image:
             return format_html('<img src="{}" style="max-height: 50px;"/>', obj.image.url)
@@ -26,26 +92,105 @@ class MenuItemAdmin(admin.ModelAdmin):
         return "-"
     image_preview.short_description = "Просмотр"
 
+@admin.register(TelegramUser)
+class TelegramUserAdmin(LargeTableAdmin):
+    list_display = ('id', 'chat_id', 'name', 'phone')
+    search_fields = ('=chat_id', 'name', '=phone')
+
+@admin.register(Customer)
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ('id', '__str__', 'name', 'phone')
+    # Customer.__str__ читает user/telegram_user — подтягиваем их одним JOIN
+    list_select_related = ('user', 'telegram_user')
+    search_fields = ('=phone', 'name', '=user__username', '=telegram_user__chat_id')
+    raw_id_fields = ('user', 'telegram_user')
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        return queryset.select_related('user', 'telegram_user'), may_have_duplicates
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    autocomplete_fields = ('item',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('item__category')
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer', 'order_type', 'total_price', 'status')
-    list_filter = ('order_type', 'status')
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'order_type', 'channel', 'total_price', 'status', 'created_at')
+    list_filter = ('status', 'order_type', 'channel')
+    list_select_related = ('customer__user', 'customer__telegram_user')
+    date_hierarchy = 'created_at'
+    # Сортировка по индексу на дате: фильтр по периоду не сортирует выборку целиком
+    ordering = ('-created_at',)
+    autocomplete_fields = ('customer',)
+    search_fields = ('=id',)
+    # Статус меняется только через transition_orders (панель баристы): сохранение
+    # из админки не отправило бы order_status_changed, и сводки продаж разошлись бы
+    readonly_fields = ('status',)
+    inlines = (OrderItemInline,)
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    autocomplete_fields = ('item',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('item__category')
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
     list_display = ('id', 'customer', 'created_at')
-    list_filter = ('customer',)
+    list_select_related = ('customer__user', 'customer__telegram_user')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    autocomplete_fields = ('customer',)
+    inlines = (CartItemInline,)
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'cart', 'item', 'quantity')
-    list_filter = ('cart', 'item')
+class CartItemAdmin(LargeTableAdmin):
+    list_display = ('id', 'cart_id', 'item', 'quantity')
+    # Фильтр по корзине рисовал в сайдбаре каждую корзину — фильтруем по категории
+    list_filter = ('item__category',)
+    list_select_related = ('item__category',)
+    raw_id_fields = ('cart',)
+    autocomplete_fields = ('item',)
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'order', 'item', 'quantity')
-    list_filter = ('order', 'item')
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('id', 'order_id', 'item', 'quantity')
+    list_filter = ('item__category',)
+    list_select_related = ('item__category',)
+    raw_id_fields = ('order',)
+    autocomplete_fields = ('item',)
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ('item', 'quantity', 'price')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('item__category')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'order_type', 'channel', 'total_price', 'status', 'created_at')
+    list_filter = ('status', 'channel')
+    list_select_related = ('customer__user', 'customer__telegram_user')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    search_fields = ('=id',)
+    inlines = (ArchivedOrderItemInline,)
+
+    # Архив только для чтения: заказы туда переносит manage.py archive_orders
+    def has_add_permission(self, request):
+        return False
 
-# Зарегистрируйте остальные модели аналогично
-admin.site.register(TelegramUser)
-admin.site.register(Customer)
\ No newline at end of file
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class BotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'bot'
\ No newline at end of file
+    name = 'bot'
+
+    def ready(self):
+        from . import signals  # noqa: F401 — подключение обработчиков сигналов
@@ -0,0 +1,133 @@
+"""
+Архив заказов: горячие таблицы Order/OrderItem держим маленькими.
+
+Завершённые и отменённые заказы старше ORDER_ARCHIVE_AFTER_DAYS переносятся
+в ArchivedOrder/ArchivedOrderItem пачками: INSERT ... SELECT и DELETE в
+одной транзакции на пачку, так что заказ всегда лежит ровно в одной из
+таблиц. Чтение истории клиента идёт через функции ниже — они смотрят в обе.
+"""
+import heapq
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, MenuItem, Order, OrderItem, OrderRequest
+
+ARCHIVE_STATUSES = ('completed', 'canceled')
+
+# Заказы живут в двух таблицах: модель заказа -> (модель позиций, поле цены позиции)
+ORDER_SOURCES = {
+    Order: (OrderItem, 'item__price'),
+    ArchivedOrder: (ArchivedOrderItem, 'price'),
+}
+
+
+def archive_cutoff(days=None):
+    return timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days)
+
+
+def archivable_orders(before):
+    return Order.objects.filter(status__in=ARCHIVE_STATUSES, created_at__lt=before)
+
+
+def _archive_batch(ids):
+    qn = connection.ops.quote_name
+    order, item = qn(Order._meta.db_table), qn(OrderItem._meta.db_table)
+    archived_order, archived_item = qn(ArchivedOrder._meta.db_table), qn(ArchivedOrderItem._meta.db_table)
+    menu_item = qn(MenuItem._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {archived_order} (id, customer_id, order_type, address, total_price, created_at, status, channel, archived_at) '
+            f'SELECT id, customer_id, order_type, address, total_price, created_at, status, channel, %s '
+            f'FROM {order} WHERE id IN ({placeholders})',
+            [connection.ops.adapt_datetimefield_value(timezone.now()), *ids],
+        )
+        cursor.execute(
+            f'INSERT INTO {archived_item} (id, order_id, item_id, quantity, price) '
+            f'SELECT oi.id, oi.order_id, oi.item_id, oi.quantity, mi.price '
+            f'FROM {item} oi JOIN {menu_item} mi ON mi.id = oi.item_id WHERE oi.order_id IN ({placeholders})',
+            ids,
+        )
+        cursor.execute(f'DELETE FROM {item} WHERE order_id IN ({placeholders})', ids)
+        # Ключи оформления обычно давно удалены по TTL; оставшиеся не должны держать FK
+        cursor.execute(f'DELETE FROM {qn(OrderRequest._meta.db_table)} WHERE order_id IN ({placeholders})', ids)
+        cursor.execute(f'DELETE FROM {order} WHERE id IN ({placeholders})', ids)
+        return cursor.rowcount
+
+
+def archive_orders(before=None, batch_size=None, max_batches=None, progress=None):
+    """
+    Переносит заказы в архив пачками по batch_size, каждая — своей транзакцией,
+    чтобы не держать блокировку записи SQLite дольше одной пачки.
+    Возвращает число перенесённых заказов.
+    """
+    before = before or archive_cutoff()
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    candidates = archivable_orders(before).order_by('id').values_list('id', flat=True)
+    moved, batches, last_id = 0, 0, 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            ids = list(candidates.filter(id__gt=last_id)[:batch_size])
+            if not ids:
+                break
+            moved += _archive_batch(ids)
+        batches += 1
+        last_id = ids[-1]
+        if progress:
+            progress(moved)
+    return moved
+
+
+def customer_orders(limit=10, before=None, **filters):
+    """
+    Страница заказов клиента из живых и архивных таблиц, новые первыми.
+
+    Keyset по (created_at, id): before — последний заказ предыдущей страницы
+    (пара created_at, id). Возвращает (заказы, before для следующей страницы
+    или None). Загружаются только заголовки — без позиций.
+    filters — условия на клиента, например customer__telegram_user=user.
+    """
+    streams = []
+    for order_model in ORDER_SOURCES:
+        qs = order_model.objects.filter(**filters).only('id', 'created_at', 'total_price', 'status')
+        if before is not None:
+            created_at, order_id = before
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
+        # limit + 1 — чтобы узнать, есть ли следующая страница
+        streams.append(list(qs.order_by('-created_at', '-id')[:limit + 1]))
+    merged = heapq.merge(*streams, key=lambda order: (order.created_at, order.id), reverse=True)
+    orders = list(islice(merged, limit + 1))
+    if len(orders) <= limit:
+        return orders, None
+    orders = orders[:limit]
+    return orders, (orders[-1].created_at, orders[-1].id)
+
+
+def get_customer_order(order_id, **filters):
+    """Заказ клиента по id — из живой таблицы или из архива; None, если не найден"""
+    for model in (Order, ArchivedOrder):
+        order = model.objects.filter(id=order_id, **filters).prefetch_related('items__item').first()
+        if order is not None:
+            return order
+    return None
+
+
+def customer_order_lines(order_id, **filters):
+    """
+    Позиции заказа клиента вместе с заказом и блюдами — одним запросом
+    (в архив идём, только если в живой таблице заказа нет).
+    Возвращает (заказ, позиции) или (None, []).
+    """
+    order_filters = {f'order__{name}': value for name, value in filters.items()}
+    for line_model, _ in ORDER_SOURCES.values():
+        lines = list(
+            line_model.objects.filter(order_id=order_id, **order_filters).select_related('order', 'item')
+        )
+        if lines:
+            return lines[0].order, lines
+    return None, []
@@ -0,0 +1,61 @@
+"""
+Полнотекстовый поиск по меню для сайта.
+
+На SQLite запрос идёт в FTS5-таблицу bot_menuitem_fts (миграция 0008):
+её держат в актуальном состоянии триггеры на bot_menuitem. Каждое слово
+запроса ищется как префикс («лат» находит «латте»), результаты
+упорядочены по bm25 — совпадение в названии весит больше, чем в описании.
+На других СУБД — запасной вариант через icontains.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import MenuItem
+
+FTS_TABLE = 'bot_menuitem_fts'
+# Веса bm25 по колонкам: name, description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_QUERY_WORDS = 8
+
+_WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Строка пользователя -> выражение MATCH: каждое слово в кавычках и как префикс"""
+    # unicode61 не сводит «ё» к «е» (remove_diacritics касается только латиницы) —
+    # индекс хранит текст уже с «е» (миграция 0012), запрос приводим так же
+    terms = _WORD.findall(query.lower().replace('ё', 'е'))[:MAX_QUERY_WORDS]
+    # Кавычки экранируют синтаксис FTS5 (AND, NEAR, «-», «:»), * — поиск по префиксу
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _ranked_ids(using, expression, limit):
+    # Доступность проверяется в том же запросе — LIMIT считает только то, что покажем
+    sql = (
+        f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} '
+        f'JOIN {MenuItem._meta.db_table} AS item ON item.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND item.is_available '
+        f'ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) LIMIT %s'
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [expression, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_menu(query, limit=20):
+    """Доступные позиции меню по запросу, самые релевантные первыми"""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    using = router.db_for_read(MenuItem)
+    items = MenuItem.objects.using(using).filter(is_available=True).select_related('category')
+    if connections[using].vendor != 'sqlite':
+        for term in _WORD.findall(query)[:MAX_QUERY_WORDS]:
+            items = items.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return list(items.order_by('name')[:limit])
+    ids = _ranked_ids(using, expression, limit)
+    found = items.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
@@ -1,23 +1,40 @@
 import os 
 import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
 from pathlib import Path
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from telegram.ext import (
     ContextTypes, CommandHandler, CallbackQueryHandler,
-    MessageHandler, filters, ConversationHandler
+    MessageHandler, filters, ConversationHandler, TypeHandler, InlineQueryHandler
 )
 from telegram.error import BadRequest
 from telegram.constants import ParseMode
 from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from .models import (
     TelegramUser, Customer, Category, MenuItem, Cart, CartItem, Order, OrderItem
 )
+from . import history
+from .archive import customer_order_lines, customer_orders, get_customer_order
+from .services import place_order, placed_order, request_key, touch_cart
+from config import db_router
+from .instrumentation import instrumented
+from .recommendations import RECOMMENDATIONS
+from .search import MENU_SEARCH, photo_cache_key
+from monitoring.metrics import record_cache
+from monitoring.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 # Константы состояний
 ORDER_TYPE, ADDRESS = range(2)
 
+# Снимок последнего заказа для «Повторить заказ» (обновляется при каждом оформлении в боте)
+LAST_ORDER_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+@traced
 @sync_to_async
 def get_or_create_user(chat_id, username=None):
     user, _ = TelegramUser.objects.get_or_create(chat_id=chat_id)
@@ -38,15 +55,131 @@ def get_all_categories():
 def get_items_by_category(slug):
     return list(MenuItem.objects.filter(category__slug=slug, is_available=True))
 
+ORDER_STATUS_ICONS = {'pending': '⏳', 'confirmed': '✅', 'completed': '✔️', 'canceled': '❌'}
+ORDER_STATUS_TEXT = {
+    'pending': '⏳ Обрабатывается',
+    'confirmed': '✅ Подтверждён',
+    'completed': '📦 Выполнен',
+    'canceled': '❌ Отменён',
+}
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+def encode_orders_cursor(before):
+    # В callback_data влезает 64 байта: created_at в микросекундах и id
+    created_at, order_id = before
+    return f'{(created_at - _EPOCH) // timedelta(microseconds=1)}_{order_id}'
+
+def decode_orders_cursor(cursor):
+    created_us, order_id = cursor.split('_')
+    return _EPOCH + timedelta(microseconds=int(created_us)), int(order_id)
+
+def render_orders_page(user, cursor):
+    """Страница «Мои заказы»: текст, кнопки заказов и курсор следующей страницы"""
+    # Заголовки заказов из живых и архивных таблиц (с реплики, если она есть)
+    with db_router.replica_reads():
+        orders, before = customer_orders(
+            limit=settings.BOT_ORDERS_PAGE_SIZE,
+            before=decode_orders_cursor(cursor) if cursor else None,
+            customer__telegram_user=user,
+        )
+    text = "📋 *Ваши заказы:*\n\n"
+    for order in orders:
+        text += (
+            f"• *Заказ #{order.id}*\n"
+            f"  💰 {order.total_price}₽ | {ORDER_STATUS_TEXT.get(order.status, order.status)}\n"
+            f"  📅 {order.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+        )
+    return {
+        'text': text,
+        'orders': [
+            (order.id, f"{ORDER_STATUS_ICONS.get(order.status, '❓')} Заказ #{order.id} — {order.total_price}₽")
+            for order in orders
+        ],
+        'next': encode_orders_cursor(before) if before else None,
+    }
+
+@traced
+@sync_to_async
+def get_user_orders_page(user, cursor=None):
+    # Отрисованные страницы кэшируются до изменения любого заказа пользователя (bot.history)
+    return history.get_page(user.id, cursor, lambda: render_orders_page(user, cursor))
+
+@sync_to_async
+def get_user_order(user, order_id):
+    # Заказ с позициями и блюдами одним запросом
+    with db_router.replica_reads():
+        return customer_order_lines(order_id, customer__telegram_user=user)
+
+def last_order_key(user):
+    return history.last_order_key(user.chat_id)
+
+def order_snapshot(order):
+    """Что нужно для повтора заказа: тип, адрес и позиции (id, количество)"""
+    return {
+        'order_id': order.id,
+        'order_type': order.order_type,
+        'address': order.address,
+        'lines': [(line.item_id, line.quantity) for line in order.items.all()],
+    }
+
+def load_last_order(user):
+    """Снимок последнего заказа из кэша; при промахе — один запрос и запись в кэш"""
+    key = last_order_key(user)
+    snapshot = cache.get(key)
+    record_cache('last_order', snapshot is not None)
+    if snapshot is None:
+        order = (
+            Order.objects.filter(customer__telegram_user=user).exclude(status='canceled')
+            .order_by('-created_at').prefetch_related('items').first()
+        )
+        # Пустой снимок тоже кэшируем: у новичков /start не ходит в БД за заказами
+        snapshot = order_snapshot(order) if order else {}
+        cache.set(key, snapshot, LAST_ORDER_CACHE_TIMEOUT)
+    return snapshot or None
+
+get_last_order = sync_to_async(load_last_order)
+
+@sync_to_async
+def get_reorder(user, order_id=None):
+    """
+    Снимок заказа для повтора и его позиции по текущему меню:
+    (снимок, [(MenuItem, количество)], [названия недоступных]).
+    Доступность и цены — одним запросом.
+    """
+    snapshot = load_last_order(user)
+    if order_id is not None and (snapshot is None or snapshot['order_id'] != order_id):
+        order = get_customer_order(order_id, customer__telegram_user=user)
+        snapshot = order_snapshot(order) if order else None
+    if not snapshot:
+        return None, [], []
+    items = MenuItem.objects.in_bulk([item_id for item_id, _ in snapshot['lines']])
+    lines, missing = [], []
+    for item_id, quantity in snapshot['lines']:
+        item = items.get(item_id)
+        if item is not None and item.is_available:
+            lines.append((item, quantity))
+        elif item is not None:
+            missing.append(item.name)
+    return snapshot, lines, missing
+
+@traced
 @sync_to_async
-def get_user_orders(user):
-    return list(
-        Order.objects
-        .filter(customer__telegram_user=user)
-        .prefetch_related('items__item')  # опционально: для деталей
-        .order_by('-created_at')[:10]  # последние 10 заказов
+def place_reorder(user, snapshot, lines, idempotency_key):
+    customer = Customer.objects.get(telegram_user=user)
+    order = place_order(
+        customer, snapshot['order_type'], snapshot['address'], lines,
+        channel=Order.BOT, idempotency_key=idempotency_key,
     )
+    cache.set(last_order_key(user), order_snapshot(order), LAST_ORDER_CACHE_TIMEOUT)
+    return order
+
+async def bind_db_actor(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Автор записей для защиты от отставания реплики — чат апдейта
+    # (у inline-запросов чата нет — берём пользователя: его личный чат с тем же id)
+    chat = update.effective_chat or update.effective_user
+    db_router.bind_actor(f'tg:{chat.id}' if chat else None)
 
+@traced
 @sync_to_async
 def add_item_to_cart_db(user: TelegramUser, item_id: int) -> str:
     logger.info(f"Добавление товара {item_id} в корзину пользователя {user.chat_id}")
@@ -66,6 +199,7 @@ def add_item_to_cart_db(user: TelegramUser, item_id: int) -> str:
         if not created:
             cart_item.quantity += 1
             cart_item.save()
+        touch_cart(pk=cart.pk)
         logger.info(f"Товар '{item.name}' добавлен. Количество: {cart_item.quantity}")
         return item.name
     except Exception as e:
@@ -95,6 +229,7 @@ async def decrease_quantity(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await sync_to_async(cart_item.save)()
         else:
             await sync_to_async(cart_item.delete)()
+        await sync_to_async(touch_cart)(pk=cart_item.cart_id)
 
         # Перезагружаем и показываем корзину
         await show_cart(update, context)
@@ -125,11 +260,13 @@ async def remove_from_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if deleted == 0:
             await query.answer("❌ Товар не найден.", show_alert=True)
         else:
+            await sync_to_async(touch_cart)(customer__telegram_user=user)
             await show_cart(update, context)  # ← обновить корзину
     except Exception as e:
         logger.error(f"Ошибка удаления: {e}")
         await query.answer("⚠️ Не удалось удалить товар.", show_alert=True)
 
+@traced
 @sync_to_async
 def get_user_cart(user: TelegramUser):
     try:
@@ -142,13 +279,16 @@ def get_user_cart(user: TelegramUser):
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    await get_or_create_user(chat_id, update.effective_user.username)
+    user = await get_or_create_user(chat_id, update.effective_user.username)
 
     categories = await get_all_categories()
     keyboard = [
         [InlineKeyboardButton(f"{cat.emoji} {cat.name}", callback_data=f'menu_{cat.slug}')]
         for cat in categories
     ]
+    # Постоянным гостям — повтор прошлого заказа в два нажатия
+    if await get_last_order(user):
+        keyboard.insert(0, [InlineKeyboardButton("🔁 Повторить заказ", callback_data='reorder')])
     keyboard += [
         [InlineKeyboardButton("🛒 Корзина", callback_data='cart')],
         [InlineKeyboardButton("📋 Мои заказы", callback_data='my_orders')],
@@ -226,16 +366,28 @@ async def show_item_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         # ✅ Проверяем изображение
-        if item.image and os.path.exists(item.image.path):
+        file_id = await get_photo_file_id(item.image.name) if item.image else None
+        if file_id or (item.image and os.path.exists(item.image.path)):
             # 📸 Отправляем НОВОЕ сообщение с фото (не редактируем и не удаляем старое!)
-            with open(item.image.path, 'rb') as photo_file:
+            # Уже загруженное фото шлём по file_id — без повторной загрузки файла
+            if file_id:
                 await context.bot.send_photo(
                     chat_id=chat_id,
-                    photo=photo_file,
+                    photo=file_id,
                     caption=caption,
                     reply_markup=reply_markup,
                     parse_mode=ParseMode.MARKDOWN
                 )
+            else:
+                with open(item.image.path, 'rb') as photo_file:
+                    message = await context.bot.send_photo(
+                        chat_id=chat_id,
+                        photo=photo_file,
+                        caption=caption,
+                        reply_markup=reply_markup,
+                        parse_mode=ParseMode.MARKDOWN
+                    )
+                await sync_to_async(MENU_SEARCH.photo_uploaded)(item.image.name, message.photo[-1].file_id)
             # ✅ Опционально: отредактировать старое сообщение → "Подробнее → фото отправлено выше"
             try:
                 await query.edit_message_text(
@@ -268,6 +420,38 @@ async def show_item_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode=ParseMode.MARKDOWN
         )
 
+@sync_to_async
+def get_photo_file_id(image_name):
+    file_id = cache.get(photo_cache_key(image_name))
+    # Промах — фото меню загружается в Telegram заново
+    record_cache('menu_photo', file_id is not None)
+    return file_id
+
+async def inline_menu_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """@бот латте — поиск по меню из индекса в памяти, без обращений к БД"""
+    query = update.inline_query
+    results = MENU_SEARCH.search(query.query)
+    if results is None:
+        # Индекс ещё не построен (первый запрос в процессе webhook)
+        await sync_to_async(MENU_SEARCH.refresh)()
+        results = MENU_SEARCH.search(query.query)
+    await query.answer(results, cache_time=settings.BOT_INLINE_CACHE_TIME, is_personal=False)
+
+async def add_to_cart_inline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопка «В корзину» под результатом inline-поиска: сообщение может быть в чужом чате"""
+    query = update.callback_query
+    item_id = int(query.data.split('_')[1])
+    user = await get_or_create_user(update.effective_user.id)
+    item_name = await add_item_to_cart_db(user, item_id)
+    await query.answer(f"✅ {item_name} добавлен в корзину. Оформить — в чате с ботом.")
+
+@sync_to_async
+def get_cart_suggestion(user):
+    """«Часто берут вместе» к текущей корзине: (id, название, цена) или None"""
+    item_ids = CartItem.objects.filter(cart__customer__telegram_user=user).values_list('item_id', flat=True)
+    suggestions = RECOMMENDATIONS.suggest(list(item_ids))
+    return suggestions[0] if suggestions else None
+
 async def add_to_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -278,15 +462,19 @@ async def add_to_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Добавляем в корзину и получаем имя товара
     item_name = await add_item_to_cart_db(user, item_id)
+    suggestion = await get_cart_suggestion(user)
     
     keyboard = [
         [InlineKeyboardButton("🛒 В корзину", callback_data='cart')],
         [InlineKeyboardButton("➕ Ещё один", callback_data=f'add_{item_id}')],
         [InlineKeyboardButton("🔙 Назад", callback_data='start')],
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     text = f"✅ *{item_name}* добавлен в корзину!"
+    if suggestion:
+        other_id, other_name, other_price = suggestion
+        keyboard.insert(1, [InlineKeyboardButton(f"➕ {other_name} — {other_price}₽", callback_data=f'add_{other_id}')])
+        text += f"\n\nЧасто берут вместе: *{other_name}*"
+    reply_markup = InlineKeyboardMarkup(keyboard)
     
     # ✅ ИСПОЛЬЗУЕМ safe_edit_or_send вместо query.edit_message_text
     await safe_edit_or_send(
@@ -296,6 +484,7 @@ async def add_to_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+@traced
 async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -370,49 +559,32 @@ async def show_my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     chat_id = update.effective_chat.id
     user = await get_or_create_user(chat_id)
-    orders = await get_user_orders(user)
+    # my_orders — первая страница, my_orders_<курсор> — следующие
+    cursor = query.data[len('my_orders_'):] or None
+    page = await get_user_orders_page(user, cursor)
 
-    if not orders:
+    if not page['orders']:
         text = "📭 У вас пока нет заказов.\n\nСделайте первый заказ — мы приготовим его с любовью! ☕"
-        keyboard = []
-        for order in orders[:5]:  # показываем кнопки только для первых 5 (чтобы не перегружать)
-            status_short = {'pending': '⏳', 'confirmed': '✅', 'completed': '✔️', 'canceled': '❌'}.get(order.status, '❓')
-            btn_text = f"{status_short} Заказ #{order.id} — {order.total_price}₽"
-            keyboard.append([InlineKeyboardButton(btn_text, callback_data=f'order_{order.id}')])
-
-        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data='start')])
-        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='start')]]
+        await safe_edit_or_send(query, text, reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
-    # Формируем список заказов
-    text = "📋 *Ваши заказы:*\n\n"
-    for order in orders:
-        # Статус (можно добавить в модель Order.choices, но пока просто текст)
-        status_map = {
-            'pending': '⏳ Обрабатывается',
-            'confirmed': '✅ Подтверждён',
-            'completed': '📦 Выполнен',
-            'canceled': '❌ Отменён',
-        }
-        status = status_map.get(order.status, order.status)
-
-        text += (
-            f"• *Заказ #{order.id}*\n"
-            f"  💰 {order.total_price}₽ | {status}\n"
-            f"  📅 {order.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-        )
-
-    keyboard = [
-        [InlineKeyboardButton("🔍 Подробности заказа", callback_data='order_details_info')],
-        [InlineKeyboardButton("🔙 Назад", callback_data='start')],
+    keyboard = [[InlineKeyboardButton("🔁 Повторить последний заказ", callback_data='reorder')]]
+    keyboard += [
+        [InlineKeyboardButton(btn_text, callback_data=f'order_{order_id}')]
+        for order_id, btn_text in page['orders']
     ]
+    pager = []
+    if cursor:
+        pager.append(InlineKeyboardButton("⏮ Последние", callback_data='my_orders'))
+    if page['next']:
+        pager.append(InlineKeyboardButton("Ранее ➡️", callback_data=f"my_orders_{page['next']}"))
+    if pager:
+        keyboard.append(pager)
+    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data='start')])
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    await query.edit_message_text(
-        text,
-        reply_markup=reply_markup,
-        parse_mode="Markdown"
-    )
+    await safe_edit_or_send(query, page['text'], reply_markup=reply_markup, parse_mode="Markdown")
 
 async def show_order_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -427,14 +599,9 @@ async def show_order_details(update: Update, context: ContextTypes.DEFAULT_TYPE)
     chat_id = update.effective_chat.id
     user = await get_or_create_user(chat_id)
 
-    try:
-        # Получаем заказ с проверкой принадлежности
-        order = await sync_to_async(
-            Order.objects.select_related('user')
-            .prefetch_related('items__item')
-            .get
-        )(id=order_id, user=user)
-    except Order.DoesNotExist:
+    # Получаем заказ с проверкой принадлежности (в том числе из архива)
+    order, lines = await get_user_order(user, order_id)
+    if order is None:
         await query.edit_message_text("🔒 Заказ не найден или не принадлежит вам.")
         return
 
@@ -460,10 +627,14 @@ async def show_order_details(update: Update, context: ContextTypes.DEFAULT_TYPE)
         text += f"**Тип:** Самовывоз\n"
 
     text += "\n**Состав заказа:**\n"
-    for item in order.items.all():
-        text += f"• {item.item.name} ×{item.quantity} — {item.item.price}₽\n"
+    for item in lines:
+        # У архивных позиций цена зафиксирована на момент архивации
+        text += f"• {item.item.name} ×{item.quantity} — {getattr(item, 'price', item.item.price)}₽\n"
 
-    keyboard = [[InlineKeyboardButton("🔙 Назад к заказам", callback_data='my_orders')]]
+    keyboard = [
+        [InlineKeyboardButton("🔁 Повторить этот заказ", callback_data=f'reorder_{order.id}')],
+        [InlineKeyboardButton("🔙 Назад к заказам", callback_data='my_orders')],
+    ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
     await query.edit_message_text(
@@ -519,64 +690,132 @@ async def address_received(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return await create_order(update, context)
 
 @sync_to_async
-def create_order_in_db(user: TelegramUser, order_type, address, items):
+def get_placed_order(key):
+    return placed_order(key)
+
+def order_request_key(update: Update):
+    """
+    Ключ идемпотентности оформления. Повторная доставка апдейта даёт тот же
+    ключ; двойное нажатие кнопки — тоже: у обоих нажатий одно и то же
+    состояние сообщения (id и время последней правки), а новое оформление
+    в том же сообщении проходит через новые правки.
+    """
+    message = update.effective_message
+    if update.callback_query:
+        edited = message.edit_date or message.date
+        return request_key(Order.BOT, message.chat_id, message.message_id, int(edited.timestamp()), update.callback_query.data)
+    return request_key(Order.BOT, message.chat_id, message.message_id)
+
+@traced
+@sync_to_async
+def create_order_in_db(user: TelegramUser, order_type, address, items, idempotency_key=None):
     customer = Customer.objects.get(telegram_user=user)
-    total = sum(item.item.price * item.quantity for item in items)
-
-    order = Order.objects.create(
-        customer=customer,
-        order_type=order_type,
-        address=address if order_type == 'delivery' else None,
-        total_price=total
-    )
-    
-    for item in items:
-        OrderItem.objects.create(
-            order=order,
-            item=item.item,
-            quantity=item.quantity
+    with transaction.atomic():
+        order = place_order(
+            customer, order_type, address,
+            [(item.item, item.quantity) for item in items],
+            channel=Order.BOT, idempotency_key=idempotency_key,
         )
-    
-    # Очистка корзины
-    Cart.objects.filter(customer__telegram_user=user).delete()
-    
+        # Очистка корзины
+        Cart.objects.filter(customer__telegram_user=user).delete()
+    cache.set(last_order_key(user), order_snapshot(order), LAST_ORDER_CACHE_TIMEOUT)
     return order
 
-async def create_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    chat_id = update.effective_chat.id
-    user = await get_or_create_user(chat_id)
-    cart, items = await get_user_cart(user)
-    
-    if not items:
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text="Ваша корзина пуста! Сначала добавьте товары.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 В меню", callback_data='start')
-            ]])
-        )
-        return ConversationHandler.END
-    
-    order_type = context.user_data['order_type']
-    address = context.user_data.get('address', '')
-    
-    order = await create_order_in_db(user, order_type, address, items)
-    
-    # Формирование сообщения о заказе
-    order_type_text = "Доставка" if order_type == 'delivery' else "Самовывоз"
+def order_confirmation_text(order):
     message = (
         f"✅ *Заказ #{order.id} успешно оформлен!*\n\n"
-        f"*Тип заказа:* {order_type_text}\n"
+        f"*Тип заказа:* {order.get_order_type_display()}\n"
     )
-    
-    if address:
-        message += f"*Адрес:* {address}\n"
-    
+    if order.address:
+        message += f"*Адрес:* {order.address}\n"
     message += (
         f"*Сумма:* {order.total_price}₽\n\n"
         "⏳ В ближайшее время с вами свяжется оператор для подтверждения заказа.\n\n"
         "Благодарим за выбор Coffee House! 😊"
     )
+    return message
+
+async def reorder(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Первое нажатие: состав прошлого заказа по текущим ценам и кнопка «Оформить»"""
+    query = update.callback_query
+    await query.answer()
+
+    _, _, order_id = query.data.partition('_')
+    user = await get_or_create_user(update.effective_chat.id)
+    snapshot, lines, missing = await get_reorder(user, int(order_id) if order_id else None)
+    back = [InlineKeyboardButton("🔙 В главное меню", callback_data='start')]
+    if not lines:
+        text = "😔 Из прошлого заказа сейчас ничего нет в наличии." if snapshot else "📭 У вас пока нет заказов."
+        await safe_edit_or_send(query, text, reply_markup=InlineKeyboardMarkup([back]))
+        return
+
+    total = sum(item.price * quantity for item, quantity in lines)
+    text = "🔁 *Повторить заказ:*\n\n"
+    text += "".join(f"• {item.name} ×{quantity} — {item.price * quantity}₽\n" for item, quantity in lines)
+    if missing:
+        text += "\n_Сейчас нет в наличии:_ " + ", ".join(missing) + "\n"
+    if snapshot['order_type'] == Order.DELIVERY and snapshot['address']:
+        text += f"\n*Доставка:* {snapshot['address']}\n"
+    else:
+        text += "\n*Самовывоз*\n"
+    text += f"*Итого:* {total}₽"
+    keyboard = [
+        [InlineKeyboardButton(f"✅ Оформить за {total}₽", callback_data=f"reorder_ok_{snapshot['order_id']}")],
+        back,
+    ]
+    await safe_edit_or_send(query, text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
+
+async def reorder_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Второе нажатие: новый заказ прямо из позиций прошлого, минуя корзину"""
+    query = update.callback_query
+    await query.answer()
+
+    key = order_request_key(update)
+    order = await get_placed_order(key)
+    if order is None:
+        user = await get_or_create_user(update.effective_chat.id)
+        snapshot, lines, _ = await get_reorder(user, int(query.data.rsplit('_', 1)[1]))
+        if not lines:
+            await safe_edit_or_send(
+                query, "😔 Из прошлого заказа сейчас ничего нет в наличии.",
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 В меню", callback_data='start')]]),
+            )
+            return
+        order = await place_reorder(user, snapshot, lines, key)
+
+    keyboard = [[InlineKeyboardButton("🔙 В главное меню", callback_data='start')]]
+    await query.edit_message_text(
+        order_confirmation_text(order), reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown"
+    )
+
+async def create_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    key = order_request_key(update)
+    # Повтор уже выполненного оформления — тот же ответ, без записи в БД
+    order = await get_placed_order(key)
+    if order is None:
+        user = await get_or_create_user(chat_id)
+        cart, items = await get_user_cart(user)
+
+        if not items:
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text="Ваша корзина пуста! Сначала добавьте товары.",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔙 В меню", callback_data='start')
+                ]])
+            )
+            return ConversationHandler.END
+
+        order_type = context.user_data['order_type']
+        address = context.user_data.get('address', '')
+
+        order = await create_order_in_db(user, order_type, address, items, idempotency_key=key)
+    # Данные оформления больше не нужны — не держим их в user_data
+    context.user_data.pop('order_type', None)
+    context.user_data.pop('address', None)
+    
+    message = order_confirmation_text(order)
     
     keyboard = [[InlineKeyboardButton("🔙 В главное меню", callback_data='start')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -675,33 +914,41 @@ async def clear_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 def register_handlers(application):
     """Регистрация всех обработчиков бота"""
+    application.add_handler(TypeHandler(Update, bind_db_actor), group=-2)
+
     # Обработчики команд
-    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("start", instrumented(start)))
     
     # Обработчики кнопок меню
-    application.add_handler(CallbackQueryHandler(start, pattern='^start$'))
-    application.add_handler(CallbackQueryHandler(show_menu, pattern='^menu_'))
-    application.add_handler(CallbackQueryHandler(show_item_details, pattern='^item_\\d+$'))
-    application.add_handler(CallbackQueryHandler(add_to_cart, pattern='^add_\\d+$'))
-    application.add_handler(CallbackQueryHandler(show_cart, pattern='^cart$'))
-    application.add_handler(CallbackQueryHandler(show_info, pattern='^info$'))
-    application.add_handler(CallbackQueryHandler(clear_cart, pattern='^clear_cart$'))
-    application.add_handler(CallbackQueryHandler(show_my_orders, pattern='^my_orders$'))
-    application.add_handler(CallbackQueryHandler(show_order_details, pattern=r'^order_\d+$'))
-    application.add_handler(CallbackQueryHandler(decrease_quantity, pattern=r'^decrease_\d+$'))
-    application.add_handler(CallbackQueryHandler(remove_from_cart, pattern=r'^remove_\d+$'))
-    application.add_handler(CallbackQueryHandler(noop, pattern='^noop$'))
+    application.add_handler(CallbackQueryHandler(instrumented(start), pattern='^start$'))
+    application.add_handler(CallbackQueryHandler(instrumented(show_menu), pattern='^menu_'))
+    application.add_handler(CallbackQueryHandler(instrumented(show_item_details), pattern='^item_\\d+$'))
+    application.add_handler(CallbackQueryHandler(instrumented(add_to_cart), pattern='^add_\\d+$'))
+    application.add_handler(CallbackQueryHandler(instrumented(add_to_cart_inline), pattern='^iadd_\\d+$'))
+    application.add_handler(InlineQueryHandler(instrumented(inline_menu_search)))
+    application.add_handler(CallbackQueryHandler(instrumented(show_cart), pattern='^cart$'))
+    application.add_handler(CallbackQueryHandler(instrumented(show_info), pattern='^info$'))
+    application.add_handler(CallbackQueryHandler(instrumented(clear_cart), pattern='^clear_cart$'))
+    application.add_handler(CallbackQueryHandler(instrumented(show_my_orders), pattern=r'^my_orders(_\d+_\d+)?$'))
+    application.add_handler(CallbackQueryHandler(instrumented(show_order_details), pattern=r'^order_\d+$'))
+    application.add_handler(CallbackQueryHandler(instrumented(reorder), pattern=r'^reorder(_\d+)?$'))
+    application.add_handler(CallbackQueryHandler(instrumented(reorder_confirm), pattern=r'^reorder_ok_\d+$'))
+    application.add_handler(CallbackQueryHandler(instrumented(decrease_quantity), pattern=r'^decrease_\d+$'))
+    application.add_handler(CallbackQueryHandler(instrumented(remove_from_cart), pattern=r'^remove_\d+$'))
+    application.add_handler(CallbackQueryHandler(instrumented(noop), pattern='^noop$'))
 
     # Диалог оформления заказа
     conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(checkout_start, pattern='^checkout$')],
+        entry_points=[CallbackQueryHandler(instrumented(checkout_start), pattern='^checkout$')],
         states={
-            ORDER_TYPE: [CallbackQueryHandler(order_type_selected, pattern='^(delivery|pickup)$')],
-            ADDRESS: [MessageHandler(filters.TEXT & ~filters.COMMAND, address_received)],
+            ORDER_TYPE: [CallbackQueryHandler(instrumented(order_type_selected), pattern='^(delivery|pickup)$')],
+            ADDRESS: [MessageHandler(filters.TEXT & ~filters.COMMAND, instrumented(address_received))],
         },
         fallbacks=[CommandHandler('cancel', lambda u, c: ConversationHandler.END)],
         per_chat=True,
-        per_message=False
+        per_message=False,
+        # Иначе состояние брошенного диалога живёт в памяти до рестарта
+        conversation_timeout=settings.BOT_CONVERSATION_TIMEOUT,
     )
     
     application.add_handler(conv_handler)
\ No newline at end of file
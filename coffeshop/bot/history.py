@@ -0,0 +1,61 @@
+"""
+«Мои заказы» в боте: кэш отрисованных страниц истории.
+
+Страница кэшируется под ключом с версией истории пользователя. Любое
+изменение его заказа (оформление, смена статуса, удаление) записывает
+новую версию — старые страницы перестают читаться и доживают свой
+BOT_ORDERS_PAGE_CACHE_TIMEOUT. Архивация заказ не меняет, поэтому версию
+не трогает.
+
+Здесь же ключ снимка последнего заказа (повтор в один тап): его удаляют при
+тех же изменениях заказов.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from monitoring.metrics import record_cache
+
+
+def _version_key(telegram_user_id):
+    return f'order-history:version:{telegram_user_id}'
+
+
+def get_history_version(telegram_user_id):
+    key = _version_key(telegram_user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_history_versions(telegram_user_ids):
+    """Сбрасывает страницы истории пользователей одним set_many"""
+    version = time.time_ns() // 1000
+    cache.set_many({_version_key(user_id): version for user_id in set(telegram_user_ids) if user_id}, None)
+
+
+def page_key(telegram_user_id, cursor):
+    return f'order-history:page:{telegram_user_id}:{get_history_version(telegram_user_id)}:{cursor or "first"}'
+
+
+def get_page(telegram_user_id, cursor, render):
+    """Страница истории из кэша; при промахе — render() и запись в кэш"""
+    key = page_key(telegram_user_id, cursor)
+    page = cache.get(key)
+    record_cache('order_history', page is not None)
+    if page is None:
+        page = render()
+        cache.set(key, page, settings.BOT_ORDERS_PAGE_CACHE_TIMEOUT)
+    return page
+
+
+def last_order_key(chat_id):
+    return f'last-order:{chat_id}'
+
+
+def forget_last_orders(chat_ids):
+    """Удаляет снимки последнего заказа: следующий повтор перечитает его из БД"""
+    cache.delete_many([last_order_key(chat_id) for chat_id in set(chat_ids) if chat_id])
@@ -0,0 +1,50 @@
+import time
+from functools import wraps
+
+from telegram.request import HTTPXRequest
+
+from monitoring import tracing
+from monitoring.metrics import (
+    BOT_HANDLER_ERRORS, BOT_UPDATE_DURATION, TELEGRAM_API_DURATION, TELEGRAM_API_ERRORS
+)
+
+
+def instrumented(callback):
+    """Оборачивает обработчик: время обработки Update, ошибки и трасса по имени обработчика"""
+    name = callback.__name__
+    duration = BOT_UPDATE_DURATION.labels(name)
+    errors = BOT_HANDLER_ERRORS.labels(name)
+
+    @wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        chat = update.effective_chat
+        try:
+            with tracing.start_trace(name, chat_id=chat.id if chat else None, update_id=update.update_id):
+                return await callback(update, context)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest с замером латентности и ошибок Bot API по методу"""
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        start = time.perf_counter()
+        try:
+            with tracing.span(f'api.{api_method}'):
+                status, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+        except Exception as e:
+            TELEGRAM_API_ERRORS.labels(api_method, type(e).__name__).inc()
+            raise
+        finally:
+            TELEGRAM_API_DURATION.labels(api_method).observe(time.perf_counter() - start)
+        if status >= 400:
+            TELEGRAM_API_ERRORS.labels(api_method, str(status)).inc()
+        return status, payload
@@ -0,0 +1,200 @@
+"""
+Плановое обслуживание БД: брошенные корзины, просроченные сессии,
+архив заказов и статистика/вакуум SQLite.
+
+Задачи запускает run_bot (раз в MAINTENANCE_INTERVAL секунд, в отдельном
+потоке) или manage.py maintenance. Тяжёлые задачи (off_peak) выполняются
+только в окне MAINTENANCE_WINDOW и не чаще раза в сутки.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from monitoring.metrics import Gauge, Histogram
+from . import archive
+from .models import Cart, CartItem, OrderRequest
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_JOB_DURATION = Histogram(
+    'maintenance_job_duration_seconds',
+    'Длительность задач обслуживания',
+    ['job'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+MAINTENANCE_JOB_ROWS = Gauge(
+    'maintenance_job_rows',
+    'Сколько строк обработала последняя успешная задача обслуживания',
+    ['job'],
+)
+
+# Пустая корзина (например, после оформления заказа на сайте) живёт сутки
+EMPTY_CART_TTL = timedelta(days=1)
+DB_SESSION_ENGINES = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+# Страниц на один PRAGMA incremental_vacuum
+VACUUM_PAGES = 2000
+
+
+def _delete_carts(ids):
+    qn = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    # Без ORM-каскада: корзины и их позиции удаляются двумя DELETE на пачку
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {qn(CartItem._meta.db_table)} WHERE cart_id IN ({placeholders})', ids)
+        cursor.execute(f'DELETE FROM {qn(Cart._meta.db_table)} WHERE id IN ({placeholders})', ids)
+        return cursor.rowcount
+
+
+def expire_carts(days=None, batch_size=None):
+    """Удаляет корзины без изменений дольше days дней и пустые корзины старше суток"""
+    days = settings.CART_EXPIRE_DAYS if days is None else days
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    now = timezone.now()
+    querysets = [
+        Cart.objects.filter(updated_at__lt=now - timedelta(days=days)),
+        Cart.objects.filter(updated_at__lt=now - EMPTY_CART_TTL, items__isnull=True),
+    ]
+    deleted = 0
+    for queryset in querysets:
+        ids = queryset.order_by('id').values_list('id', flat=True)
+        while True:
+            # Короткие транзакции: не держим блокировку записи SQLite между пачками
+            with transaction.atomic():
+                batch = list(ids[:batch_size])
+                if not batch:
+                    break
+                deleted += _delete_carts(batch)
+    return deleted
+
+
+def prune_sessions(batch_size=None):
+    """Удаляет просроченные сессии Django (аналог manage.py clearsessions, но пачками)"""
+    if settings.SESSION_ENGINE not in DB_SESSION_ENGINES:
+        import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+        return 0
+    from django.contrib.sessions.models import Session
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    keys = Session.objects.filter(expire_date__lt=timezone.now()).values_list('session_key', flat=True)
+    deleted = 0
+    while True:
+        batch = list(keys[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=batch).delete()[0]
+
+
+def prune_order_requests(batch_size=None):
+    """Удаляет ключи идемпотентности оформления старше ORDER_IDEMPOTENCY_TTL секунд"""
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(seconds=settings.ORDER_IDEMPOTENCY_TTL)
+    ids = OrderRequest.objects.filter(created_at__lt=cutoff).order_by('id').values_list('id', flat=True)
+    deleted = 0
+    while True:
+        batch = list(ids[:batch_size])
+        if not batch:
+            return deleted
+        deleted += OrderRequest.objects.filter(id__in=batch).delete()[0]
+
+
+def archive_old_orders():
+    if settings.ORDER_ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+    return archive.archive_orders()
+
+
+def optimize_db():
+    """ANALYZE через PRAGMA optimize и, если включён incremental auto_vacuum, возврат свободных страниц"""
+    if connection.vendor != 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return 0
+    with connection.cursor() as cursor:
+        # analysis_limit ограничивает ANALYZE выборкой строк — быстро даже на больших таблицах
+        cursor.execute('PRAGMA analysis_limit = 1000')
+        cursor.execute('PRAGMA optimize')
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != 2:
+            return 0
+        cursor.execute('PRAGMA freelist_count')
+        free_before = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES})')
+        cursor.fetchall()
+        cursor.execute('PRAGMA freelist_count')
+        return free_before - cursor.fetchone()[0]
+
+
+def enable_incremental_vacuum():
+    """Однократно: перевод файла SQLite в auto_vacuum=INCREMENTAL (полный VACUUM, блокирует БД)"""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    func: object
+    off_peak: bool = False
+
+
+JOBS = {job.name: job for job in (
+    Job('expire_carts', expire_carts),
+    Job('prune_sessions', prune_sessions),
+    Job('prune_order_requests', prune_order_requests),
+    Job('archive_orders', archive_old_orders, off_peak=True),
+    Job('optimize_db', optimize_db, off_peak=True),
+)}
+
+
+def in_window(now=None):
+    """Попадает ли локальное время в окно обслуживания MAINTENANCE_WINDOW (часы [начало, конец))"""
+    start, end = settings.MAINTENANCE_WINDOW
+    hour = timezone.localtime(now).hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+class MaintenanceRunner:
+    def __init__(self, names=None):
+        self.jobs = [JOBS[name] for name in names] if names else list(JOBS.values())
+        self.last_off_peak = {}
+
+    def due(self, job, now):
+        if not job.off_peak:
+            return True
+        return in_window(now) and self.last_off_peak.get(job.name) != timezone.localdate(now)
+
+    def run(self, force=False):
+        """Выполняет задачи по очереди; возвращает [(имя, строк или None, секунды)]"""
+        now = timezone.now()
+        report = []
+        for job in self.jobs:
+            if not force and not self.due(job, now):
+                continue
+            started = time.monotonic()
+            try:
+                rows = job.func()
+            except Exception:
+                logger.exception(f'Задача обслуживания {job.name} упала')
+                rows = None
+            elapsed = time.monotonic() - started
+            MAINTENANCE_JOB_DURATION.labels(job.name).observe(elapsed)
+            if rows is not None:
+                MAINTENANCE_JOB_ROWS.labels(job.name).set(rows)
+                if job.off_peak:
+                    self.last_off_peak[job.name] = timezone.localdate(now)
+            logger.info(f'Обслуживание: {job.name} — {rows if rows is not None else "ошибка"} за {elapsed * 1000:.0f} мс')
+            report.append((job.name, rows, elapsed))
+        return report
+
+    def run_in_thread(self):
+        """Для asyncio.to_thread: соединение с БД закрывается вместе с потоком задачи"""
+        try:
+            return self.run()
+        finally:
+            connection.close()
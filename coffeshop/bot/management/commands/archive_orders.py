@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bot import archive
+
+
+class Command(BaseCommand):
+    help = 'Перенос старых завершённых и отменённых заказов в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Архивировать заказы старше N дней (по умолчанию ORDER_ARCHIVE_AFTER_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+            help='Заказов в одной транзакции'
+        )
+        parser.add_argument('--max-batches', type=int, help='Остановиться после N пачек')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать кандидатов')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--days и --batch-size должны быть положительными')
+        before = archive.archive_cutoff(options['days'])
+
+        if options['dry_run']:
+            count = archive.archivable_orders(before).count()
+            self.stdout.write(f'К архивации: {count} заказов старше {before:%Y-%m-%d %H:%M}')
+            return
+
+        started = time.monotonic()
+        moved = archive.archive_orders(
+            before, options['batch_size'], options['max_batches'],
+            progress=lambda moved: self.stdout.write(f'Перенесено: {moved}', ending='\r'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив: {moved} заказов за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from bot.models import Order
+
+# Списки и формы, которые тормозили на больших таблицах
+DEFAULT_PAGES = (
+    ('bot_order_changelist', ''),
+    ('bot_order_changelist', '?status=completed'),
+    ('bot_order_changelist', '?o=-1'),
+    ('bot_orderitem_changelist', ''),
+    ('bot_cart_changelist', ''),
+    ('bot_cartitem_changelist', ''),
+    ('bot_customer_changelist', ''),
+    ('bot_customer_changelist', '?q=Seed'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Замер времени и числа SQL-запросов страниц админки (удобно после seed_orders)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз запрашивать каждую страницу')
+        parser.add_argument('--url', action='append', help='Дополнительный путь для замера (можно несколько)')
+
+    def handle(self, *args, **options):
+        urls = [reverse(f'admin:{name}') + query for name, query in DEFAULT_PAGES]
+        last_order = Order.objects.order_by('-id').values_list('id', flat=True).first()
+        if last_order:
+            urls.append(reverse('admin:bot_order_change', args=[last_order]))
+        urls.extend(options['url'] or [])
+
+        self.stdout.write(f"{'страница':<60} {'медиана':>10} {'макс':>10} {'SQL':>5}")
+        # Временный суперпользователь живёт только внутри откатываемой транзакции
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            user = User.objects.create_superuser('bench_admin_tmp', password=None)
+            client = Client()
+            client.force_login(user)
+            for url in urls:
+                self.bench(client, url, options['repeat'])
+            transaction.set_rollback(True)
+
+    def bench(self, client, url, repeat):
+        timings = []
+        queries = 0
+        status = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries, status = len(ctx.captured_queries), response.status_code
+        line = f'{url:<60} {statistics.median(timings):>8.1f}ms {max(timings):>8.1f}ms {queries:>5}'
+        if status != 200:
+            line = self.style.ERROR(f'{line}  HTTP {status}')
+        self.stdout.write(line)
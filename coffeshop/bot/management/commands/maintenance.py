@@ -0,0 +1,66 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bot import maintenance
+from bot.periodic import PeriodicTasks
+
+
+class Command(BaseCommand):
+    help = 'Обслуживание БД: брошенные корзины, просроченные сессии, архив заказов, ANALYZE/вакуум'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'jobs', nargs='*', metavar='job',
+            help=f"Задачи ({', '.join(maintenance.JOBS)}); по умолчанию — все"
+        )
+        parser.add_argument('--force', action='store_true', help='Игнорировать окно MAINTENANCE_WINDOW')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, запуская задачи раз в MAINTENANCE_INTERVAL секунд (вместо cron)'
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help='Однократно перевести SQLite в auto_vacuum=INCREMENTAL (полный VACUUM, БД блокируется)'
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['jobs']) - set(maintenance.JOBS)
+        if unknown:
+            raise CommandError(f"Неизвестные задачи: {', '.join(sorted(unknown))}")
+
+        if options['enable_incremental_vacuum']:
+            maintenance.enable_incremental_vacuum()
+            self.stdout.write(self.style.SUCCESS('auto_vacuum=INCREMENTAL включён'))
+            return
+
+        runner = maintenance.MaintenanceRunner(options['jobs'])
+        if options['loop']:
+            try:
+                asyncio.run(self.loop(runner))
+            except KeyboardInterrupt:
+                pass
+            return
+        self.report(runner.run(force=options['force']))
+
+    async def loop(self, runner):
+        periodic = PeriodicTasks()
+        periodic.add(
+            settings.MAINTENANCE_INTERVAL,
+            lambda: asyncio.to_thread(lambda: self.report(runner.run_in_thread())),
+            name='maintenance',
+        )
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await periodic.stop()
+
+    def report(self, results):
+        if not results:
+            self.stdout.write('Нет задач к выполнению (вне окна обслуживания — используйте --force)')
+        for name, rows, elapsed in results:
+            if rows is None:
+                self.stdout.write(self.style.ERROR(f'{name:<16} ошибка, см. лог ({elapsed:.2f} с)'))
+            else:
+                self.stdout.write(f'{name:<16} {rows:>8} за {elapsed:.2f} с')
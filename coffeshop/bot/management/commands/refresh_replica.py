@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config import db_router
+
+
+class Command(BaseCommand):
+    help = 'Пересборка снимка основной БД для чтения с реплики (DB_REPLICA_NAME)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Обновлять снимок каждые DB_REPLICA_REFRESH_INTERVAL секунд (когда бот не запущен)'
+        )
+
+    def handle(self, *args, **options):
+        if not db_router.replica_configured():
+            raise CommandError('Реплика не настроена: задайте DB_REPLICA_NAME')
+        while True:
+            started = time.monotonic()
+            pages = db_router.refresh_snapshot()
+            self.stdout.write(f'Снимок обновлён: {pages} страниц за {time.monotonic() - started:.2f} с')
+            if not options['loop']:
+                return
+            try:
+                time.sleep(settings.DB_REPLICA_REFRESH_INTERVAL)
+            except KeyboardInterrupt:
+                return
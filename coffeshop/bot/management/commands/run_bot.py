@@ -1,15 +1,19 @@
+import argparse
 import asyncio
+import os
 import signal
 import logging
+import sys
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from telegram.ext import Application
-from telegram import Update
-from bot.handlers import register_handlers  # Импорт обработчиков
-from warnings import filterwarnings
-from telegram.warnings import PTBUserWarning
+from bot.periodic import PeriodicTasks
+from monitoring.memory import ControlServer, MemorySampler
+from monitoring.metrics import start_http_server
+
+# telegram, обработчики и воркеры импортируются в start_bot/start_supervisor:
+# `run_bot --help` и супервизор не платят за модули, которые им не нужны
+# (см. manage.py startup_profile)
 
-filterwarnings(action="ignore", message=r".*CallbackQueryHandler", category=PTBUserWarning)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 class Command(BaseCommand):
@@ -19,53 +23,176 @@ class Command(BaseCommand):
         super().__init__(*args, **kwargs)
         self.application = None
         self.loop = None
+        self.metrics_server = None
+        self.periodic = None
+        self.control_server = None
+        self.worker = None
+        self.metrics_port = 0
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metrics-port', type=int, default=settings.BOT_METRICS_PORT,
+            help='Порт HTTP-листенера /metrics (0 — не запускать); воркер I слушает порт + 1 + I'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.BOT_WORKERS,
+            help='Число процессов-обработчиков; апдейты раздаются по chat_id (1 — один процесс, как раньше)'
+        )
+        # Служебные: так супервизор запускает воркеров
+        parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+        parser.add_argument('--status-fd', type=int, help=argparse.SUPPRESS)
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('🚀 Запуск Telegram бота...'))
-        
+        self.worker = options['worker']
+        supervisor = self.worker is None and options['workers'] > 1
+        if self.worker is not None:
+            # Ctrl+C получает вся группа процессов — воркер останавливает супервизор (закрывая stdin)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if self.worker is None:
+            self.stdout.write(self.style.SUCCESS('🚀 Запуск Telegram бота...'))
+
         if not settings.TELEGRAM_BOT_TOKEN:
             self.stderr.write(self.style.ERROR('Не установлен TELEGRAM_BOT_TOKEN в настройках!'))
             return
 
+        if settings.DEBUG and self.worker is None:
+            self.stderr.write(self.style.WARNING(
+                '⚠️ DEBUG включён: все SQL-запросы копятся в памяти процесса бота'
+            ))
+
+        self.metrics_port = metrics_port = options['metrics_port']
+        if metrics_port and self.worker is not None:
+            metrics_port += 1 + self.worker
+        if metrics_port:
+            self.metrics_server = start_http_server(metrics_port)
+            self.stdout.write(f"{self.prefix}📈 Метрики: http://127.0.0.1:{metrics_port}/metrics")
+
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
 
         try:
-            self.loop.run_until_complete(self.start_bot())
+            if supervisor:
+                self.loop.run_until_complete(self.start_supervisor(options['workers']))
+            else:
+                self.loop.run_until_complete(self.start_bot(options['status_fd']))
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING('\n🛑 Бот останавливается...'))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'❌ Критическая ошибка: {e}'))
         finally:
             self.loop.close()
-            self.stdout.write(self.style.SUCCESS('✅ Бот остановлен'))
+            if self.metrics_server:
+                self.metrics_server.shutdown()
+            if self.worker is None:
+                self.stdout.write(self.style.SUCCESS('✅ Бот остановлен'))
+
+    @property
+    def prefix(self):
+        return '' if self.worker is None else f'[воркер {self.worker}] '
+
+    @property
+    def control_socket(self):
+        if not settings.BOT_CONTROL_SOCKET or self.worker is None:
+            return settings.BOT_CONTROL_SOCKET
+        return f'{settings.BOT_CONTROL_SOCKET}.{self.worker}'
+
+    def stop_event(self):
+        stop_event = asyncio.Event()
+        if self.worker is None:
+            signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        return stop_event
 
-    async def start_bot(self):
-        self.application = (
-            Application.builder()
-            .token(settings.TELEGRAM_BOT_TOKEN)
-            .build()
+    async def start_supervisor(self, workers):
+        """Один getUpdates на всех, обработка — в воркерах по chat_id"""
+        from telegram import Bot, Update
+        from telegram.ext import Updater
+        from bot.instrumentation import InstrumentedRequest
+        from bot.runtime import add_db_tasks
+        from bot.workers import Supervisor
+
+        bot = Bot(
+            settings.TELEGRAM_BOT_TOKEN,
+            request=InstrumentedRequest(),
+            get_updates_request=InstrumentedRequest(),
         )
+        updater = Updater(bot, asyncio.Queue())
+        argv = [sys.executable, os.path.abspath(sys.argv[0]), 'run_bot', '--metrics-port', str(self.metrics_port)]
+        supervisor = Supervisor(workers, argv)
+        ingress = None
+        await updater.initialize()
+        try:
+            await supervisor.start()
+            await updater.start_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
+            ingress = asyncio.create_task(supervisor.run_ingress(updater.update_queue), name='ingress')
+
+            sampler = MemorySampler()
+            self.periodic = PeriodicTasks()
+            add_db_tasks(self.periodic)
+            if self.control_socket:
+                self.control_server = ControlServer(self.control_socket, sampler, {'workers': supervisor.stats})
+                await self.control_server.start()
 
-        register_handlers(self.application)
+            self.stdout.write(self.style.SUCCESS(f'✅ Бот @{bot.username} запущен: {workers} воркеров'))
+            self.stdout.write(self.style.NOTICE('Нажмите Ctrl+C для остановки'))
+            await self.stop_event().wait()
+        finally:
+            if updater.running:
+                await updater.stop()
+            if ingress:
+                ingress.cancel()
+                await asyncio.gather(ingress, return_exceptions=True)
+            # Уже полученные апдейты отдаём воркерам до их остановки
+            while not updater.update_queue.empty():
+                update = updater.update_queue.get_nowait()
+                if isinstance(update, Update):
+                    supervisor.dispatch(update)
+            await supervisor.stop(settings.BOT_WORKER_STOP_TIMEOUT)
+            await self.shutdown()
+            await updater.shutdown()
+            self.stdout.write(self.style.SUCCESS('🔌 Воркеры остановлены'))
+
+    async def start_bot(self, status_fd=None):
+        from telegram import Update
+        from bot.runtime import add_db_tasks, build_application, start_bot_tasks
+        from bot.workers import WorkerFeed
+
+        self.application, janitor = build_application()
 
         # Инициализация
         await self.application.initialize()
 
         try:
-            # Start polling
             await self.application.start()
-            await self.application.updater.start_polling(
-                drop_pending_updates=True,
-                allowed_updates=Update.ALL_TYPES
-            )
+            if self.worker is None:
+                await self.application.updater.start_polling(
+                    drop_pending_updates=True,
+                    allowed_updates=Update.ALL_TYPES
+                )
 
-            self.stdout.write(self.style.SUCCESS(f'✅ Бот @{self.application.bot.username} успешно запущен!'))
-            self.stdout.write(self.style.NOTICE('Нажмите Ctrl+C для остановки'))
+            sampler = MemorySampler()
+            if settings.BOT_TRACEMALLOC:
+                sampler.start_tracing()
+            self.periodic = PeriodicTasks()
+            await start_bot_tasks(self.periodic, self.application, janitor, sampler)
+            if self.worker is None:
+                add_db_tasks(self.periodic)
+            if self.control_socket:
+                self.control_server = ControlServer(self.control_socket, sampler)
+                await self.control_server.start()
+
+            stop_event = self.stop_event()
+            if self.worker is None:
+                self.stdout.write(self.style.SUCCESS(f'✅ Бот @{self.application.bot.username} успешно запущен!'))
+                self.stdout.write(self.style.NOTICE('Нажмите Ctrl+C для остановки'))
+            else:
+                # Апдейты — из stdin от супервизора; EOF означает остановку
+                feed = WorkerFeed(self.application, status_fd)
+                self.periodic.add(settings.BOT_WORKER_HEARTBEAT, feed.heartbeat, name='heartbeat')
+                feed_task = asyncio.create_task(feed.run(), name='feed')
+                feed_task.add_done_callback(lambda _: stop_event.set())
+                feed.heartbeat()
 
-            # Wait until shutdown
-            stop_event = asyncio.Event()
-            signal.signal(signal.SIGINT, lambda *_: stop_event.set())
             await stop_event.wait()
 
         finally:
@@ -73,6 +200,10 @@ class Command(BaseCommand):
             await self.shutdown()
 
     async def shutdown(self):
+        if self.periodic:
+            await self.periodic.stop()
+        if self.control_server:
+            await self.control_server.stop()
         if self.application:
             try:
                 if self.application.updater.running:
@@ -80,6 +211,6 @@ class Command(BaseCommand):
                 if self.application.running:
                     await self.application.stop()
                 await self.application.shutdown()
-                self.stdout.write(self.style.SUCCESS('🔌 Соединение с Telegram закрыто'))
+                self.stdout.write(self.style.SUCCESS(f'{self.prefix}🔌 Соединение с Telegram закрыто'))
             except Exception as e:
                 self.stderr.write(self.style.ERROR(f'Ошибка при остановке: {e}'))
\ No newline at end of file
@@ -0,0 +1,129 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from bot.models import Cart, CartItem, Customer, MenuItem, Order, OrderItem, TelegramUser
+
+# Отдельный диапазон chat_id, чтобы не пересечься с настоящими пользователями
+SEED_CHAT_ID_BASE = 9_000_000_000
+
+
+class Command(BaseCommand):
+    help = 'Заполнение БД синтетическими клиентами, заказами и корзинами (для нагрузочных замеров)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000, help='Сколько клиентов создать')
+        parser.add_argument('--orders', type=int, default=100000, help='Сколько заказов создать')
+        parser.add_argument('--carts', type=int, default=2000, help='Сколько корзин создать (не больше клиентов)')
+        parser.add_argument('--days', type=int, default=365, help='На сколько дней назад раскидать даты')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--seed', type=int, help='Зерно генератора для воспроизводимости')
+
+    def handle(self, *args, **options):
+        items = list(MenuItem.objects.only('id', 'price'))
+        if not items:
+            raise CommandError('Меню пусто: сначала добавьте позиции меню')
+        if options['carts'] > options['customers']:
+            raise CommandError('--carts не может быть больше --customers')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        customer_ids = self.create_customers(options['customers'])
+        self.create_orders(customer_ids, items, options['orders'], options['days'])
+        self.create_carts(customer_ids[:options['carts']], items, options['days'])
+
+        if connection.vendor == 'sqlite':
+            # Статистика для планировщика и для оценки числа строк в админке
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово за {time.monotonic() - started:.1f} с'))
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def create_customers(self, total):
+        last = TelegramUser.objects.filter(chat_id__gte=SEED_CHAT_ID_BASE).aggregate(Max('chat_id'))['chat_id__max']
+        base = SEED_CHAT_ID_BASE if last is None else last + 1
+        customer_ids = []
+        for start, size in self.batches(total):
+            with transaction.atomic():
+                users = TelegramUser.objects.bulk_create(
+                    TelegramUser(chat_id=base + start + i, name=f'Seed {start + i}') for i in range(size)
+                )
+                customers = Customer.objects.bulk_create(
+                    Customer(telegram_user=user, name=user.name, phone=f'+7999{user.chat_id % 10_000_000:07d}')
+                    for user in users
+                )
+            customer_ids.extend(customer.id for customer in customers)
+        self.stdout.write(f'Клиенты: {len(customer_ids)}')
+        return customer_ids
+
+    def random_dates(self, size, days):
+        now = timezone.now()
+        return [now - timedelta(seconds=self.rng.randrange(days * 86400)) for _ in range(size)]
+
+    def backdate(self, table, rows):
+        # auto_now_add перетирает created_at при вставке — проставляем даты отдельным UPDATE
+        adapt = connection.ops.adapt_datetimefield_value
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {connection.ops.quote_name(table)} SET created_at = %s WHERE id = %s',
+                [(adapt(date), pk) for date, pk in rows],
+            )
+
+    def create_orders(self, customer_ids, items, total, days):
+        statuses = [value for value, _ in Order.STATUS_CHOICES]
+        channels = [value for value, _ in Order.CHANNEL_CHOICES]
+        created = 0
+        for start, size in self.batches(total):
+            orders, lines = [], []
+            for _ in range(size):
+                picked = self.rng.sample(items, k=min(len(items), self.rng.randint(1, 3)))
+                quantities = [self.rng.randint(1, 3) for _ in picked]
+                order_type = self.rng.choice((Order.PICKUP, Order.DELIVERY))
+                orders.append(Order(
+                    customer_id=self.rng.choice(customer_ids),
+                    order_type=order_type,
+                    address='ул. Синтетическая, 1' if order_type == Order.DELIVERY else None,
+                    total_price=sum((item.price * qty for item, qty in zip(picked, quantities)), Decimal('0')),
+                    status=self.rng.choices(statuses, weights=(1, 1, 90, 8))[0],
+                    channel=self.rng.choices(channels, weights=(6, 3, 1))[0],
+                ))
+                lines.append(list(zip(picked, quantities)))
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(
+                    OrderItem(order=order, item=item, quantity=qty)
+                    for order, order_lines in zip(orders, lines)
+                    for item, qty in order_lines
+                )
+                dates = self.random_dates(len(orders), days)
+                self.backdate(Order._meta.db_table, [(date, order.id) for date, order in zip(dates, orders)])
+            created += len(orders)
+            self.stdout.write(f'Заказы: {created}/{total}', ending='\r')
+        self.stdout.write(f'Заказы: {created}')
+
+    def create_carts(self, customer_ids, items, days):
+        for start, size in self.batches(len(customer_ids)):
+            with transaction.atomic():
+                carts = Cart.objects.bulk_create(
+                    Cart(customer_id=customer_id) for customer_id in customer_ids[start:start + size]
+                )
+                CartItem.objects.bulk_create(
+                    CartItem(cart=cart, item=item, quantity=self.rng.randint(1, 3))
+                    for cart in carts
+                    for item in self.rng.sample(items, k=min(len(items), self.rng.randint(1, 4)))
+                )
+                dates = self.random_dates(len(carts), days)
+                self.backdate(Cart._meta.db_table, [(date, cart.id) for date, cart in zip(dates, carts)])
+        self.stdout.write(f'Корзины: {len(customer_ids)}')
@@ -0,0 +1,28 @@
+"""
+Версия меню для кэшей: меняется при любом изменении Category/MenuItem.
+
+Версия хранится в кэше Django (в prod — общем для сайта и бота), поэтому
+правка в админке инвалидирует кэши меню во всех процессах.
+"""
+import time
+
+from django.core.cache import cache
+
+MENU_VERSION_KEY = 'menu:version'
+
+
+def get_menu_version():
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # Стартуем с метки времени, чтобы версии не повторялись после сброса кэша
+        cache.add(MENU_VERSION_KEY, time.time_ns() // 1_000_000, None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    try:
+        return cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        get_menu_version()
+        return cache.incr(MENU_VERSION_KEY)
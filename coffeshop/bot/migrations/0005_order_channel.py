@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:54
+
+from django.db import migrations, models
+
+
+def infer_channel(apps, schema_editor):
+    """Канал старых заказов определяем по клиенту"""
+    Order = apps.get_model('bot', 'Order')
+    # Веб-клиент привязан к User
+    Order.objects.filter(customer__user__isnull=False).update(channel='web')
+    # Клиенты баристы заводятся с отрицательным chat_id (см. barista_app.views.get_phone_customer)
+    Order.objects.filter(customer__telegram_user__chat_id__lt=0).update(channel='barista')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_order_cart_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='channel',
+            field=models.CharField(choices=[('bot', 'Telegram-бот'), ('web', 'Сайт'), ('barista', 'Бариста')], default='bot', max_length=10),
+        ),
+        migrations.RunPython(infer_channel, migrations.RunPython.noop),
+    ]
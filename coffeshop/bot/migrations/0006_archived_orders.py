@@ -0,0 +1,56 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_order_channel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_type', models.CharField(choices=[('delivery', 'Доставка'), ('pickup', 'Самовывоз')], max_length=10)),
+                ('address', models.CharField(blank=True, max_length=255, null=True)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('created_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтверждён'), ('completed', 'Выполнен'), ('canceled', 'Отменён')], max_length=20)),
+                ('channel', models.CharField(choices=[('bot', 'Telegram-бот'), ('web', 'Сайт'), ('barista', 'Бариста')], max_length=10)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='bot.customer')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архив заказов',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bot.menuitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='bot.archivedorder')),
+            ],
+            options={
+                'verbose_name': 'Элемент архивного заказа',
+                'verbose_name_plural': 'Элементы архивных заказов',
+                'ordering': ['order', 'item'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['customer', '-created_at'], name='bot_arch_order_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['created_at'], name='bot_arch_order_created_idx'),
+        ),
+    ]
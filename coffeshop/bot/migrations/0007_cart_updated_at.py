@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:03
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    # Для старых корзин точного времени изменения нет — считаем им дату создания
+    Cart = apps.get_model('bot', 'Cart')
+    Cart.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0006_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['updated_at'], name='bot_cart_updated_idx'),
+        ),
+    ]
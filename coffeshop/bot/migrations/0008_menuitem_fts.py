@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# Полнотекстовый индекс меню (см. bot.fts): внешняя FTS5-таблица поверх
+# bot_menuitem, синхронизируется триггерами — в том числе при queryset.update()
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE bot_menuitem_fts USING fts5(
+        name, description,
+        content='bot_menuitem', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER bot_menuitem_fts_insert AFTER INSERT ON bot_menuitem BEGIN
+        INSERT INTO bot_menuitem_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER bot_menuitem_fts_delete AFTER DELETE ON bot_menuitem BEGIN
+        INSERT INTO bot_menuitem_fts(bot_menuitem_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER bot_menuitem_fts_update AFTER UPDATE OF name, description ON bot_menuitem BEGIN
+        INSERT INTO bot_menuitem_fts(bot_menuitem_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO bot_menuitem_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO bot_menuitem_fts(bot_menuitem_fts) VALUES ('rebuild')",
+]
+
+BACKWARD = [
+    'DROP TRIGGER IF EXISTS bot_menuitem_fts_insert',
+    'DROP TRIGGER IF EXISTS bot_menuitem_fts_delete',
+    'DROP TRIGGER IF EXISTS bot_menuitem_fts_update',
+    'DROP TABLE IF EXISTS bot_menuitem_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # На других СУБД поиск работает через icontains (bot.fts.search_menu)
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0007_cart_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
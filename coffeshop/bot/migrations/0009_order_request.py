@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0008_menuitem_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bot.order')),
+            ],
+            options={
+                'verbose_name': 'Ключ оформления заказа',
+                'verbose_name_plural': 'Ключи оформления заказов',
+            },
+        ),
+    ]
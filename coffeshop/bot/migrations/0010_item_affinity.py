@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0009_order_request'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bot.menuitem')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bot.menuitem')),
+            ],
+            options={
+                'verbose_name': 'Совместная покупка',
+                'verbose_name_plural': 'Совместные покупки',
+                'constraints': [models.UniqueConstraint(fields=('item', 'other'), name='bot_affinity_pair_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# unicode61 не сводит «ё» к «е», а bot.fts.match_expression сводит — позиции
+# с «ё» в названии не находились. Теперь триггеры индексируют текст уже с «е».
+# Встроенный 'rebuild' читает bot_menuitem как есть: переиндексация — только
+# через INSERT ... SELECT с тем же yo() (как ниже).
+
+
+def yo(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def triggers(normalize):
+    return [
+        f"""
+        CREATE TRIGGER bot_menuitem_fts_insert AFTER INSERT ON bot_menuitem BEGIN
+            INSERT INTO bot_menuitem_fts(rowid, name, description)
+            VALUES (new.id, {normalize('new.name')}, {normalize('new.description')});
+        END
+        """,
+        f"""
+        CREATE TRIGGER bot_menuitem_fts_delete AFTER DELETE ON bot_menuitem BEGIN
+            INSERT INTO bot_menuitem_fts(bot_menuitem_fts, rowid, name, description)
+            VALUES ('delete', old.id, {normalize('old.name')}, {normalize('old.description')});
+        END
+        """,
+        f"""
+        CREATE TRIGGER bot_menuitem_fts_update AFTER UPDATE OF name, description ON bot_menuitem BEGIN
+            INSERT INTO bot_menuitem_fts(bot_menuitem_fts, rowid, name, description)
+            VALUES ('delete', old.id, {normalize('old.name')}, {normalize('old.description')});
+            INSERT INTO bot_menuitem_fts(rowid, name, description)
+            VALUES (new.id, {normalize('new.name')}, {normalize('new.description')});
+        END
+        """,
+    ]
+
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS bot_menuitem_fts_insert',
+    'DROP TRIGGER IF EXISTS bot_menuitem_fts_delete',
+    'DROP TRIGGER IF EXISTS bot_menuitem_fts_update',
+]
+
+FORWARD = [
+    *DROP_TRIGGERS,
+    *triggers(yo),
+    "INSERT INTO bot_menuitem_fts(bot_menuitem_fts) VALUES ('delete-all')",
+    f"INSERT INTO bot_menuitem_fts(rowid, name, description) "
+    f"SELECT id, {yo('name')}, {yo('description')} FROM bot_menuitem",
+]
+
+BACKWARD = [
+    *DROP_TRIGGERS,
+    *triggers(lambda column: column),
+    "INSERT INTO bot_menuitem_fts(bot_menuitem_fts) VALUES ('rebuild')",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0011_order_customer_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
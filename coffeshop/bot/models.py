@@ -87,11 +87,17 @@ class MenuItem(models.Model):
 class Cart(models.Model):
     customer = models.OneToOneField(Customer, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Последнее изменение корзины или её позиций (см. bot.services.touch_cart) — по нему чистятся брошенные корзины
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Корзина клиента"
         verbose_name_plural = "Корзины клиентов"
         ordering = ['customer']
+        indexes = [
+            models.Index(fields=['created_at'], name='bot_cart_created_idx'),
+            models.Index(fields=['updated_at'], name='bot_cart_updated_idx'),
+        ]
 
     def total_price(self):
         return sum(item.total_price() for item in self.items.all())
@@ -122,6 +128,21 @@ class Order(models.Model):
         ('completed', 'Выполнен'),
         ('canceled', 'Отменён'),
     ]
+    BOT = 'bot'
+    WEB = 'web'
+    BARISTA = 'barista'
+    CHANNEL_CHOICES = [
+        (BOT, 'Telegram-бот'),
+        (WEB, 'Сайт'),
+        (BARISTA, 'Бариста'),
+    ]
+    # Допустимые переходы статусов (конечные статусы не меняются)
+    ALLOWED_TRANSITIONS = {
+        'pending': ('confirmed', 'canceled'),
+        'confirmed': ('completed', 'canceled'),
+        'completed': (),
+        'canceled': (),
+    }
     
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     order_type = models.CharField(max_length=10, choices=ORDER_TYPES)
@@ -133,15 +154,28 @@ class Order(models.Model):
         choices=STATUS_CHOICES,
         default='pending'
     )
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, default=BOT)
 
     class Meta:
         verbose_name = "Заказ клиента"
         verbose_name_plural = "Заказы клиентов"
         ordering = ['customer', 'order_type', 'address', 'total_price', 'status']
+        indexes = [
+            # Иерархия дат в админке и выборки «за период»
+            models.Index(fields=['created_at'], name='bot_order_created_idx'),
+            # Панель баристы и фильтр по статусу в админке
+            models.Index(fields=['status', 'created_at'], name='bot_order_status_created_idx'),
+            # «Мои заказы» в боте: keyset-страницы по (created_at, id) внутри клиента
+            models.Index(fields=['customer', '-created_at', '-id'], name='bot_order_customer_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.id} - {self.get_order_type_display()}"
 
+    @property
+    def next_statuses(self):
+        return self.ALLOWED_TRANSITIONS.get(self.status, ())
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -150,4 +184,69 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = "Элемент заказа клиента"
         verbose_name_plural = "Элементы заказов клиентов"
-        ordering = ['order', 'item']
\ No newline at end of file
+        ordering = ['order', 'item']
+
+class OrderRequest(models.Model):
+    """Ключ идемпотентности оформления: повтор запроса возвращает уже созданный заказ (см. bot.services)"""
+    key = models.CharField(max_length=100, unique=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='+')
+    # Ключи живут ORDER_IDEMPOTENCY_TTL секунд, затем их удаляет bot.maintenance
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Ключ оформления заказа"
+        verbose_name_plural = "Ключи оформления заказов"
+
+class ItemAffinity(models.Model):
+    """В скольких завершённых заказах были обе позиции — разреженная матрица совместных покупок (см. bot.recommendations)"""
+    item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Совместная покупка"
+        verbose_name_plural = "Совместные покупки"
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'other'], name='bot_affinity_pair_uniq'),
+        ]
+
+class ArchivedOrder(models.Model):
+    """Завершённый/отменённый заказ старше горизонта архивации (см. bot.archive)"""
+    # id исходного заказа — ссылки вида «Заказ #123» остаются валидными
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='archived_orders')
+    order_type = models.CharField(max_length=10, choices=Order.ORDER_TYPES)
+    address = models.CharField(max_length=255, blank=True, null=True)
+    total_price = models.DecimalField(max_digits=8, decimal_places=2)
+    created_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    channel = models.CharField(max_length=10, choices=Order.CHANNEL_CHOICES)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Архивный заказ"
+        verbose_name_plural = "Архив заказов"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at'], name='bot_arch_order_customer_idx'),
+            models.Index(fields=['created_at'], name='bot_arch_order_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.id} - {self.get_order_type_display()} (архив)"
+
+    # Архивные заказы больше не меняют статус
+    next_statuses = ()
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    # Цена позиции на момент архивации: меню со временем меняется
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Элемент архивного заказа"
+        verbose_name_plural = "Элементы архивных заказов"
+        ordering = ['order', 'item']
@@ -0,0 +1,37 @@
+import asyncio
+import inspect
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def run_every(interval, func, name=None):
+    """Вызывает func (sync или async) каждые interval секунд, пока задачу не отменят"""
+    name = name or func.__name__
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = func()
+            if inspect.isawaitable(result):
+                await result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Ошибка периодической задачи {name}")
+
+
+class PeriodicTasks:
+    """Набор фоновых задач процесса бота; останавливаются вместе с ботом"""
+
+    def __init__(self):
+        self._tasks = []
+
+    def add(self, interval, func, name=None):
+        if interval and interval > 0:
+            self._tasks.append(asyncio.create_task(run_every(interval, func, name), name=name))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,164 @@
+"""
+«Часто берут вместе»: подсказки к корзине бота и сайта.
+
+Матрица совместных покупок хранится разреженно в ItemAffinity (пара
+позиций -> число завершённых заказов, где были обе). Она пополняется
+при завершении заказов (bot.signals) одним INSERT ... ON CONFLICT и
+пересобирается с нуля командой rebuild_recommendations.
+
+Каждый процесс держит в памяти top-K соседей на позицию. Подсказка — это
+поиск в словаре без обращений к БД. Топ перечитывается, когда меняется
+версия матрицы или меню (не чаще раза в RECOMMEND_REFRESH_INTERVAL секунд).
+"""
+import logging
+import time
+from collections import Counter, defaultdict
+from itertools import permutations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .archive import ORDER_SOURCES
+from .menu import get_menu_version
+from .models import ItemAffinity, OrderItem
+
+logger = logging.getLogger(__name__)
+
+RECS_VERSION_KEY = 'recs:version'
+# Сколько заказов читать за раз при пересборке
+REBUILD_CHUNK_SIZE = 5000
+
+
+def get_recs_version():
+    version = cache.get(RECS_VERSION_KEY)
+    if version is None:
+        cache.add(RECS_VERSION_KEY, time.time_ns() // 1_000_000, None)
+        version = cache.get(RECS_VERSION_KEY)
+    return version
+
+
+def bump_recs_version():
+    get_recs_version()
+    try:
+        return cache.incr(RECS_VERSION_KEY)
+    except ValueError:
+        # Ключ вытеснили между get и incr
+        get_recs_version()
+        return cache.incr(RECS_VERSION_KEY)
+
+
+def count_pairs(counts, lines):
+    """lines — (order_id, item_id); каждая упорядоченная пара позиций заказа +1"""
+    by_order = defaultdict(set)
+    for order_id, item_id in lines:
+        by_order[order_id].add(item_id)
+    for items in by_order.values():
+        counts.update(permutations(items, 2))
+
+
+def _upsert(counts):
+    """INSERT ... ON CONFLICT (item, other) DO UPDATE SET orders = orders + excluded.orders"""
+    if not counts:
+        return
+    qn = connection.ops.quote_name
+    table = qn(ItemAffinity._meta.db_table)
+    rows = [(item_id, other_id, orders) for (item_id, other_id), orders in counts.items()]
+    # SQLite ограничивает число параметров в запросе — пишем пачками
+    batch_size = 300
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({qn("item_id")}, {qn("other_id")}, {qn("orders")}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ({qn("item_id")}, {qn("other_id")}) '
+                f'DO UPDATE SET {qn("orders")} = {table}.{qn("orders")} + excluded.{qn("orders")}',
+                [value for row in batch for value in row],
+            )
+
+
+def record_completed(order_ids):
+    """Учитывает только что завершённые заказы"""
+    counts = Counter()
+    for start in range(0, len(order_ids), REBUILD_CHUNK_SIZE):
+        chunk = order_ids[start:start + REBUILD_CHUNK_SIZE]
+        count_pairs(counts, OrderItem.objects.filter(
+            order_id__in=chunk, order__status='completed',
+        ).values_list('order_id', 'item_id'))
+    if counts:
+        with transaction.atomic():
+            _upsert(counts)
+        bump_recs_version()
+
+
+def rebuild():
+    """Пересобирает матрицу с нуля по живым и архивным завершённым заказам; возвращает число заказов"""
+    counts = Counter()
+    counted = 0
+    for order_model, (line_model, _) in ORDER_SOURCES.items():
+        orders = order_model.objects.filter(status='completed').order_by('id').values_list('id', flat=True)
+        last_id = 0
+        # Keyset-проход по id: без OFFSET и без загрузки всей истории в память
+        while True:
+            chunk = list(orders.filter(id__gt=last_id)[:REBUILD_CHUNK_SIZE])
+            if not chunk:
+                break
+            count_pairs(counts, line_model.objects.filter(order_id__in=chunk).values_list('order_id', 'item_id'))
+            counted += len(chunk)
+            last_id = chunk[-1]
+    with transaction.atomic():
+        ItemAffinity.objects.all().delete()
+        _upsert(counts)
+    bump_recs_version()
+    return counted
+
+
+class Recommendations:
+    """Top-K соседей по совместным покупкам в памяти процесса"""
+
+    def __init__(self):
+        self.top = {}           # item_id -> ((заказов, id, название, цена), ...)
+        self.versions = None
+        self.checked_at = None
+
+    def refresh(self, force=False):
+        """Перечитывает топ, если изменилась матрица или меню; sync"""
+        self.checked_at = time.monotonic()
+        versions = (get_recs_version(), get_menu_version())
+        if not force and versions == self.versions:
+            return False
+        top = defaultdict(list)
+        rows = ItemAffinity.objects.filter(
+            orders__gte=settings.RECOMMEND_MIN_ORDERS, other__is_available=True,
+        ).order_by('item_id', '-orders', 'other_id').values_list('item_id', 'orders', 'other_id', 'other__name', 'other__price')
+        for item_id, *neighbour in rows.iterator():
+            if len(top[item_id]) < settings.RECOMMEND_TOP_K:
+                top[item_id].append(tuple(neighbour))
+        self.top = {item_id: tuple(neighbours) for item_id, neighbours in top.items()}
+        self.versions = versions
+        return True
+
+    def maybe_refresh(self):
+        if self.checked_at is None or time.monotonic() - self.checked_at >= settings.RECOMMEND_REFRESH_INTERVAL:
+            try:
+                self.refresh()
+            except Exception:
+                # Подсказки необязательны — остаёмся со старым топом
+                logger.exception('Не удалось обновить рекомендации')
+
+    def suggest(self, item_ids, limit=1):
+        """Позиции, которые чаще всего берут вместе с item_ids (и которых там ещё нет): [(id, название, цена)]"""
+        self.maybe_refresh()
+        in_cart = set(item_ids)
+        scores = Counter()
+        names = {}
+        for item_id in in_cart:
+            for orders, other_id, name, price in self.top.get(item_id, ()):
+                if other_id not in in_cart:
+                    scores[other_id] += orders
+                    names[other_id] = (name, price)
+        return [(other_id, *names[other_id]) for other_id, _ in scores.most_common(limit)]
+
+
+RECOMMENDATIONS = Recommendations()
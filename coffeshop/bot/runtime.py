@@ -0,0 +1,153 @@
+"""
+Сборка и фоновые задачи Application бота — общие для manage.py run_bot
+и для бота внутри ASGI-процесса сайта (config.asgi).
+
+В одном процессе с сайтом бот делит с ним кэш меню (LocMem), индекс
+inline-поиска, рекомендации и реестр метрик (/metrics/ сайта).
+Модуль импортирует telegram — подключайте его лениво.
+"""
+import asyncio
+import logging
+from warnings import filterwarnings
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+from telegram.warnings import PTBUserWarning
+
+from monitoring.memory import MemorySampler
+from .handlers import register_handlers
+from .instrumentation import InstrumentedRequest
+from .periodic import PeriodicTasks
+from .search import MENU_SEARCH
+from .state import ChatStateJanitor
+
+logger = logging.getLogger(__name__)
+
+
+def build_application(updater=True):
+    """Application с обработчиками; updater=False — апдейты приходят только через webhook"""
+    filterwarnings(action="ignore", message=r".*CallbackQueryHandler", category=PTBUserWarning)
+    builder = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).request(InstrumentedRequest())
+    if updater:
+        builder = builder.get_updates_request(InstrumentedRequest())
+    else:
+        builder = builder.updater(None)
+    application = builder.build()
+
+    # Активность чатов — до всех обработчиков, чтобы состояние чистилось по TTL
+    janitor = ChatStateJanitor(settings.BOT_STATE_TTL, settings.BOT_STATE_MAX_CHATS)
+    application.add_handler(TypeHandler(Update, janitor.touch), group=-1)
+    register_handlers(application)
+    return application, janitor
+
+
+async def start_bot_tasks(periodic, application, janitor, sampler):
+    """Фоновые задачи процесса, который обрабатывает апдейты"""
+    periodic.add(
+        settings.BOT_STATE_SWEEP_INTERVAL,
+        lambda: janitor.sweep(application),
+        name='state_sweep',
+    )
+    periodic.add(settings.BOT_MEMORY_SAMPLE_INTERVAL, sampler.sample, name='memory_sample')
+    # Индекс inline-поиска — свой в каждом процессе, что обрабатывает апдейты
+    await sync_to_async(MENU_SEARCH.refresh)()
+    periodic.add(
+        settings.BOT_INLINE_REFRESH_INTERVAL,
+        sync_to_async(MENU_SEARCH.refresh),
+        name='menu_index',
+    )
+
+
+def add_db_tasks(periodic):
+    """Обслуживание БД и снимок реплики — одна копия на запуск (у супервизора, если он есть)"""
+    from config import db_router
+    from .maintenance import MaintenanceRunner
+
+    # В отдельном потоке, чтобы не блокировать обработку апдейтов
+    maintenance = MaintenanceRunner()
+    periodic.add(
+        settings.MAINTENANCE_INTERVAL,
+        lambda: asyncio.to_thread(maintenance.run_in_thread),
+        name='maintenance',
+    )
+    if db_router.replica_configured():
+        periodic.add(
+            settings.DB_REPLICA_REFRESH_INTERVAL,
+            lambda: asyncio.to_thread(db_router.refresh_snapshot),
+            name='replica_refresh',
+        )
+
+
+class EmbeddedBot:
+    """
+    Бот в процессе ASGI-сервера: запускается и останавливается lifespan-событиями
+    (config.asgi). С BOT_WEBHOOK_URL апдейты приходят в bot.views.telegram_webhook,
+    иначе — long polling в том же цикле событий, что и сайт.
+
+    Сигналы обрабатывает сам сервер: на SIGTERM он шлёт lifespan.shutdown,
+    и бот останавливается до закрытия цикла.
+    """
+
+    def __init__(self):
+        self.application = None
+        self.periodic = None
+
+    @property
+    def running(self):
+        return self.application is not None and self.application.running
+
+    async def start(self):
+        if not settings.TELEGRAM_BOT_TOKEN:
+            raise ImproperlyConfigured('ASGI_RUN_BOT: не задан TELEGRAM_BOT_TOKEN')
+        webhook = settings.BOT_WEBHOOK_URL
+        if webhook and not settings.BOT_WEBHOOK_SECRET:
+            raise ImproperlyConfigured('BOT_WEBHOOK_URL требует BOT_WEBHOOK_SECRET')
+
+        self.application, janitor = build_application(updater=not webhook)
+        await self.application.initialize()
+        try:
+            await self.application.start()
+            if webhook:
+                await self.application.bot.set_webhook(
+                    webhook,
+                    secret_token=settings.BOT_WEBHOOK_SECRET,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+            else:
+                await self.application.updater.start_polling(
+                    drop_pending_updates=True,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+            self.periodic = PeriodicTasks()
+            sampler = MemorySampler()
+            if settings.BOT_TRACEMALLOC:
+                sampler.start_tracing()
+            await start_bot_tasks(self.periodic, self.application, janitor, sampler)
+            add_db_tasks(self.periodic)
+        except Exception:
+            await self.stop()
+            raise
+        logger.info('Бот @%s запущен в процессе сайта (%s)',
+                    self.application.bot.username, 'webhook' if webhook else 'polling')
+
+    async def stop(self):
+        if self.periodic:
+            await self.periodic.stop()
+            self.periodic = None
+        application, self.application = self.application, None
+        if application is None:
+            return
+        # Webhook не снимаем: апдейты, пришедшие во время перезапуска, Telegram доставит повторно
+        if application.updater and application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            # Дожидается уже принятых апдейтов
+            await application.stop()
+        await application.shutdown()
+        logger.info('Бот в процессе сайта остановлен')
+
+
+EMBEDDED_BOT = EmbeddedBot()
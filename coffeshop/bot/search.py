@@ -0,0 +1,188 @@
+"""
+Поиск по меню для inline-режима (@бот латте) без обращений к БД.
+
+Индекс строится в памяти процесса по MenuItem.name / description: триграммы
+слов для нечёткого поиска и отсортированный список слов для префиксов
+(короткие запросы «ла»). Готовые InlineQueryResult собираются один раз при
+построении, поэтому ответ на запрос — только поиск по словарям.
+
+Индекс пересобирается, когда меняется версия меню (bot.menu) — run_bot
+проверяет её раз в BOT_INLINE_REFRESH_INTERVAL секунд в фоне.
+"""
+import bisect
+import logging
+import re
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from telegram import (
+    InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle,
+    InlineQueryResultCachedPhoto, InputTextMessageContent,
+)
+from telegram.constants import ParseMode
+from telegram.helpers import escape_markdown
+
+from .menu import get_menu_version
+from .models import MenuItem
+
+logger = logging.getLogger(__name__)
+
+# Telegram показывает не больше 50 результатов на ответ
+MAX_RESULTS = 50
+# Порог сходства слов по триграммам (коэффициент Жаккара)
+MIN_SIMILARITY = 0.4
+NAME_WEIGHT = 2.0
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def words(text):
+    return _WORD.findall(normalize(text))
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def photo_cache_key(image_name):
+    """file_id фото в Telegram по имени файла: новая картинка — новое имя — новая загрузка"""
+    return f'tg-photo:{image_name}'
+
+
+class MenuIndex:
+    """Неизменяемый индекс по снимку меню; search() не трогает БД"""
+
+    def __init__(self, items, photo_ids=None):
+        photo_ids = photo_ids or {}
+        self.results = []
+        self.names = []
+        hits = defaultdict(dict)            # слово -> {позиция: вес}
+        for position, item in enumerate(items):
+            self.names.append(item.name)
+            self.results.append(self._result(item, photo_ids.get(item.image.name) if item.image else None))
+            for weight, text in ((1.0, item.description), (NAME_WEIGHT, item.name)):
+                for word in words(text):
+                    hits[word][position] = max(weight, hits[word].get(position, 0))
+        # Словарь отсортирован: префиксный поиск — bisect, триграммы ссылаются на номер слова
+        self._words = sorted(hits)
+        self._hits = [hits[word] for word in self._words]
+        self._gram_counts = []
+        self._postings = defaultdict(list)  # триграмма -> [номер слова]
+        for number, word in enumerate(self._words):
+            grams = trigrams(word)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(number)
+
+    @staticmethod
+    def _result(item, photo_id):
+        caption = f"*{escape_markdown(item.name)}*\n\n"
+        if item.description:
+            caption += f"{escape_markdown(item.description[:900])}\n\n"
+        caption += f"Цена: *{item.price}₽*"
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton('➕ В корзину', callback_data=f'iadd_{item.id}')]])
+        if photo_id:
+            return InlineQueryResultCachedPhoto(
+                id=str(item.id), photo_file_id=photo_id, title=item.name,
+                caption=caption, parse_mode=ParseMode.MARKDOWN, reply_markup=markup,
+            )
+        return InlineQueryResultArticle(
+            id=str(item.id), title=f'{item.name} — {item.price}₽',
+            description=item.description[:100] or item.category.name,
+            input_message_content=InputTextMessageContent(caption, parse_mode=ParseMode.MARKDOWN),
+            reply_markup=markup,
+        )
+
+    def _collect(self, scores, number, factor=1.0):
+        for position, weight in self._hits[number].items():
+            scores[position] = max(scores.get(position, 0), weight * factor)
+
+    def _prefix(self, word):
+        scores = {}
+        for number in range(bisect.bisect_left(self._words, word), len(self._words)):
+            if not self._words[number].startswith(word):
+                break
+            self._collect(scores, number)
+        return scores
+
+    def _fuzzy(self, word, scores):
+        grams = trigrams(word)
+        common = defaultdict(int)
+        for gram in grams:
+            for number in self._postings.get(gram, ()):
+                common[number] += 1
+        for number, count in common.items():
+            # Коэффициент Жаккара по триграммам: «лате» ~ «латте», «капучино» ~ «капучинно»
+            similarity = count / (len(grams) + self._gram_counts[number] - count)
+            if similarity >= MIN_SIMILARITY:
+                self._collect(scores, number, similarity * 0.9)
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Позиции, в которых нашлось каждое слово запроса, — лучшие первыми"""
+        query_words = words(query)
+        if not query_words:
+            return self.results[:limit]
+        total = None
+        for word in query_words:
+            scores = self._prefix(word)
+            # Префикс точнее; триграммы — для опечаток
+            if len(word) >= 3:
+                self._fuzzy(word, scores)
+            if total is None:
+                total = dict(scores)
+            else:
+                total = {position: total[position] + score for position, score in scores.items() if position in total}
+            if not total:
+                return []
+        ranked = sorted(total, key=lambda position: (-total[position], self.names[position]))
+        return [self.results[position] for position in ranked[:limit]]
+
+
+def build_index():
+    items = list(MenuItem.objects.filter(is_available=True).select_related('category').order_by('name'))
+    images = [item.image.name for item in items if item.image]
+    cached = cache.get_many([photo_cache_key(name) for name in images])
+    photo_ids = {name: cached[photo_cache_key(name)] for name in images if photo_cache_key(name) in cached}
+    return MenuIndex(items, photo_ids)
+
+
+class MenuSearch:
+    """Текущий индекс процесса и его обновление по версии меню"""
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.stale = False
+
+    def photo_uploaded(self, image_name, file_id):
+        """Запоминает file_id загруженного фото: в выдаче появится CachedPhoto вместо статьи"""
+        cache.set(photo_cache_key(image_name), file_id, None)
+        self.stale = True
+
+    def refresh(self, force=False):
+        """Пересобирает индекс, если меню изменилось; вызывается из потока (sync)"""
+        version = get_menu_version()
+        if not (force or self.stale) and self.index is not None and version == self.version:
+            return False
+        self.stale = False
+        started = time.monotonic()
+        # Ссылка подменяется целиком — параллельные поиски видят старый или новый индекс
+        self.index = build_index()
+        self.version = version
+        logger.info(f'Индекс меню для inline-поиска: {len(self.index.results)} позиций '
+                    f'за {(time.monotonic() - started) * 1000:.0f} мс')
+        return True
+
+    def search(self, query):
+        if self.index is None:
+            return None
+        return self.index.search(query)
+
+
+MENU_SEARCH = MenuSearch()
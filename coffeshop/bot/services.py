@@ -0,0 +1,187 @@
+"""
+Общая логика оформления заказов для бота, веб-магазина и баристы.
+"""
+import re
+import uuid
+
+from django.db import IntegrityError, connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from monitoring.metrics import ORDERS_CREATED, ORDERS_DEDUPLICATED
+from .models import Cart, CartItem, MenuItem, Order, OrderItem, OrderRequest
+
+# Отправляется после коммита смены статуса: order_ids, from_status, to_status
+order_status_changed = Signal()
+
+# Ограничение числа параметров в одном UPDATE ... IN (...)
+TRANSITION_BATCH_SIZE = 500
+
+
+# Ограничения пакетного изменения корзины (apply_cart_changes)
+MAX_CART_CHANGES = 100
+MAX_ITEM_QUANTITY = 99
+
+# Токен оформления от клиента: uuid4().hex или crypto.randomUUID()
+_REQUEST_TOKEN = re.compile(r'[\w-]{8,64}')
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def new_request_token():
+    """Токен формы оформления: выдаётся при показе формы, повторная отправка несёт тот же"""
+    return uuid.uuid4().hex
+
+
+def request_key(channel, *parts):
+    """Ключ идемпотентности из канала и идентификаторов запроса"""
+    return ':'.join(str(part) for part in (channel, *parts))[:OrderRequest._meta.get_field('key').max_length]
+
+
+def form_request_key(channel, owner, token):
+    """Ключ по токену формы/клиента, привязанный к отправителю; без валидного токена — None"""
+    if not token or not _REQUEST_TOKEN.fullmatch(token):
+        return None
+    return request_key(channel, owner, token)
+
+
+def placed_order(key):
+    """Заказ, уже оформленный с этим ключом, или None; только чтение"""
+    if not key:
+        return None
+    return Order.objects.filter(pk__in=OrderRequest.objects.filter(key=key).values('order_id')).first()
+
+
+def place_order(customer, order_type, address, lines, channel, idempotency_key=None):
+    """
+    Создаёт заказ с позициями одной транзакцией.
+
+    lines — список пар (MenuItem, количество); позиции пишутся одним bulk_create.
+    С idempotency_key повтор (двойное нажатие, повторная доставка апдейта,
+    повторная отправка формы) возвращает уже созданный заказ без записи в БД.
+    """
+    existing = placed_order(idempotency_key)
+    if existing is not None:
+        ORDERS_DEDUPLICATED.labels(channel).inc()
+        return existing
+    total = sum(item.price * quantity for item, quantity in lines)
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                customer=customer,
+                order_type=order_type,
+                address=address if order_type == Order.DELIVERY else None,
+                total_price=total,
+                status='pending',
+                channel=channel,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, item=item, quantity=quantity)
+                for item, quantity in lines
+            ])
+            if idempotency_key:
+                OrderRequest.objects.create(key=idempotency_key, order=order)
+    except IntegrityError:
+        # Параллельный повтор успел раньше — наш заказ откатился вместе с ключом
+        existing = placed_order(idempotency_key)
+        if existing is None:
+            raise
+        ORDERS_DEDUPLICATED.labels(channel).inc()
+        return existing
+    ORDERS_CREATED.labels(channel).inc()
+    return order
+
+
+def touch_cart(**filters):
+    """Продлевает жизнь корзины после изменения позиций (см. bot.maintenance.expire_carts)"""
+    Cart.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+def apply_cart_changes(cart, deltas):
+    """
+    Применяет пакет изменений корзины {item_id: delta} одной транзакцией:
+    одно чтение позиций, затем bulk_create / bulk_update / один DELETE.
+    Количество ограничено MAX_ITEM_QUANTITY, позиция с нулём удаляется.
+    Возвращает id недоступных позиций, которые не удалось добавить.
+    """
+    with transaction.atomic():
+        existing = {entry.item_id: entry for entry in CartItem.objects.filter(cart=cart, item_id__in=list(deltas))}
+        new_ids = [item_id for item_id, delta in deltas.items() if delta > 0 and item_id not in existing]
+        available = set(MenuItem.objects.filter(id__in=new_ids, is_available=True).values_list('id', flat=True))
+        created, updated, removed, unavailable = [], [], [], []
+        for item_id, delta in deltas.items():
+            entry = existing.get(item_id)
+            if entry is None:
+                if delta <= 0:
+                    continue
+                if item_id not in available:
+                    unavailable.append(item_id)
+                    continue
+                created.append(CartItem(cart=cart, item_id=item_id, quantity=min(delta, MAX_ITEM_QUANTITY)))
+                continue
+            quantity = min(entry.quantity + delta, MAX_ITEM_QUANTITY)
+            if quantity <= 0:
+                removed.append(entry.pk)
+            elif quantity != entry.quantity:
+                entry.quantity = quantity
+                updated.append(entry)
+        CartItem.objects.bulk_create(created)
+        CartItem.objects.bulk_update(updated, ['quantity'])
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+        if created or updated or removed:
+            touch_cart(pk=cart.pk)
+    return unavailable
+
+
+def _cas_update(from_status, to_status, order_ids):
+    """UPDATE ... SET status WHERE status = from_status [AND id IN (...)] RETURNING id"""
+    qn = connection.ops.quote_name
+    sql = f'UPDATE {qn(Order._meta.db_table)} SET {qn("status")} = %s WHERE {qn("status")} = %s'
+    params = [to_status, from_status]
+    if order_ids is not None:
+        sql += f' AND {qn("id")} IN ({", ".join(["%s"] * len(order_ids))})'
+        params += order_ids
+    with connection.cursor() as cursor:
+        cursor.execute(sql + f' RETURNING {qn("id")}', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def transition_orders(order_ids, from_status, to_status):
+    """
+    Переводит заказы из from_status в to_status условным UPDATE (compare-and-set).
+
+    order_ids=None — все заказы в статусе from_status. Возвращает id заказов,
+    которые действительно сменили статус: заказ, уже изменённый другим
+    баристой, просто не попадёт в результат.
+    """
+    if to_status not in Order.ALLOWED_TRANSITIONS.get(from_status, ()):
+        raise InvalidTransition(f"Переход {from_status} → {to_status} запрещён")
+
+    ids = None if order_ids is None else list(dict.fromkeys(int(pk) for pk in order_ids))
+    if ids == []:
+        return []
+
+    updated = []
+    with transaction.atomic():
+        # RETURNING поддерживают SQLite 3.35+ и PostgreSQL
+        if connection.features.can_return_rows_from_bulk_insert:
+            if ids is None:
+                updated = _cas_update(from_status, to_status, None)
+            else:
+                for start in range(0, len(ids), TRANSITION_BATCH_SIZE):
+                    updated += _cas_update(from_status, to_status, ids[start:start + TRANSITION_BATCH_SIZE])
+        else:
+            if ids is None:
+                ids = list(Order.objects.filter(status=from_status).values_list('id', flat=True))
+            updated = [
+                pk for pk in ids
+                if Order.objects.filter(pk=pk, status=from_status).update(status=to_status)
+            ]
+        if updated:
+            transaction.on_commit(lambda: order_status_changed.send(
+                sender=Order, order_ids=updated, from_status=from_status, to_status=to_status
+            ))
+    return updated
@@ -0,0 +1,71 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.db_router import pin_current_actor, replica_configured
+from . import recommendations
+from .history import bump_history_versions, forget_last_orders
+from .menu import bump_menu_version
+from .models import Cart, CartItem, Category, Customer, MenuItem, Order
+from .services import order_status_changed
+
+logger = logging.getLogger(__name__)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=MenuItem)
+def menu_changed(sender, **kwargs):
+    bump_menu_version()
+
+
+def pin_writer_to_primary(sender, **kwargs):
+    # Автор изменения какое-то время читает из основной БД (см. config.db_router)
+    pin_current_actor()
+
+
+# Только записи бота (на сайте автора закрепляет ReplicaReadMiddleware) и только post_save:
+# обработчик post_delete отключил бы быстрое удаление (Collector.can_fast_delete)
+if replica_configured():
+    for model in (Customer, Cart, CartItem, Order):
+        post_save.connect(pin_writer_to_primary, sender=model, dispatch_uid=f'pin_writer_{model.__name__}')
+
+
+@receiver(order_status_changed)
+def update_recommendations(sender, order_ids, to_status, **kwargs):
+    if to_status != 'completed':
+        return
+    try:
+        recommendations.record_completed(order_ids)
+    except Exception:
+        # Подсказки не должны ломать смену статуса; расхождение чинится rebuild_recommendations
+        logger.exception('Не удалось обновить рекомендации для заказов %s', order_ids)
+
+
+def _reset_order_caches(telegram_users):
+    """telegram_users — пары (id, chat_id) пользователей бота, чьи заказы изменились"""
+    telegram_users = [(user_id, chat_id) for user_id, chat_id in telegram_users if user_id]
+    try:
+        bump_history_versions(user_id for user_id, _ in telegram_users)
+        # Снимок для повтора мог указывать на отменённый или уже не последний заказ
+        forget_last_orders(chat_id for _, chat_id in telegram_users)
+    except Exception:
+        # Кэш недоступен — страницы истории и снимки доживут свой таймаут
+        logger.exception('Не удалось сбросить кэш заказов')
+
+
+@receiver([post_save, post_delete], sender=Order)
+def order_changed(sender, instance, **kwargs):
+    # После коммита: иначе параллельное чтение закэширует страницу без этого заказа под новой версией
+    users = Customer.objects.filter(pk=instance.customer_id).values_list('telegram_user_id', 'telegram_user__chat_id')
+    transaction.on_commit(lambda: _reset_order_caches(users))
+
+
+@receiver(order_status_changed)
+def reset_order_caches(sender, order_ids, **kwargs):
+    # Смена статуса — массовый UPDATE без post_save; сигнал уже приходит после коммита
+    _reset_order_caches(
+        Order.objects.filter(id__in=order_ids)
+        .values_list('customer__telegram_user_id', 'customer__telegram_user__chat_id').distinct()
+    )
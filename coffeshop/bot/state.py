@@ -0,0 +1,58 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ChatStateJanitor:
+    """
+    Ограничивает context.user_data / chat_data по времени простоя и количеству.
+
+    touch() регистрируется TypeHandler'ом в группе -1 и отмечает активность,
+    sweep() периодически удаляет состояние чатов, молчащих дольше ttl,
+    и самые старые записи сверх max_entries.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._users = {}
+        self._chats = {}
+
+    async def touch(self, update, context):
+        now = time.monotonic()
+        if update.effective_user:
+            self._users[update.effective_user.id] = now
+        if update.effective_chat:
+            self._chats[update.effective_chat.id] = now
+
+    def _expired(self, seen, keys, now):
+        # Записи, появившиеся без touch() (например, после рестарта), считаем свежими
+        for key in keys:
+            seen.setdefault(key, now)
+        alive = {key: ts for key, ts in seen.items() if key in keys}
+        seen.clear()
+        seen.update(alive)
+
+        deadline = now - self.ttl
+        expired = [key for key, ts in seen.items() if ts < deadline]
+        overflow = len(seen) - len(expired) - self.max_entries
+        if overflow > 0:
+            expired_set = set(expired)
+            oldest = sorted((ts, key) for key, ts in seen.items() if key not in expired_set)
+            expired.extend(key for _, key in oldest[:overflow])
+        for key in expired:
+            del seen[key]
+        return expired
+
+    def sweep(self, application):
+        now = time.monotonic()
+        users = self._expired(self._users, set(application.user_data), now)
+        for user_id in users:
+            application.drop_user_data(user_id)
+        chats = self._expired(self._chats, set(application.chat_data), now)
+        for chat_id in chats:
+            application.drop_chat_data(chat_id)
+        if users or chats:
+            logger.info(f"Очищено состояние: user_data={len(users)}, chat_data={len(chats)}")
+        return len(users) + len(chats)
@@ -0,0 +1,448 @@
+import datetime
+import os
+import sqlite3
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from bot import history, recommendations
+from bot.archive import archive_orders, customer_orders
+from bot.handlers import get_reorder, last_order_key, load_last_order, place_reorder
+from bot.maintenance import expire_carts
+from bot.models import (
+    ArchivedOrder, ArchivedOrderItem, Cart, CartItem, Category, Customer, ItemAffinity, MenuItem, Order, OrderItem,
+    OrderRequest, TelegramUser,
+)
+from bot.search import MenuIndex, build_index
+from bot.services import form_request_key, place_order, request_key, touch_cart, transition_orders
+from config import db_router
+
+
+class BotTestCase(TestCase):
+    """Меню из трёх позиций и клиент из Telegram"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Кофе')
+        cls.latte = MenuItem.objects.create(name='Латте', price=Decimal('200.00'), category=cls.category)
+        cls.cookie = MenuItem.objects.create(name='Печенье', price=Decimal('50.00'), category=cls.category)
+        cls.tea = MenuItem.objects.create(name='Чай', price=Decimal('100.00'), category=cls.category)
+        cls.user = TelegramUser.objects.create(chat_id=1001, name='Гость')
+        cls.customer = Customer.objects.create(telegram_user=cls.user, name='Гость')
+
+    def make_order(self, status='pending', lines=None, created_at=None, customer=None):
+        lines = lines or [(self.latte, 1)]
+        order = Order.objects.create(
+            customer=customer or self.customer, order_type=Order.PICKUP, status=status,
+            total_price=sum(item.price * quantity for item, quantity in lines),
+        )
+        OrderItem.objects.bulk_create([OrderItem(order=order, item=item, quantity=quantity) for item, quantity in lines])
+        if created_at is not None:
+            # auto_now_add не даёт задать дату при создании
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            order.created_at = created_at
+        return order
+
+
+class ArchiveTests(BotTestCase):
+    def setUp(self):
+        self.old = timezone.now() - datetime.timedelta(days=100)
+        self.cutoff = self.old + datetime.timedelta(days=1)
+
+    def test_moves_only_old_finished_orders(self):
+        completed = self.make_order('completed', [(self.latte, 2), (self.cookie, 1)], created_at=self.old)
+        canceled = self.make_order('canceled', created_at=self.old)
+        pending = self.make_order('pending', created_at=self.old)
+        recent = self.make_order('completed')
+        OrderRequest.objects.create(key='bot:1001:abc', order=completed)
+
+        self.assertEqual(archive_orders(before=self.cutoff), 2)
+
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {pending.id, recent.id})
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), {completed.id, canceled.id})
+        archived = ArchivedOrder.objects.get(pk=completed.pk)
+        self.assertEqual(
+            (archived.status, archived.total_price, archived.created_at, archived.customer_id),
+            ('completed', Decimal('450.00'), self.old, self.customer.id),
+        )
+        self.assertEqual(
+            sorted(archived.items.values_list('item_id', 'quantity', 'price')),
+            sorted([(self.latte.id, 2, Decimal('200.00')), (self.cookie.id, 1, Decimal('50.00'))]),
+        )
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[completed.id, canceled.id]).exists())
+        self.assertFalse(OrderRequest.objects.exists())
+
+    def test_batches(self):
+        orders = [self.make_order('completed', created_at=self.old) for _ in range(5)]
+        progress = []
+
+        self.assertEqual(archive_orders(before=self.cutoff, batch_size=2, max_batches=2, progress=progress.append), 4)
+        self.assertEqual(progress, [2, 4])
+        # Пачки идут по возрастанию id
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [orders[-1].id])
+
+        self.assertEqual(archive_orders(before=self.cutoff, batch_size=2), 1)
+        self.assertEqual(ArchivedOrder.objects.count(), 5)
+        self.assertEqual(ArchivedOrderItem.objects.count(), 5)
+        self.assertEqual(archive_orders(before=self.cutoff, batch_size=2), 0)
+
+
+class ExpireCartsTests(BotTestCase):
+    def make_cart(self, age, items=()):
+        customer = Customer.objects.create(name='Гость')
+        cart = Cart.objects.create(customer=customer)
+        CartItem.objects.bulk_create([CartItem(cart=cart, item=item, quantity=1) for item in items])
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now() - age)
+        return cart
+
+    def test_expire_carts(self):
+        stale = self.make_cart(datetime.timedelta(days=20), [self.latte, self.cookie])
+        stale_empty = self.make_cart(datetime.timedelta(days=2))
+        fresh = self.make_cart(datetime.timedelta(days=2), [self.latte])
+        fresh_empty = self.make_cart(datetime.timedelta(hours=1))
+
+        self.assertEqual(expire_carts(days=14, batch_size=1), 2)
+
+        self.assertEqual(set(Cart.objects.values_list('id', flat=True)), {fresh.id, fresh_empty.id})
+        self.assertFalse(CartItem.objects.filter(cart_id__in=[stale.id, stale_empty.id]).exists())
+        self.assertEqual(CartItem.objects.filter(cart=fresh).count(), 1)
+        self.assertEqual(expire_carts(days=14), 0)
+
+    def test_touched_cart_survives(self):
+        cart = self.make_cart(datetime.timedelta(days=20), [self.latte])
+        touch_cart(pk=cart.pk)
+        self.assertEqual(expire_carts(days=14), 0)
+        self.assertTrue(Cart.objects.filter(pk=cart.pk).exists())
+
+
+class ReplicaSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, 'primary.sqlite3')
+        self.target = os.path.join(directory.name, 'replica.sqlite3')
+        with sqlite3.connect(self.source) as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE orders (id INTEGER PRIMARY KEY)')
+            db.execute('INSERT INTO orders VALUES (1)')
+        databases = {
+            'default': {'NAME': self.source, 'OPTIONS': {'timeout': 1}},
+            'replica': {'NAME': self.target, 'OPTIONS': {}},
+        }
+        # refresh_snapshot читает settings.DATABASES; открытые соединения Django не трогаем
+        patcher = mock.patch.dict(settings.DATABASES, databases, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def replica_rows(self):
+        with sqlite3.connect(self.target) as db:
+            return [row[0] for row in db.execute('SELECT id FROM orders ORDER BY id')]
+
+    def test_refresh_snapshot(self):
+        self.assertGreater(db_router.refresh_snapshot(), 0)
+        self.assertEqual(self.replica_rows(), [1])
+        with sqlite3.connect(self.target) as db:
+            self.assertEqual(db.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+
+        # Читатель старого снимка не мешает подмене файла
+        reader = sqlite3.connect(self.target)
+        self.addCleanup(reader.close)
+        with sqlite3.connect(self.source) as db:
+            db.execute('INSERT INTO orders VALUES (2)')
+        db_router.refresh_snapshot()
+        self.assertEqual(self.replica_rows(), [1, 2])
+        self.assertFalse(os.path.exists(self.target + '.tmp'))
+
+    def test_without_replica(self):
+        del settings.DATABASES['replica']
+        self.assertEqual(db_router.refresh_snapshot(), 0)
+        self.assertFalse(os.path.exists(self.target))
+
+    def test_reads_go_to_replica_until_actor_is_pinned(self):
+        router = db_router.ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(MenuItem))
+        with mock.patch.object(db_router, '_replica_ready', return_value=True), db_router.replica_reads():
+            self.assertEqual(router.db_for_read(MenuItem), db_router.REPLICA_DB_ALIAS)
+            token = db_router.bind_actor('tg:1001')
+            try:
+                db_router.pin_current_actor()
+                self.assertIsNone(router.db_for_read(MenuItem))
+            finally:
+                db_router._actor.reset(token)
+        self.assertEqual(router.db_for_write(MenuItem), 'default')
+
+
+class MenuIndexTests(BotTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        MenuItem.objects.create(name='Капучино', description='Эспрессо с молоком', price=Decimal('180.00'),
+                                category=cls.category, image='menu/cappuccino.jpg')
+        MenuItem.objects.create(name='Ёжик в тумане', price=Decimal('300.00'), category=cls.category)
+        MenuItem.objects.create(name='Латте сезонный', price=Decimal('250.00'), category=cls.category,
+                                is_available=False)
+
+    def setUp(self):
+        self.index = build_index()
+
+    def search(self, query):
+        return [result.title for result in self.index.search(query)]
+
+    def test_prefix(self):
+        self.assertEqual(self.search('ла'), ['Латте — 200.00₽'])
+        self.assertEqual(self.search('Ежик'), ['Ёжик в тумане — 300.00₽'])
+
+    def test_typos(self):
+        self.assertEqual(self.search('лате'), ['Латте — 200.00₽'])
+        self.assertEqual(self.search('капучинно'), ['Капучино — 180.00₽'])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('капучино молоко'), ['Капучино — 180.00₽'])
+        self.assertEqual(self.search('латте чай'), [])
+        self.assertEqual(self.search('смузи'), [])
+
+    def test_empty_query_lists_menu(self):
+        self.assertEqual(len(self.index.search('  ')), 5)
+        self.assertEqual(len(self.index.search('', limit=2)), 2)
+
+    def test_name_ranks_above_description(self):
+        MenuItem.objects.create(name='Молоко', price=Decimal('90.00'), category=self.category)
+        self.assertEqual(build_index().search('молок')[0].title, 'Молоко — 90.00₽')
+        self.assertEqual(len(build_index().search('молок')), 2)
+
+    def test_cached_photo(self):
+        cappuccino = MenuItem.objects.get(name='Капучино')
+        index = MenuIndex([cappuccino], {'menu/cappuccino.jpg': 'file-id'})
+        [result] = index.search('капучино')
+        self.assertEqual(result.photo_file_id, 'file-id')
+
+
+class PlaceOrderTests(BotTestCase):
+    def place(self, key):
+        lines = [(self.latte, 2), (self.cookie, 1)]
+        return place_order(self.customer, Order.PICKUP, 'ул. Ленина, 1', lines, Order.BOT, idempotency_key=key)
+
+    def test_creates_order(self):
+        order = self.place('bot:1001:42')
+        self.assertEqual((order.total_price, order.status, order.address), (Decimal('450.00'), 'pending', None))
+        self.assertEqual(
+            sorted(order.items.values_list('item_id', 'quantity')),
+            sorted([(self.latte.id, 2), (self.cookie.id, 1)]),
+        )
+        self.assertEqual(OrderRequest.objects.get().order_id, order.id)
+
+    def test_repeat_returns_same_order(self):
+        order = self.place('bot:1001:42')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.place('bot:1001:42'), order)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 2)
+        self.assertEqual(OrderRequest.objects.count(), 1)
+        self.assertNotEqual(self.place('bot:1001:43'), order)
+
+    def test_without_key_every_call_creates_order(self):
+        self.place(None)
+        self.place(None)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(OrderRequest.objects.exists())
+
+    def test_concurrent_repeat(self):
+        # Параллельный повтор: ключа ещё не было при проверке, но он занят к моменту вставки
+        first = self.place('bot:1001:42')
+        with mock.patch('bot.services.placed_order', side_effect=[None, first]):
+            self.assertEqual(self.place('bot:1001:42'), first)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 2)
+
+    def test_form_request_key(self):
+        self.assertEqual(form_request_key(Order.WEB, 'user:7', 'a1b2c3d4-e5f6'), 'web:user:7:a1b2c3d4-e5f6')
+        for token in (None, '', 'short', 'a' * 65, 'a1b2c3d4 e5f6', 'a1b2c3d4:user:8'):
+            with self.subTest(token):
+                self.assertIsNone(form_request_key(Order.WEB, 'user:7', token))
+
+    def test_request_key_fits_column(self):
+        max_length = OrderRequest._meta.get_field('key').max_length
+        self.assertEqual(len(request_key(Order.BOT, 'x' * 200)), max_length)
+
+
+@override_settings(RECOMMEND_MIN_ORDERS=2, RECOMMEND_TOP_K=2)
+class RecommendationTests(BotTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def complete(self, *baskets):
+        orders = [self.make_order(lines=[(item, 1) for item in basket]) for basket in baskets]
+        ids = [order.id for order in orders]
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders(ids, 'pending', 'confirmed')
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders(ids, 'confirmed', 'completed')
+        return orders
+
+    def affinity(self):
+        return sorted(ItemAffinity.objects.values_list('item_id', 'other_id', 'orders'))
+
+    def test_incremental_matches_rebuild(self):
+        old = self.complete([self.latte, self.cookie], [self.latte, self.cookie, self.tea])
+        Order.objects.filter(pk__in=[order.pk for order in old]).update(
+            created_at=timezone.now() - datetime.timedelta(days=100),
+        )
+        archive_orders(before=timezone.now() - datetime.timedelta(days=1))
+        self.complete([self.latte, self.cookie])
+        # Отменённые и одиночные позиции пар не дают
+        self.make_order(status='canceled', lines=[(self.latte, 1), (self.tea, 1)])
+        self.complete([self.tea])
+
+        incremental = self.affinity()
+        self.assertIn((self.latte.id, self.cookie.id, 3), incremental)
+        self.assertIn((self.cookie.id, self.latte.id, 3), incremental)
+        self.assertIn((self.tea.id, self.latte.id, 1), incremental)
+        self.assertEqual(len(incremental), 6)
+
+        self.assertEqual(recommendations.rebuild(), 4)
+        self.assertEqual(self.affinity(), incremental)
+
+    def test_suggest(self):
+        self.complete([self.latte, self.cookie], [self.latte, self.cookie], [self.latte, self.tea])
+        recs = recommendations.Recommendations()
+        self.assertEqual(recs.suggest([self.latte.id]), [(self.cookie.id, 'Печенье', Decimal('50.00'))])
+        # Уже в корзине — не предлагаем; ниже порога RECOMMEND_MIN_ORDERS — тоже
+        self.assertEqual(recs.suggest([self.latte.id, self.cookie.id]), [])
+        self.assertEqual(recs.suggest([self.tea.id]), [])
+
+    def test_new_orders_bump_version(self):
+        recs = recommendations.Recommendations()
+        self.assertTrue(recs.refresh())
+        self.assertFalse(recs.refresh())
+        self.complete([self.latte, self.cookie], [self.latte, self.cookie])
+        self.assertTrue(recs.refresh())
+        MenuItem.objects.filter(pk=self.cookie.pk).update(is_available=False)
+        recs.refresh(force=True)
+        self.assertEqual(recs.suggest([self.latte.id]), [])
+
+
+class ReorderTests(BotTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_last_order_is_cached(self):
+        now = timezone.now()
+        self.make_order(lines=[(self.latte, 2)], created_at=now)
+        order = self.make_order(lines=[(self.latte, 1), (self.cookie, 3)], created_at=now + datetime.timedelta(minutes=1))
+        self.make_order(status='canceled', created_at=now + datetime.timedelta(minutes=2))
+        with self.assertNumQueries(2):
+            snapshot = load_last_order(self.user)
+        self.assertEqual(snapshot, {
+            'order_id': order.id, 'order_type': Order.PICKUP, 'address': None,
+            'lines': [(self.latte.id, 1), (self.cookie.id, 3)],
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(load_last_order(self.user), snapshot)
+
+    def test_no_orders_is_cached_too(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(load_last_order(self.user))
+        with self.assertNumQueries(0):
+            self.assertIsNone(load_last_order(self.user))
+
+    def test_snapshot_is_dropped_when_orders_change(self):
+        previous = self.make_order(lines=[(self.cookie, 1)], created_at=timezone.now() - datetime.timedelta(hours=1))
+        order = self.make_order()
+        self.assertEqual(load_last_order(self.user)['order_id'], order.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders([order.id], 'pending', 'canceled')
+        self.assertEqual(load_last_order(self.user)['order_id'], previous.id)
+
+        # Заказ с сайта или кассы того же клиента — тоже новый «последний»
+        with self.captureOnCommitCallbacks(execute=True):
+            placed = place_order(self.customer, Order.PICKUP, None, [(self.tea, 1)], Order.WEB)
+        self.assertEqual(load_last_order(self.user)['order_id'], placed.id)
+
+    async def test_reorder_uses_current_menu(self):
+        order = await sync_to_async(self.make_order)(lines=[(self.latte, 1), (self.cookie, 2), (self.tea, 1)])
+        await MenuItem.objects.filter(pk=self.latte.pk).aupdate(price=Decimal('220.00'))
+        await MenuItem.objects.filter(pk=self.cookie.pk).aupdate(is_available=False)
+        await MenuItem.objects.filter(pk=self.tea.pk).adelete()
+
+        snapshot, lines, missing = await get_reorder(self.user)
+        self.assertEqual(snapshot['order_id'], order.id)
+        self.assertEqual([(item.id, item.price, quantity) for item, quantity in lines],
+                         [(self.latte.id, Decimal('220.00'), 1)])
+        self.assertEqual(missing, ['Печенье'])
+
+        new_order = await place_reorder(self.user, snapshot, lines, f'bot:{self.user.chat_id}:reorder')
+        self.assertEqual(new_order.total_price, Decimal('220.00'))
+        self.assertEqual(await place_reorder(self.user, snapshot, lines, f'bot:{self.user.chat_id}:reorder'), new_order)
+        self.assertEqual(cache.get(last_order_key(self.user))['order_id'], new_order.id)
+
+    async def test_reorder_by_id(self):
+        old = await sync_to_async(self.make_order)(
+            'completed', [(self.cookie, 4)], created_at=timezone.now() - datetime.timedelta(days=100),
+        )
+        await sync_to_async(archive_orders)(before=timezone.now() - datetime.timedelta(days=1))
+        await sync_to_async(self.make_order)()
+        stranger = await Customer.objects.acreate(name='Чужой')
+        foreign = await sync_to_async(self.make_order)(customer=stranger)
+
+        snapshot, lines, _ = await get_reorder(self.user, old.id)
+        self.assertEqual(snapshot['order_id'], old.id)
+        self.assertEqual([(item.id, quantity) for item, quantity in lines], [(self.cookie.id, 4)])
+        self.assertEqual(await get_reorder(self.user, foreign.id), (None, [], []))
+
+
+class OrderHistoryTests(BotTestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        stranger = Customer.objects.create(name='Чужой')
+        self.orders = []
+        for days in (1, 2, 2, 3, 40, 41, 41, 42):
+            created_at = now - datetime.timedelta(days=days)
+            # Одинаковое время у соседних заказов — порядок решает id
+            self.orders.append(self.make_order('completed', created_at=created_at))
+            self.make_order('completed', created_at=created_at, customer=stranger)
+        archive_orders(before=now - datetime.timedelta(days=30))
+        self.expected = [order.id for order in sorted(self.orders, key=lambda o: (o.created_at, o.id), reverse=True)]
+
+    def pages(self, limit):
+        pages, before = [], None
+        while True:
+            with self.assertNumQueries(2):
+                orders, before = customer_orders(limit, before, customer__telegram_user=self.user)
+            pages.append([order.id for order in orders])
+            if before is None:
+                return pages
+
+    def test_pages_span_live_and_archive(self):
+        self.assertEqual(ArchivedOrder.objects.filter(customer=self.customer).count(), 4)
+        pages = self.pages(3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual([order_id for page in pages for order_id in page], self.expected)
+
+    def test_last_full_page_has_no_cursor(self):
+        self.assertEqual(self.pages(4), [self.expected[:4], self.expected[4:]])
+        self.assertEqual(self.pages(8), [self.expected])
+        orders, before = customer_orders(10, customer__telegram_user=TelegramUser.objects.create(chat_id=2002))
+        self.assertEqual((orders, before), ([], None))
+
+    def test_page_cache_follows_status_changes(self):
+        rendered = []
+
+        def render():
+            rendered.append(True)
+            return f'page {len(rendered)}'
+
+        self.assertEqual(history.get_page(self.user.id, None, render), 'page 1')
+        self.assertEqual(history.get_page(self.user.id, None, render), 'page 1')
+        order = self.make_order()
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders([order.id], 'pending', 'confirmed')
+        self.assertEqual(history.get_page(self.user.id, None, render), 'page 2')
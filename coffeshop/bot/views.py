@@ -1,33 +1,78 @@
 import json
-from django.http import JsonResponse, HttpResponse
+import asyncio
+import logging
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-import logging
-from asgiref.sync import async_to_sync
-from .bot_config import setup_bot
 
 logger = logging.getLogger(__name__)
 
-# Создаем приложение бота
-application = setup_bot()
+# Приложение бота создаётся при первом апдейте, а не при импорте модуля:
+# загрузка URLconf и любые manage.py не платят за telegram и обработчики.
+# Представление асинхронное — рассчитано на ASGI (один цикл событий на процесс).
+_application = None
+_application_lock = asyncio.Lock()
+
+
+async def get_application():
+    from .runtime import EMBEDDED_BOT
+
+    # Бот запущен lifespan'ом сайта (config.asgi) — апдейты идут в его очередь
+    if EMBEDDED_BOT.running:
+        return EMBEDDED_BOT.application
+    global _application
+    if _application is None:
+        async with _application_lock:
+            if _application is None:
+                from telegram.ext import Application
+                from .handlers import register_handlers
+                from .instrumentation import InstrumentedRequest
+
+                application = (
+                    Application.builder()
+                    .token(settings.TELEGRAM_BOT_TOKEN)
+                    .request(InstrumentedRequest())
+                    .updater(None)
+                    .build()
+                )
+                register_handlers(application)
+                await application.initialize()
+                _application = application
+    return _application
+
 
 @csrf_exempt
 @require_POST
-def telegram_webhook(request):
+async def telegram_webhook(request):
     """Webhook для Telegram"""
+    # Telegram присылает секрет, заданный в setWebhook (BOT_WEBHOOK_SECRET).
+    # Без настроенного секрета апдейты не принимаем: иначе их может подделать кто угодно
+    secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not settings.BOT_WEBHOOK_SECRET or not constant_time_compare(secret, settings.BOT_WEBHOOK_SECRET):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
     try:
         # Получаем данные от Telegram
         update_data = json.loads(request.body.decode('utf-8'))
-        
-        # Обрабатываем обновление
-        async_to_sync(application.process_update)(update_data)
-        
-        return JsonResponse({'status': 'ok'})
-    
     except json.JSONDecodeError:
         logger.error("Invalid JSON received")
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
-    
+
+    try:
+        from telegram import Update
+
+        application = await get_application()
+        update = Update.de_json(update_data, application.bot)
+        if application.running:
+            # Ответ Telegram сразу, обработка — в цикле приложения
+            await application.update_queue.put(update)
+        else:
+            await application.process_update(update)
     except Exception as e:
         logger.error(f"Error processing webhook: {e}")
-        return JsonResponse({'error': 'Internal server error'}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+
+    return JsonResponse({'status': 'ok'})
@@ -0,0 +1,268 @@
+"""
+Шардированный запуск бота: run_bot --workers N.
+
+Супервизор один опрашивает Telegram и раздаёт апдейты воркерам по
+chat_id % N. Все апдейты одного чата попадают в один процесс и
+обрабатываются по порядку, а разные чаты — параллельно на разных ядрах.
+
+Воркер — это `manage.py run_bot --worker I`. Апдейты приходят ему в stdin
+JSON-строками. Раз в BOT_WORKER_HEARTBEAT секунд он пишет в status-fd
+строку состояния. Упавший или замолчавший воркер перезапускается.
+Апдейты, уже переданные умершему процессу, теряются — как и при обычном
+polling с drop_pending_updates.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from django.conf import settings
+from telegram import Update
+
+from monitoring.memory import rss_bytes
+from monitoring.metrics import BOT_WORKER_BACKLOG, BOT_WORKER_DISPATCHED, BOT_WORKER_RESTARTS, BOT_WORKER_UP
+
+logger = logging.getLogger(__name__)
+
+# Сколько апдейтов супервизор держит в очереди одного воркера (пока тот занят или перезапускается)
+WORKER_QUEUE_SIZE = 10000
+# Воркер, проживший меньше, считается упавшим при старте — перезапуск с нарастающей паузой
+MIN_HEALTHY_UPTIME = 60
+RESTART_BACKOFF_MAX = 30
+# Апдейт с большим текстом или медиа может не влезть в стандартный лимит строки StreamReader
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+def shard_for(update, workers):
+    """Номер воркера для апдейта: по чату, иначе по пользователю"""
+    if update.effective_chat:
+        key = update.effective_chat.id
+    elif update.effective_user:
+        key = update.effective_user.id
+    else:
+        key = update.update_id
+    return key % workers
+
+
+async def _pipe_reader(pipe):
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    await asyncio.get_running_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader
+
+
+class WorkerProcess:
+    """Процесс-воркер глазами супервизора: очередь апдейтов, запуск и состояние"""
+
+    def __init__(self, index, argv):
+        self.index = index
+        self.argv = argv
+        self.queue = asyncio.Queue(WORKER_QUEUE_SIZE)
+        self.process = None
+        self.started_at = None
+        self.last_heartbeat = None
+        self.status = {}
+        self.restarts = 0
+        self.dispatched = 0
+        self.restart_at = None
+        self._fast_failures = 0
+        self._tasks = []
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self.argv, '--worker', str(self.index), '--status-fd', str(write_fd),
+                stdin=asyncio.subprocess.PIPE, pass_fds=(write_fd,),
+            )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        self.started_at = self.last_heartbeat = time.monotonic()
+        self.status = {}
+        self.restart_at = None
+        status = await _pipe_reader(os.fdopen(read_fd, 'rb'))
+        self._tasks = [
+            asyncio.create_task(self._write(), name=f'worker-{self.index}-write'),
+            asyncio.create_task(self._read_status(status), name=f'worker-{self.index}-status'),
+        ]
+        BOT_WORKER_UP.labels(self.index).set(1)
+        logger.info(f'Воркер {self.index} запущен, pid {self.process.pid}')
+
+    async def _write(self):
+        stdin = self.process.stdin
+        while True:
+            line = await self.queue.get()
+            try:
+                stdin.write(line)
+                await stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                logger.warning(f'Воркер {self.index} закрыл stdin — апдейт потерян')
+                return
+            finally:
+                self.queue.task_done()
+
+    async def _read_status(self, reader):
+        while line := await reader.readline():
+            try:
+                self.status = json.loads(line)
+            except ValueError:
+                continue
+            self.last_heartbeat = time.monotonic()
+            BOT_WORKER_BACKLOG.labels(self.index).set(self.backlog)
+
+    @property
+    def backlog(self):
+        """Апдейты, ещё не обработанные воркером: в очереди супервизора и у самого воркера"""
+        return self.queue.qsize() + self.status.get('pending', 0)
+
+    def send(self, line):
+        self.queue.put_nowait(line)
+        self.dispatched += 1
+        BOT_WORKER_DISPATCHED.labels(self.index).inc()
+
+    async def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def check(self, now, heartbeat_timeout):
+        """Перезапуск упавшего или зависшего воркера; вызывается монитором супервизора"""
+        if self.alive:
+            if now - self.last_heartbeat > heartbeat_timeout:
+                logger.error(f'Воркер {self.index} не отвечает {now - self.last_heartbeat:.0f} с — перезапуск')
+                self.process.kill()
+                await self.process.wait()
+            else:
+                return
+        if self.restart_at is None:
+            await self._cancel_tasks()
+            BOT_WORKER_UP.labels(self.index).set(0)
+            uptime = now - self.started_at
+            self._fast_failures = self._fast_failures + 1 if uptime < MIN_HEALTHY_UPTIME else 0
+            delay = min(RESTART_BACKOFF_MAX, 2 ** self._fast_failures - 1)
+            logger.error(
+                f'Воркер {self.index} завершился с кодом {self.process.returncode} '
+                f'после {uptime:.0f} с; перезапуск через {delay} с'
+            )
+            self.restart_at = now + delay
+        if now >= self.restart_at:
+            self.restarts += 1
+            BOT_WORKER_RESTARTS.labels(self.index).inc()
+            await self.start()
+
+    async def stop(self, timeout):
+        """Дожидается отправки очереди, закрывает stdin и ждёт, пока воркер обработает хвост"""
+        if self.alive:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except TimeoutError:
+                logger.warning(f'Воркер {self.index}: в очереди осталось {self.queue.qsize()} апдейтов')
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except TimeoutError:
+                logger.warning(f'Воркер {self.index} не завершился за {timeout} с — kill')
+                self.process.kill()
+                await self.process.wait()
+        await self._cancel_tasks()
+        BOT_WORKER_UP.labels(self.index).set(0)
+
+
+class Supervisor:
+    """Входная точка апдейтов и присмотр за воркерами"""
+
+    def __init__(self, workers, argv):
+        self.workers = [WorkerProcess(index, argv) for index in range(workers)]
+        self._monitor = None
+
+    async def start(self):
+        for worker in self.workers:
+            await worker.start()
+        self._monitor = asyncio.create_task(self.monitor(), name='workers-monitor')
+
+    def dispatch(self, update):
+        worker = self.workers[shard_for(update, len(self.workers))]
+        try:
+            worker.send(update.to_json().encode('utf-8') + b'\n')
+        except asyncio.QueueFull:
+            logger.error(f'Очередь воркера {worker.index} переполнена — апдейт {update.update_id} отброшен')
+
+    async def run_ingress(self, update_queue):
+        """Раздаёт апдейты из очереди Updater'а (polling) воркерам"""
+        while True:
+            update = await update_queue.get()
+            if isinstance(update, Update):
+                self.dispatch(update)
+
+    async def monitor(self):
+        while True:
+            await asyncio.sleep(settings.BOT_WORKER_HEARTBEAT)
+            now = time.monotonic()
+            for worker in self.workers:
+                try:
+                    await worker.check(now, settings.BOT_WORKER_HEARTBEAT_TIMEOUT)
+                except Exception:
+                    logger.exception(f'Не удалось перезапустить воркер {worker.index}')
+
+    async def stop(self, timeout):
+        if self._monitor:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        await asyncio.gather(*(worker.stop(timeout) for worker in self.workers))
+
+    def stats(self):
+        """Таблица состояния воркеров для сокета управления (команда workers)"""
+        now = time.monotonic()
+        lines = [f"{'#':>2} {'pid':>7} {'up':>4} {'uptime':>8} {'restarts':>8} {'sent':>9} {'backlog':>7} {'rss':>8}"]
+        for worker in self.workers:
+            rss = worker.status.get('rss')
+            lines.append(
+                f'{worker.index:>2} {worker.process.pid if worker.process else "-":>7} '
+                f"{'yes' if worker.alive else 'no':>4} {now - worker.started_at:>7.0f}s "
+                f'{worker.restarts:>8} {worker.dispatched:>9} {worker.backlog:>7} '
+                f"{f'{rss / 1024 / 1024:.0f}MB' if rss else '-':>8}"
+            )
+        return '\n'.join(lines)
+
+
+class WorkerFeed:
+    """Сторона воркера: апдейты из stdin в очередь Application и heartbeat в status-fd"""
+
+    def __init__(self, application, status_fd):
+        self.application = application
+        self.status_fd = status_fd
+        self.received = 0
+        self.dropped = 0
+        # Запись из цикла событий: если супервизор не читает и канал полон, не ждём его
+        os.set_blocking(status_fd, False)
+
+    async def run(self):
+        """Читает stdin до EOF (супервизор остановился или закрыл канал)"""
+        reader = await _pipe_reader(sys.stdin.buffer)
+        while line := await reader.readline():
+            update = Update.de_json(json.loads(line), self.application.bot)
+            await self.application.update_queue.put(update)
+            self.received += 1
+
+    def heartbeat(self):
+        status = {
+            'received': self.received,
+            'pending': self.application.update_queue.qsize(),
+            'rss': rss_bytes(),
+        }
+        try:
+            # Строка короче PIPE_BUF: пишется в канал целиком или не пишется вовсе
+            os.write(self.status_fd, json.dumps(status).encode('utf-8') + b'\n')
+        except BlockingIOError:
+            # Следующий heartbeat придёт через BOT_WORKER_HEARTBEAT; пропуски супервизор переживёт
+            self.dropped += 1
+            logger.warning(f"Канал статуса переполнен, пропущено heartbeat: {self.dropped}")
@@ -3,14 +3,59 @@ ASGI config for coffeshop project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+С ASGI_RUN_BOT=true Telegram-бот стартует в lifespan-событиях в том же цикле
+событий, что и сайт (bot.runtime.EmbeddedBot), и останавливается вместе с ним,
+когда сервер получает SIGTERM. Запускайте сервер с одним воркером:
+   ASGI_RUN_BOT=true uvicorn config.asgi:application --workers 1
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffeshop.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+django_application = get_asgi_application()
+
+logger = logging.getLogger(__name__)
+
+
+async def lifespan(receive, send):
+    from django.conf import settings
+
+    bot = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if settings.ASGI_RUN_BOT:
+                # telegram и обработчики — только когда бот действительно нужен (см. startup_profile)
+                from bot.runtime import EMBEDDED_BOT
+                try:
+                    await EMBEDDED_BOT.start()
+                except Exception as e:
+                    logger.exception('Не удалось запустить бота в процессе сайта')
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                bot = EMBEDDED_BOT
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            try:
+                if bot:
+                    await bot.stop()
+            except Exception as e:
+                logger.exception('Ошибка при остановке бота')
+                await send({'type': 'lifespan.shutdown.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
 
-application = get_asgi_application()
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,237 @@
+"""
+Чтение тяжёлых страниц с реплики (алиас REPLICA_DB_ALIAS).
+
+Чтения уходят на реплику только внутри области replica_reads(): её
+открывают ReplicaReadMiddleware для GET-запросов к DB_REPLICA_READ_PATHS
+и обработчики бота вокруг истории заказов. Всё остальное, включая любые
+записи, идёт в default.
+
+Защита от отставания: после записи «автор» (пользователь сайта или чат
+бота) закрепляется за основной БД на DB_REPLICA_PIN_SECONDS — он сразу
+видит свой заказ, пока реплика его ещё не получила.
+
+Локально реплика — снимок SQLite, который refresh_snapshot() периодически
+пересобирает через backup API и атомарно подменяет.
+"""
+import logging
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_ALIAS = 'replica'
+# Сессии и пользователи — только из основной БД: свежий вход ещё не попал в снимок
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'contenttypes'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_scope = ContextVar('replica_scope', default=False)
+_actor = ContextVar('db_actor', default=None)
+
+
+class _Actor:
+    """Автор запросов текущего контекста; key — строка или функция, вычисляется лениво"""
+
+    def __init__(self, key):
+        self._key = key
+        self._pinned = None
+
+    @property
+    def key(self):
+        if callable(self._key):
+            self._key = self._key()
+        return self._key
+
+    def pinned(self):
+        if self._pinned is None:
+            self._pinned = bool(self.key) and bool(cache.get(_pin_key(self.key)))
+        return self._pinned
+
+    def pin(self):
+        # Без реплики автора не вычисляем: в async-представлениях это лишний запрос request.user
+        if not self._pinned and replica_configured() and self.key:
+            pin(self.key)
+            self._pinned = True
+
+
+def _pin_key(key):
+    return f'db-pin:{key}'
+
+
+def pin(key):
+    """Закрепляет автора за основной БД на DB_REPLICA_PIN_SECONDS"""
+    if replica_configured():
+        cache.set(_pin_key(key), True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def bind_actor(key):
+    """Привязывает автора к текущему контексту (для бота — на время апдейта)"""
+    return _actor.set(_Actor(key) if key else None)
+
+
+def pin_current_actor():
+    actor = _actor.get()
+    if actor is not None:
+        actor.pin()
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _replica_ready():
+    """Реплика доступна; устаревшее соединение со старым снимком закрывается"""
+    if not replica_configured():
+        return False
+    db = connections[REPLICA_DB_ALIAS]
+    if db.vendor != 'sqlite':
+        return True
+    try:
+        version = os.stat(db.settings_dict['NAME']).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    # Снимок подменяется файлом целиком: открытое соединение продолжало бы читать старый
+    if getattr(db, 'snapshot_version', None) != version:
+        db.close()
+        db.snapshot_version = version
+    return True
+
+
+@contextmanager
+def replica_reads():
+    """Область, в которой чтения (если автор не закреплён) идут на реплику"""
+    token = _replica_scope.set(_replica_ready())
+    try:
+        yield
+    finally:
+        _replica_scope.reset(token)
+
+
+@asynccontextmanager
+async def areplica_reads():
+    """replica_reads() для async-кода: снимок проверяется в потоке, где пойдут запросы к БД"""
+    token = _replica_scope.set(await sync_to_async(_replica_ready)())
+    try:
+        yield
+    finally:
+        _replica_scope.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_scope.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        # Связанные объекты (в том числе prefetch_related) читаются из той же БД, что и родитель
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        actor = _actor.get()
+        if actor is not None and actor.pinned():
+            return None
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплику вместе со снимком / репликацией
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
+
+
+class ReplicaReadMiddleware:
+    """GET к DB_REPLICA_READ_PATHS читает с реплики; POST и прочие записи закрепляют автора"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(settings.DB_REPLICA_READ_PATHS)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def reads_replica(self, request):
+        return request.method in ('GET', 'HEAD') and request.path.startswith(self.paths)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = bind_actor(lambda: self.actor_key(request))
+        try:
+            if self.reads_replica(request):
+                with replica_reads():
+                    return self.get_response(request)
+            response = self.get_response(request)
+            # queryset.update() не шлёт сигналов — закрепляем по самому факту изменяющего запроса
+            if request.method not in SAFE_METHODS and response.status_code < 400:
+                pin_current_actor()
+            return response
+        finally:
+            _actor.reset(token)
+
+    async def __acall__(self, request):
+        # Автор вычисляется лениво в потоке запроса к БД (request.user там доступен синхронно)
+        token = bind_actor(lambda: self.actor_key(request))
+        try:
+            if self.reads_replica(request):
+                async with areplica_reads():
+                    return await self.get_response(request)
+            response = await self.get_response(request)
+            if request.method not in SAFE_METHODS and response.status_code < 400:
+                await sync_to_async(pin_current_actor)()
+            return response
+        finally:
+            _actor.reset(token)
+
+    @staticmethod
+    def actor_key(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        session_key = getattr(request, 'session', None) and request.session.session_key
+        return f'session:{session_key}' if session_key else None
+
+
+def refresh_snapshot():
+    """
+    Пересобирает снимок основной SQLite-БД в файл реплики.
+    Копия пишется во временный файл и подменяет реплику атомарно.
+    Возвращает число скопированных страниц.
+    """
+    if not replica_configured():
+        return 0
+    source_path = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+    target = Path(settings.DATABASES[REPLICA_DB_ALIAS]['NAME'])
+    tmp = target.with_name(target.name + '.tmp')
+    started = time.monotonic()
+    source = sqlite3.connect(source_path, timeout=settings.DATABASES[DEFAULT_DB_ALIAS]['OPTIONS'].get('timeout', 5))
+    try:
+        dest = sqlite3.connect(tmp)
+        try:
+            # Копия за один шаг: в WAL чтение снимка не блокирует запись заказов
+            source.backup(dest)
+            # Реплика — обычный файл без WAL: её открывают только на чтение
+            dest.execute('PRAGMA journal_mode=DELETE')
+            pages = dest.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            dest.close()
+    finally:
+        source.close()
+    os.replace(tmp, target)
+    logger.info(f'Снимок реплики обновлён: {pages} страниц за {time.monotonic() - started:.2f} с')
+    return pages
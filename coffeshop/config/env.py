@@ -0,0 +1,79 @@
+"""
+Типизированное чтение переменных окружения для settings.py.
+
+Любое некорректное значение сразу даёт ImproperlyConfigured при старте,
+а не «истинную» строку вроде DEBUG=False.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+_TRUE = {'1', 'true', 'yes', 'on'}
+_FALSE = {'0', 'false', 'no', 'off', ''}
+
+
+def _raw(name):
+    value = os.getenv(name)
+    return None if value is None else value.strip()
+
+
+def get_str(name, default=''):
+    value = _raw(name)
+    return default if value is None else value
+
+
+def get_bool(name, default=False):
+    value = _raw(name)
+    if value is None:
+        return default
+    if value.lower() in _TRUE:
+        return True
+    if value.lower() in _FALSE:
+        return False
+    raise ImproperlyConfigured(f"{name}: ожидается булево значение (true/false), получено {value!r}")
+
+
+def get_int(name, default=0):
+    value = _raw(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f"{name}: ожидается целое число, получено {value!r}")
+
+
+def get_float(name, default=0.0):
+    value = _raw(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ImproperlyConfigured(f"{name}: ожидается число, получено {value!r}")
+
+
+def get_list(name, default=()):
+    value = _raw(name)
+    if value is None:
+        return list(default)
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def get_choice(name, choices, default):
+    value = get_str(name, default).lower()
+    if value not in choices:
+        raise ImproperlyConfigured(f"{name}: допустимые значения {', '.join(choices)}, получено {value!r}")
+    return value
+
+
+def get_hour_range(name, default):
+    """Окно часов вида «3-5» -> (3, 5); конец не включается, окно может переходить через полночь"""
+    value = get_str(name, default)
+    try:
+        start, end = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise ImproperlyConfigured(f"{name}: ожидается диапазон часов вида 3-5, получено {value!r}")
+    if not (0 <= start <= 23 and 0 <= end <= 24):
+        raise ImproperlyConfigured(f"{name}: часы должны быть в диапазоне 0..24, получено {value!r}")
+    return start, end
@@ -0,0 +1,28 @@
+"""
+Разбор заголовков HTTP-кэширования и сжатия — общий для статики
+(config.staticfiles) и публичного API меню (web_app.api).
+"""
+import re
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых через q=0"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if re.search(r'q=0(\.0*)?\s*$', params):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(header, etags):
+    """
+    If-None-Match совпадает с одним из etags: заголовок — список через
+    запятую или «*»; сравнение слабое, как требует RFC 9110 (W/ не мешает).
+    """
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') in etags for tag in header.split(','))
@@ -1,7 +1,8 @@
-import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from . import env
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -11,13 +12,19 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
+# Профиль окружения: dev — локальная разработка, prod — боевой режим
+# (кэш шаблонов, постоянные соединения с БД, общий кэш, manifest-статика)
+PROFILE = env.get_choice('DJANGO_PROFILE', ('dev', 'prod'), 'dev')
+IS_PROD = PROFILE == 'prod'
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = os.getenv('SECRET_KEY', '')
+SECRET_KEY = env.get_str('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.getenv('DEBUG', '')
+# При DEBUG Django копит все SQL в connection.queries — в run_bot это утечка памяти
+DEBUG = env.get_bool('DEBUG', False)
 
-ALLOWED_HOSTS = ['*']
+ALLOWED_HOSTS = env.get_list('ALLOWED_HOSTS', ['*'])
 
 
 # Application definition
@@ -32,14 +39,18 @@ INSTALLED_APPS = [
     'barista_app',
     'web_app',
     'bot',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'config.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.db_router.ReplicaReadMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -50,7 +61,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -58,10 +68,20 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
         },
     },
 ]
 
+# В prod шаблоны компилируются один раз на процесс
+if IS_PROD:
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', TEMPLATES[0]['OPTIONS']['loaders']),
+    ]
+
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
@@ -71,7 +91,63 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / f"{os.getenv('DB_NAME', '')}.sqlite3",
+        'NAME': BASE_DIR / f"{env.get_str('DB_NAME', 'db_coffeshop1217')}.sqlite3",
+        # Постоянные соединения: в prod не переоткрываем SQLite на каждый запрос
+        'CONN_MAX_AGE': env.get_int('DB_CONN_MAX_AGE', 600 if IS_PROD else 0),
+        'CONN_HEALTH_CHECKS': IS_PROD,
+        'OPTIONS': {
+            'timeout': env.get_int('DB_TIMEOUT', 20),
+        },
+    }
+}
+
+if IS_PROD:
+    # WAL: читатели не блокируют запись заказов
+    DATABASES['default']['OPTIONS']['init_command'] = (
+        'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;'
+    )
+
+# Реплика для тяжёлых чтений (config.db_router): снимок основной БД,
+# пересобираемый раз в DB_REPLICA_REFRESH_INTERVAL секунд. Пусто — без реплики
+DB_REPLICA_NAME = env.get_str('DB_REPLICA_NAME', '')
+if DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{DB_REPLICA_NAME}.sqlite3',
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'OPTIONS': {
+            'timeout': DATABASES['default']['OPTIONS']['timeout'],
+            'init_command': 'PRAGMA query_only=1;',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['config.db_router.ReadReplicaRouter']
+DB_REPLICA_REFRESH_INTERVAL = env.get_int('DB_REPLICA_REFRESH_INTERVAL', 60)
+# После записи автор читает из основной БД, пока снимок его не догонит
+DB_REPLICA_PIN_SECONDS = env.get_int('DB_REPLICA_PIN_SECONDS', 2 * DB_REPLICA_REFRESH_INTERVAL)
+# Только отчёты: живая очередь баристы и меню POS читаются из основной БД
+DB_REPLICA_READ_PATHS = env.get_list('DB_REPLICA_READ_PATHS', ['/admin/', '/orderPanel/reports/'])
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# locmem — отдельный кэш в каждом процессе; file/redis — общий для сайта и бота
+
+CACHE_BACKEND = env.get_choice('CACHE_BACKEND', ('locmem', 'file', 'redis'), 'file' if IS_PROD else 'locmem')
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_LOCATIONS = {
+    'locmem': 'coffeshop',
+    'file': str(BASE_DIR / '.cache'),
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': env.get_str('CACHE_LOCATION', CACHE_LOCATIONS[CACHE_BACKEND]),
+        'TIMEOUT': env.get_int('CACHE_TIMEOUT', 300),
     }
 }
 
@@ -106,14 +182,97 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = Path(env.get_str('STATIC_ROOT', str(BASE_DIR / 'staticfiles')))
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # prod: имена с хэшем содержимого и .gz/.br копии (нужен collectstatic)
+        'BACKEND': (
+            'config.staticfiles.CompressedManifestStaticFilesStorage' if IS_PROD
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-TELEGRAM_BOT_TOKEN = os.getenv('TOKEN_BOT', '')
+# Публичное меню /api/v1/menu/: адрес сайта для абсолютных ссылок на картинки
+# (пусто — ссылки от корня) и сколько секунд клиенты и прокси держат ответ
+PUBLIC_BASE_URL = env.get_str('PUBLIC_BASE_URL')
+MENU_API_MAX_AGE = env.get_int('MENU_API_MAX_AGE', 30)
+
+TELEGRAM_BOT_TOKEN = env.get_str('TOKEN_BOT')
+
+# Метрики: токен для /metrics/ (пусто — без авторизации) и порт листенера в процессе бота
+METRICS_TOKEN = env.get_str('METRICS_TOKEN')
+BOT_METRICS_PORT = env.get_int('BOT_METRICS_PORT', 0)
+
+# Трассировка: доля трассируемых Update (0..1), JSONL-файл и размер буфера в памяти
+TRACE_SAMPLE_RATE = env.get_float('TRACE_SAMPLE_RATE', 0.0)
+TRACE_FILE = env.get_str('TRACE_FILE')
+TRACE_BUFFER_SIZE = 500
+
+# Долгоживущий процесс бота: TTL и лимит состояния чатов (context.user_data),
+# периодический сэмплер памяти и unix-сокет управления (manage.py bot_memory)
+BOT_STATE_TTL = env.get_int('BOT_STATE_TTL', 6 * 60 * 60)
+BOT_STATE_MAX_CHATS = env.get_int('BOT_STATE_MAX_CHATS', 10000)
+BOT_STATE_SWEEP_INTERVAL = env.get_int('BOT_STATE_SWEEP_INTERVAL', 10 * 60)
+# Брошенный диалог оформления заказа завершается через столько секунд (нужен JobQueue PTB)
+BOT_CONVERSATION_TIMEOUT = env.get_int('BOT_CONVERSATION_TIMEOUT', 15 * 60)
+BOT_MEMORY_SAMPLE_INTERVAL = env.get_int('BOT_MEMORY_SAMPLE_INTERVAL', 15 * 60)
+BOT_TRACEMALLOC = env.get_bool('BOT_TRACEMALLOC', False)
+BOT_CONTROL_SOCKET = env.get_str('BOT_CONTROL_SOCKET', str(BASE_DIR / '.bot-control.sock'))
+
+# Inline-режим (@бот латте): индекс меню в памяти проверяет версию меню раз в
+# BOT_INLINE_REFRESH_INTERVAL с; ответы Telegram кэширует на BOT_INLINE_CACHE_TIME с
+BOT_INLINE_REFRESH_INTERVAL = env.get_int('BOT_INLINE_REFRESH_INTERVAL', 30)
+BOT_INLINE_CACHE_TIME = env.get_int('BOT_INLINE_CACHE_TIME', 300)
+
+# «Мои заказы»: заказов на странице и сколько живёт отрисованная страница в кэше
+# (страницы пользователя сбрасываются сразу при изменении любого его заказа)
+BOT_ORDERS_PAGE_SIZE = env.get_int('BOT_ORDERS_PAGE_SIZE', 5)
+BOT_ORDERS_PAGE_CACHE_TIMEOUT = env.get_int('BOT_ORDERS_PAGE_CACHE_TIMEOUT', 60 * 60)
+
+# run_bot --workers N: апдейты раздаются N процессам по chat_id. Воркер шлёт heartbeat
+# раз в BOT_WORKER_HEARTBEAT с; замолчавший дольше BOT_WORKER_HEARTBEAT_TIMEOUT перезапускается
+BOT_WORKERS = env.get_int('BOT_WORKERS', 1)
+BOT_WORKER_HEARTBEAT = env.get_int('BOT_WORKER_HEARTBEAT', 5)
+BOT_WORKER_HEARTBEAT_TIMEOUT = env.get_int('BOT_WORKER_HEARTBEAT_TIMEOUT', 60)
+BOT_WORKER_STOP_TIMEOUT = env.get_int('BOT_WORKER_STOP_TIMEOUT', 30)
+
+# Бот в процессе ASGI-сайта (config.asgi): ASGI_RUN_BOT=true и один воркер сервера.
+# С BOT_WEBHOOK_URL (…/bot/webhook/, маршрут есть только в этом режиме) — webhook с обязательным
+# секретом BOT_WEBHOOK_SECRET, без него — polling
+ASGI_RUN_BOT = env.get_bool('ASGI_RUN_BOT', False)
+BOT_WEBHOOK_URL = env.get_str('BOT_WEBHOOK_URL')
+BOT_WEBHOOK_SECRET = env.get_str('BOT_WEBHOOK_SECRET')
+
+# Архивация: завершённые/отменённые заказы старше N дней переносятся в архивные таблицы
+ORDER_ARCHIVE_AFTER_DAYS = env.get_int('ORDER_ARCHIVE_AFTER_DAYS', 90)
+ORDER_ARCHIVE_BATCH_SIZE = env.get_int('ORDER_ARCHIVE_BATCH_SIZE', 1000)
+
+# Ключи идемпотентности оформления заказа (повторы возвращают тот же заказ) живут сутки
+ORDER_IDEMPOTENCY_TTL = env.get_int('ORDER_IDEMPOTENCY_TTL', 24 * 60 * 60)
+
+# «Часто берут вместе» (bot.recommendations): соседей на позицию в памяти, минимум общих
+# заказов для подсказки и как часто процесс проверяет, не изменилась ли матрица
+RECOMMEND_TOP_K = env.get_int('RECOMMEND_TOP_K', 5)
+RECOMMEND_MIN_ORDERS = env.get_int('RECOMMEND_MIN_ORDERS', 3)
+RECOMMEND_REFRESH_INTERVAL = env.get_int('RECOMMEND_REFRESH_INTERVAL', 60)
+
+# Обслуживание БД (bot.maintenance): брошенные корзины, сессии, архив, ANALYZE/вакуум.
+# Тяжёлые задачи — только в окне MAINTENANCE_WINDOW (локальные часы, например 3-5)
+CART_EXPIRE_DAYS = env.get_int('CART_EXPIRE_DAYS', 14)
+MAINTENANCE_INTERVAL = env.get_int('MAINTENANCE_INTERVAL', 60 * 60)
+MAINTENANCE_WINDOW = env.get_hour_range('MAINTENANCE_WINDOW', '3-5')
+MAINTENANCE_BATCH_SIZE = env.get_int('MAINTENANCE_BATCH_SIZE', 500)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,187 @@
+"""
+Статика для prod: имена с хэшем, предсжатые .gz/.br копии и раздача
+из Django с immutable-кэшированием и выбором кодировки по Accept-Encoding.
+"""
+import gzip
+import mimetypes
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from .http import accepted_encodings, etag_matches
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен — тогда только gzip
+    brotli = None
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Файлы меньше этого размера сжимать бессмысленно
+COMPRESS_MIN_SIZE = 256
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+DEFAULT_MAX_AGE = 60
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который при collectstatic пишет .gz и .br копии"""
+
+    # Vendored bootstrap ссылается на .map-файлы, которых нет в репозитории
+    patterns = tuple(
+        (extension, tuple(
+            pattern for pattern in extension_patterns
+            if 'sourceMappingURL' not in (pattern[0] if isinstance(pattern, tuple) else pattern)
+        ))
+        for extension, extension_patterns in ManifestStaticFilesStorage.patterns
+    )
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.add(name)
+                if hashed_name:
+                    processed_names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name in sorted(processed_names):
+            if name.endswith(COMPRESS_EXTENSIONS) and self.exists(name):
+                self._compress(name)
+
+    def _compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            # Сжатая копия, которая не меньше оригинала, только мешает
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+
+class _StaticFile:
+    __slots__ = ('path', 'size', 'etag', 'last_modified', 'content_type', 'immutable', 'variants')
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        tag = f'{int(stat.st_mtime):x}-{stat.st_size:x}'
+        self.path = path
+        self.size = stat.st_size
+        self.etag = f'"{tag}"'
+        self.last_modified = http_date(stat.st_mtime)
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.immutable = immutable
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                # Сильный ETag у каждого представления свой: тело сжатой копии другое
+                self.variants[encoding] = (path + suffix, os.path.getsize(path + suffix), f'"{tag}-{suffix[1:]}"')
+
+
+class StaticFilesMiddleware:
+    """
+    Отдаёт собранную collectstatic статику из STATIC_ROOT.
+
+    Индекс файлов строится один раз на процесс; файлы с хэшем в имени
+    (из манифеста) отдаются с Cache-Control: immutable на год.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = str(settings.STATIC_ROOT) if settings.STATIC_ROOT else ''
+        self._files = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _build_index(self):
+        files = {}
+        if not self.root or not os.path.isdir(self.root):
+            return files
+        storage_backend = settings.STORAGES['staticfiles']['BACKEND']
+        hashed = set()
+        if 'Manifest' in storage_backend:
+            from django.contrib.staticfiles.storage import staticfiles_storage
+            hashed = set(staticfiles_storage.hashed_files.values())
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')) and os.path.exists(os.path.join(dirpath, filename[:-3])):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                files[self.prefix + name] = _StaticFile(path, name in hashed)
+        return files
+
+    def is_static(self, request):
+        return request.path.startswith(self.prefix) and request.method in ('GET', 'HEAD')
+
+    def static_response(self, request):
+        if self._files is None:
+            self._files = self._build_index()
+        static_file = self._files.get(request.path)
+        return None if static_file is None else self.serve(request, static_file)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.static_response(request) if self.is_static(request) else None
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        response = None
+        if self.is_static(request):
+            # Обход STATIC_ROOT и открытие файла — вне цикла событий
+            response = await sync_to_async(self.static_response, thread_sensitive=False)(request)
+        return response if response is not None else await self.get_response(request)
+
+    def serve(self, request, static_file):
+        path, size, etag, encoding = static_file.path, static_file.size, static_file.etag, None
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for candidate, _ in ENCODINGS:
+            if candidate in accepted and candidate in static_file.variants:
+                encoding = candidate
+                path, size, etag = static_file.variants[encoding]
+                break
+
+        headers = {
+            'ETag': etag,
+            'Last-Modified': static_file.last_modified,
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': (
+                f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if static_file.immutable
+                else f'public, max-age={DEFAULT_MAX_AGE}'
+            ),
+        }
+        if etag_matches(request.headers.get('If-None-Match'), (etag,)):
+            response = HttpResponseNotModified()
+            for key, value in headers.items():
+                response[key] = value
+            return response
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=static_file.content_type)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            response.headers.pop('Content-Disposition', None)
+        response['Content-Length'] = str(size)
+        for key, value in headers.items():
+            response[key] = value
+        return response
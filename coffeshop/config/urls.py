@@ -19,6 +19,9 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
+from bot import views as bot_views
+from monitoring import views as monitoring_views
+from web_app import api as web_api
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,8 +29,15 @@ urlpatterns = [
     path('shop/', include('web_app.urls')),
     path('login/', auth_views.LoginView.as_view(), name='login'),
     path('login/', auth_views.LogoutView.as_view(), name='logout'),
+    path('metrics/', monitoring_views.metrics, name='metrics'),
+    # Версия публичного API — в пути: несовместимые изменения пойдут в /api/v2/
+    path('api/v1/menu/', web_api.menu, name='menu_api'),
 ]
 
+# Webhook бота — только в webhook-режиме (BOT_WEBHOOK_URL); при polling маршрута нет
+if settings.BOT_WEBHOOK_URL:
+    urlpatterns.append(path('bot/webhook/', bot_views.telegram_webhook, name='telegram_webhook'))
+
 # Только в DEBUG-режиме!
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import install_query_timer
+        from . import checks  # noqa: F401 — регистрация проверок
+
+        connection_created.connect(install_query_timer, dispatch_uid='monitoring_query_timer')
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PERFORMANCE = 'performance'
+
+
+def _template_loaders():
+    options = settings.TEMPLATES[0].get('OPTIONS', {}) if settings.TEMPLATES else {}
+    return options.get('loaders') or []
+
+
+@register(PERFORMANCE, Tags.compatibility)
+def check_performance_settings(app_configs, **kwargs):
+    """Предупреждения о настройках, опасных для производительности"""
+    errors = []
+    is_prod = getattr(settings, 'PROFILE', 'dev') == 'prod'
+
+    if settings.DEBUG and is_prod:
+        errors.append(Warning(
+            'DEBUG включён в prod-профиле.',
+            hint='В DEBUG Django сохраняет каждый SQL в connection.queries; '
+                 'в долгоживущем run_bot это неограниченный рост памяти.',
+            id='monitoring.W001',
+        ))
+
+    if not is_prod:
+        return errors
+
+    loaders = _template_loaders()
+    if not any(isinstance(loader, (list, tuple)) and loader[0].endswith('cached.Loader') for loader in loaders):
+        errors.append(Warning(
+            'Кэширующий загрузчик шаблонов выключен.',
+            hint="Оберните загрузчики в 'django.template.loaders.cached.Loader'.",
+            id='monitoring.W002',
+        ))
+
+    if not settings.DATABASES['default'].get('CONN_MAX_AGE'):
+        errors.append(Warning(
+            'CONN_MAX_AGE = 0: соединение с БД открывается на каждый запрос.',
+            hint='Задайте DB_CONN_MAX_AGE (например, 600).',
+            id='monitoring.W003',
+        ))
+
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        errors.append(Warning(
+            'Кэш по умолчанию — LocMemCache.',
+            hint='Кэш не разделяется между процессами сайта и бота; '
+                 'используйте CACHE_BACKEND=file или redis.',
+            id='monitoring.W004',
+        ))
+
+    static_backend = settings.STORAGES['staticfiles']['BACKEND']
+    if 'Manifest' not in static_backend:
+        errors.append(Warning(
+            'Статика хранится без хэшей в именах файлов.',
+            hint='Используйте ManifestStaticFilesStorage, чтобы отдавать статику с долгим кэшированием.',
+            id='monitoring.W005',
+        ))
+    return errors
+
+
+@register(Tags.security)
+def check_bot_webhook(app_configs, **kwargs):
+    """Webhook бота без секрета принимает поддельные апдейты"""
+    if settings.BOT_WEBHOOK_URL and not settings.BOT_WEBHOOK_SECRET:
+        return [Warning(
+            'BOT_WEBHOOK_URL задан, а BOT_WEBHOOK_SECRET пуст.',
+            hint='Без секрета /bot/webhook/ отвечает 403 на все апдейты; '
+                 'задайте BOT_WEBHOOK_SECRET — он же передаётся в setWebhook.',
+            id='monitoring.W006',
+        )]
+    return []
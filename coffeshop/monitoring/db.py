@@ -0,0 +1,31 @@
+import time
+
+from . import tracing
+from .metrics import DB_QUERY_DURATION
+
+_histograms = {}
+
+
+def _statement(sql):
+    head = sql.lstrip()[:10].split(None, 1)
+    return head[0].upper() if head else 'OTHER'
+
+
+def query_timer(execute, sql, params, many, context):
+    """Обёртка execute: замеряет время каждого SQL-запроса и пишет спан трассы"""
+    start = time.perf_counter()
+    try:
+        with tracing.span('sql', sql=sql[:200]):
+            return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        key = (context['connection'].alias, _statement(sql))
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = DB_QUERY_DURATION.labels(*key)
+        histogram.observe(elapsed)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
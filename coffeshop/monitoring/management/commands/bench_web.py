@@ -0,0 +1,199 @@
+import asyncio
+import io
+import queue
+import statistics
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+# Горячие страницы: меню, поиск, корзина и панель баристы
+DEFAULT_PATHS = (
+    '/shop/',
+    '/shop/search/?q=лат',
+    '/shop/cart/api/',
+    '/orderPanel/',
+)
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер сайта без внешнего сервера: одни и те же GET-запросы к WSGI '
+        '(пул потоков, как gunicorn --threads) и к ASGI (один цикл событий, как uvicorn) '
+        'при N одновременных клиентах. Запускайте на отдельной БД (см. seed_orders)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help='Одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=2000, help='Запросов на страницу и сервер')
+        parser.add_argument('--threads', type=int, default=32, help='Потоков WSGI-сервера')
+        parser.add_argument('--server', choices=('wsgi', 'asgi', 'both'), default='both')
+        parser.add_argument('--url', action='append', help='Путь для замера вместо стандартных (можно несколько)')
+
+    def handle(self, *args, **options):
+        from config.asgi import django_application
+        from config.wsgi import application as wsgi_application
+
+        paths = options['url'] or DEFAULT_PATHS
+        servers = ('wsgi', 'asgi') if options['server'] == 'both' else (options['server'],)
+        self.stdout.write(f"{options['concurrency']} клиентов, {options['requests']} запросов на страницу")
+        self.stdout.write(
+            f"{'страница':<28} {'сервер':<6} {'запр/с':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'ошибки':>7}"
+        )
+        # Клиенты работают из многих потоков и соединений — пользователь должен быть закоммичен
+        user = User.objects.create_user(f'bench_web_{uuid.uuid4().hex[:8]}', is_staff=True)
+        client = Client()
+        client.force_login(user)
+        session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session_key}'
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+                for path in paths:
+                    for server in servers:
+                        if server == 'wsgi':
+                            result = self.bench_wsgi(wsgi_application, path, cookie, options)
+                        else:
+                            result = asyncio.run(self.bench_asgi(django_application, path, cookie, options))
+                        self.report(path, server, *result)
+        finally:
+            SessionStore(session_key).delete()
+            user.delete()
+
+    def report(self, path, server, elapsed, timings, errors):
+        timings.sort()
+        self.stdout.write(
+            f'{path:<28} {server:<6} {len(timings) / elapsed:>8.0f} '
+            f'{statistics.median(timings):>7.1f}ms {percentile(timings, 0.95):>7.1f}ms '
+            f'{percentile(timings, 0.99):>7.1f}ms {errors:>7}'
+        )
+
+    def bench_wsgi(self, application, path, cookie, options):
+        path, _, query = quote(path, safe='/?=&').partition('?')
+
+        def call():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '',
+                # PATH_INFO по PEP 3333 — байты в latin-1
+                'PATH_INFO': unquote(path).encode().decode('latin-1'), 'QUERY_STRING': query,
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+                'HTTP_COOKIE': cookie, 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http', 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            }
+            status = []
+            body = application(environ, lambda s, headers: status.append(s))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+            return status[0].startswith('200')
+
+        # Сервер: N потоков разбирают общую очередь по порядку, как gunicorn --threads N
+        backlog = queue.SimpleQueue()
+
+        def server():
+            while (job := backlog.get()) is not None:
+                try:
+                    job['ok'] = call()
+                except Exception:
+                    job['ok'] = False
+                job['done'].set()
+
+        timings, errors = [], 0
+        remaining = options['requests']
+        lock = threading.Lock()
+
+        def client():
+            nonlocal remaining, errors
+            while True:
+                with lock:
+                    if remaining <= 0:
+                        return
+                    remaining -= 1
+                job = {'done': threading.Event(), 'ok': False}
+                started = time.perf_counter()
+                backlog.put(job)
+                job['done'].wait()
+                with lock:
+                    timings.append((time.perf_counter() - started) * 1000)
+                    errors += not job['ok']
+
+        servers = [threading.Thread(target=server) for _ in range(options['threads'])]
+        clients = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+        for thread in servers:
+            thread.start()
+        started = time.perf_counter()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        for thread in servers:
+            backlog.put(None)
+        for thread in servers:
+            thread.join()
+        return elapsed, timings, errors
+
+    async def bench_asgi(self, application, path, cookie, options):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': quote(path).encode(), 'root_path': '',
+            'query_string': quote(query, safe='=&').encode(),
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        }
+        timings, errors = [], 0
+        remaining = options['requests']
+
+        async def call():
+            status = None
+            request_sent = False
+            disconnected = asyncio.Event()
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Клиент не отключается, пока не получит ответ
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                nonlocal status
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+                elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                    disconnected.set()
+
+            await application(dict(scope), receive, send)
+            return status == 200
+
+        async def client():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    ok = await call()
+                except Exception:
+                    ok = False
+                timings.append((time.perf_counter() - started) * 1000)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        return time.perf_counter() - started, timings, errors
@@ -0,0 +1,37 @@
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.memory import send_command
+
+
+class Command(BaseCommand):
+    help = 'Память запущенного бота через сокет управления: stats, top, snapshot, diff; workers — воркеры run_bot --workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', nargs='?', default='stats',
+            choices=['stats', 'top', 'snapshot', 'diff', 'tracemalloc-on', 'tracemalloc-off', 'workers'],
+        )
+        parser.add_argument('--limit', type=int, default=20, help='Сколько строк статистики вывести')
+        parser.add_argument('--socket', default=settings.BOT_CONTROL_SOCKET, help='Путь к сокету управления (у воркера I — путь.I)')
+        parser.add_argument('--timeout', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action.startswith('tracemalloc-'):
+            line = 'tracemalloc ' + action.split('-', 1)[1]
+        elif action in ('top', 'diff', 'snapshot'):
+            line = f"{action} {options['limit']}"
+        else:
+            line = action
+
+        try:
+            response = send_command(options['socket'], line, options['timeout'])
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise CommandError(f"Бот не запущен или сокет недоступен: {options['socket']}")
+        except socket.timeout:
+            raise CommandError('Бот не ответил вовремя')
+
+        self.stdout.write(response.rstrip())
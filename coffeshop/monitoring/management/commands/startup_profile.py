@@ -0,0 +1,118 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Что делает процесс до готовности принимать запросы / апдейты
+TARGETS = {
+    'manage': 'import django; django.setup()',
+    'wsgi': 'from config.wsgi import application; from django.urls import get_resolver; get_resolver().url_patterns',
+    'asgi': 'from config.asgi import application; from django.urls import get_resolver; get_resolver().url_patterns',
+    'run_bot': (
+        'import django; django.setup()\n'
+        'from django.core.management import load_command_class\n'
+        "load_command_class('bot', 'run_bot')\n"
+        'from telegram.ext import Application\n'
+        'from bot.handlers import register_handlers\n'
+        "register_handlers(Application.builder().token('0:startup-profile').build())"
+    ),
+    'supervisor': (
+        'import django; django.setup()\n'
+        'from django.core.management import load_command_class\n'
+        "load_command_class('bot', 'run_bot')\n"
+        'from telegram.ext import Updater\n'
+        'import bot.workers'
+    ),
+}
+
+# Цели холодного старта, мс: лучший из --repeat запусков, вместе с запуском интерпретатора.
+# Лучший, а не медиана — на общей машине медиана скачет на сотню мс от соседей
+BUDGETS_MS = {
+    'manage': 500,
+    'wsgi': 600,
+    'asgi': 600,
+    'run_bot': 1000,
+    'supervisor': 800,
+}
+
+# import time: self [us] | cumulative | имя
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| \s*(\S+)$')
+PROJECT_PACKAGES = ('bot', 'barista_app', 'web_app', 'monitoring', 'config')
+
+
+def profile(code):
+    """Один холодный запуск: (секунды, [(модуль, self мкс, cumulative мкс)])"""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings')}
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    modules = []
+    errors = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, name = match.groups()
+            modules.append((name, int(own), int(cumulative)))
+        elif not line.startswith('import time:'):
+            errors.append(line)
+    if result.returncode:
+        raise CommandError('Запуск упал:\n' + '\n'.join(errors[-20:]))
+    return elapsed, modules
+
+
+class Command(BaseCommand):
+    help = 'Профиль холодного старта: время запуска и стоимость импорта по модулям (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', metavar='target',
+                            help=f"Что запускать: {', '.join(TARGETS)} (по умолчанию — всё)")
+        parser.add_argument('--repeat', type=int, default=5, help='Запусков на цель (берётся лучший)')
+        parser.add_argument('--top', type=int, default=15, help='Сколько самых дорогих модулей показать')
+        parser.add_argument('--check', action='store_true', help='Ошибка, если старт дольше цели BUDGETS_MS')
+
+    def handle(self, *args, **options):
+        unknown = set(options['targets']) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Неизвестные цели: {', '.join(sorted(unknown))}")
+        over_budget = []
+        for target in options['targets'] or TARGETS:
+            runs = [profile(TARGETS[target]) for _ in range(max(1, options['repeat']))]
+            timings = [elapsed * 1000 for elapsed, _ in runs]
+            best_ms = min(timings)
+            budget = BUDGETS_MS[target]
+            status = self.style.SUCCESS('OK') if best_ms <= budget else self.style.ERROR('превышение')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{target}: {best_ms:.0f} мс (медиана {statistics.median(timings):.0f}, цель {budget} мс) — '
+            ) + status)
+            if best_ms > budget:
+                over_budget.append(target)
+            self.report(runs[-1][1], options['top'])
+
+        if options['check'] and over_budget:
+            raise CommandError(f"Холодный старт дольше цели: {', '.join(over_budget)}")
+
+    def report(self, modules, top):
+        by_package = defaultdict(int)
+        for name, own, _ in modules:
+            by_package[name.split('.', 1)[0]] += own
+        total = sum(by_package.values())
+        self.stdout.write(f'  импорт: {total / 1000:.0f} мс, модулей: {len(modules)}')
+
+        self.stdout.write('  по пакетам (собственное время модулей):')
+        for package, own in sorted(by_package.items(), key=lambda item: -item[1])[:8]:
+            mark = ' *' if package in PROJECT_PACKAGES else ''
+            self.stdout.write(f'    {own / 1000:>7.1f} мс  {package}{mark}')
+
+        self.stdout.write(f'  самые дорогие модули (собственное / с вложенными импортами), top {top}:')
+        for name, own, cumulative in sorted(modules, key=lambda m: -m[1])[:top]:
+            mark = ' *' if name.split('.', 1)[0] in PROJECT_PACKAGES else ''
+            self.stdout.write(f'    {own / 1000:>7.1f} мс  {cumulative / 1000:>7.1f} мс  {name}{mark}')
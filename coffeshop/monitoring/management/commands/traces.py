@@ -0,0 +1,103 @@
+import json
+import socket
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.memory import send_command
+
+BAR_WIDTH = 40
+
+
+class Command(BaseCommand):
+    help = 'Самые медленные трассы бота за последние N минут (разбивка по спанам) из TRACE_FILE или буфера бота (--live)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=float, default=15, help='Окно поиска, минут')
+        parser.add_argument('--limit', type=int, default=5, help='Сколько трасс показать')
+        parser.add_argument('--file', default=settings.TRACE_FILE, help='JSONL-файл трасс (по умолчанию TRACE_FILE)')
+        parser.add_argument(
+            '--live', action='store_true',
+            help='Читать буфер запущенного бота через сокет управления, а не файл',
+        )
+        parser.add_argument('--socket', default=settings.BOT_CONTROL_SOCKET, help='Сокет управления (у воркера I — путь.I)')
+        parser.add_argument('--name', help='Только трассы указанного обработчика')
+        parser.add_argument('--min-ms', type=float, default=0.0, help='Скрывать спаны короче, мс')
+
+    def handle(self, *args, **options):
+        since = time.time() - options['minutes'] * 60
+        traces = []
+        for line in self.read_live(options) if options['live'] else self.read_file(options['file']):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record['start'] < since:
+                continue
+            if options['name'] and record['name'] != options['name']:
+                continue
+            traces.append(record)
+
+        if not traces:
+            self.stdout.write('Трасс за указанный период нет.')
+            return
+
+        traces.sort(key=lambda r: r['duration_ms'], reverse=True)
+        for record in traces[:options['limit']]:
+            self.print_trace(record, options['min_ms'])
+
+    def read_file(self, path):
+        if not path:
+            raise CommandError('Не задан файл трасс: укажите --file, TRACE_FILE или --live')
+        try:
+            with open(path, encoding='utf-8') as f:
+                yield from f
+        except FileNotFoundError:
+            raise CommandError(f'Файл трасс не найден: {path}')
+
+    def read_live(self, options):
+        try:
+            return send_command(options['socket'], 'traces', timeout=10).splitlines()
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise CommandError(f"Бот не запущен или сокет недоступен: {options['socket']}")
+        except socket.timeout:
+            raise CommandError('Бот не ответил вовремя')
+
+    def print_trace(self, record, min_ms):
+        started = datetime.fromtimestamp(record['start']).strftime('%H:%M:%S')
+        attrs = ' '.join(f'{k}={v}' for k, v in record['spans'][0]['attrs'].items() if v is not None)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{record['name']}  {record['duration_ms']:.1f} ms  [{started}]  {attrs}  #{record['trace_id']}"
+        ))
+
+        children = {}
+        for span in record['spans']:
+            children.setdefault(span['parent'], []).append(span)
+
+        total = record['duration_ms'] or 1
+        hidden = 0
+
+        def walk(span, depth):
+            nonlocal hidden
+            if depth and span['duration_ms'] < min_ms:
+                hidden += 1
+                return
+            offset = int(span['offset_ms'] / total * BAR_WIDTH)
+            width = max(1, int(span['duration_ms'] / total * BAR_WIDTH))
+            bar = ' ' * offset + '█' * min(width, BAR_WIDTH - offset)
+            label = span['name']
+            if 'sql' in span['attrs']:
+                label += f": {span['attrs']['sql'][:60]}"
+            self.stdout.write(
+                f"  {bar:<{BAR_WIDTH}} {span['duration_ms']:8.2f} ms  {'  ' * depth}{label}"
+            )
+            for child in children.get(span['id'], []):
+                walk(child, depth + 1)
+
+        for root in children.get(None, []):
+            walk(root, 0)
+        if hidden:
+            self.stdout.write(f'  … скрыто спанов короче {min_ms} ms: {hidden}')
+        self.stdout.write('')
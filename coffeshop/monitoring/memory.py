@@ -0,0 +1,189 @@
+"""
+Наблюдение за памятью долгоживущего процесса бота.
+
+MemorySampler периодически пишет в лог RSS и, если включён tracemalloc,
+самые «тяжёлые» места аллокаций. ControlServer принимает команды через
+локальный unix-сокет (см. manage.py bot_memory), чтобы снять снимок и
+сравнить его с предыдущим без перезапуска бота; им же manage.py traces --live
+читает последние трассы процесса.
+"""
+import asyncio
+import json
+import logging
+import os
+import resource
+import socket
+import tracemalloc
+
+from . import tracing
+from .metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+PROCESS_RSS = Gauge('process_resident_memory_bytes', 'Резидентная память процесса')
+TRACEMALLOC_TRACED = Gauge('tracemalloc_traced_bytes', 'Память, отслеживаемая tracemalloc')
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss — пиковое значение (в КБ на Linux), но лучше, чем ничего
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _mb(value):
+    return f'{value / 1024 / 1024:.1f} MB'
+
+
+class MemorySampler:
+    def __init__(self, top=10, frames=1):
+        self.top = top
+        self.frames = frames
+        self.baseline = None
+        self.previous = None
+
+    def start_tracing(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop_tracing(self):
+        tracemalloc.stop()
+        self.baseline = self.previous = None
+
+    def take_snapshot(self):
+        self.start_tracing()
+        return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+    def stats(self):
+        rss = rss_bytes()
+        PROCESS_RSS.set(rss)
+        lines = [f'RSS: {_mb(rss)}']
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            TRACEMALLOC_TRACED.set(current)
+            lines.append(f'tracemalloc: текущая {_mb(current)}, пик {_mb(peak)}')
+        else:
+            lines.append('tracemalloc: выключен')
+        return '\n'.join(lines)
+
+    def top_sites(self, limit=None):
+        snapshot = self.take_snapshot()
+        return [str(stat) for stat in snapshot.statistics('lineno')[:limit or self.top]]
+
+    def diff(self, limit=None, reset_baseline=False):
+        """Разница с базовым снимком; первый вызов только запоминает базу"""
+        snapshot = self.take_snapshot()
+        if self.baseline is None or reset_baseline:
+            self.baseline = snapshot
+            return ['Базовый снимок сохранён; повторите diff позже.']
+        stats = snapshot.compare_to(self.baseline, 'lineno')
+        return [str(stat) for stat in stats[:limit or self.top]]
+
+    async def sample(self):
+        """Периодический сэмпл: RSS всегда, места аллокаций — если tracemalloc включён"""
+        logger.info(self.stats().replace('\n', '; '))
+        if tracemalloc.is_tracing():
+            # Снимок и сравнение на большой куче занимают сотни мс — не в цикле событий
+            await asyncio.to_thread(self._log_allocations)
+
+    def _log_allocations(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        if self.previous is not None:
+            stats = snapshot.compare_to(self.previous, 'lineno')[:self.top]
+            title = 'Рост аллокаций с прошлого сэмпла'
+        else:
+            stats = snapshot.statistics('lineno')[:self.top]
+            title = 'Крупнейшие места аллокаций'
+        self.previous = snapshot
+        logger.info(title + ':\n' + '\n'.join(f'  {stat}' for stat in stats))
+
+
+class ControlServer:
+    """
+    Unix-сокет управления процессом бота. Протокол: одна строка-команда,
+    в ответ — текст, после чего соединение закрывается.
+
+      stats | top [N] | snapshot | diff [N] | tracemalloc on|off | traces [N]
+
+    commands — дополнительные команды: имя -> функция без аргументов,
+    возвращающая текст (например, workers у супервизора run_bot).
+    """
+
+    def __init__(self, path, sampler, commands=None):
+        self.path = str(path)
+        self.sampler = sampler
+        self.commands = commands or {}
+        self._server = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        os.chmod(self.path, 0o600)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def execute(self, line):
+        command, *args = line.split() or ['stats']
+        limit = int(args[0]) if args and args[0].isdigit() else None
+        if command == 'stats':
+            return self.sampler.stats()
+        if command == 'top':
+            return '\n'.join(self.sampler.top_sites(limit))
+        if command == 'snapshot':
+            return '\n'.join(self.sampler.diff(limit, reset_baseline=True))
+        if command == 'diff':
+            return '\n'.join(self.sampler.diff(limit))
+        if command == 'tracemalloc' and args in (['on'], ['off']):
+            if args[0] == 'on':
+                self.sampler.start_tracing()
+            else:
+                self.sampler.stop_tracing()
+            return f'tracemalloc: {args[0]}'
+        if command == 'traces':
+            # Трассы из буфера процесса, по одной JSON-строке
+            return '\n'.join(json.dumps(record, ensure_ascii=False, default=str) for record in tracing.recent(limit))
+        if command in self.commands:
+            return self.commands[command]()
+        return f'Неизвестная команда: {line.strip()}'
+
+    async def _handle(self, reader, writer):
+        try:
+            line = (await reader.readline()).decode('utf-8', 'replace')
+            try:
+                # Снимок может занять заметное время — не блокируем цикл событий
+                response = await asyncio.to_thread(self.execute, line)
+            except Exception as e:
+                logger.exception('Ошибка команды управления')
+                response = f'Ошибка: {e}'
+            writer.write(response.encode('utf-8') + b'\n')
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+def send_command(path, line, timeout):
+    """Команда сокету управления; ответ целиком, после закрытия соединения сервером"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(line.encode('utf-8') + b'\n')
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    return b''.join(chunks).decode('utf-8')
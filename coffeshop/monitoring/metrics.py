@@ -0,0 +1,307 @@
+"""
+Встроенный реестр метрик (счётчики, гистограммы) в формате Prometheus.
+
+Горячий путь не берёт блокировок: каждый поток пишет в свою «ячейку»,
+а суммирование по ячейкам происходит только при выдаче метрик.
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class _Shards:
+    """Набор ячеек фиксированного размера — по одной на поток-писатель."""
+
+    __slots__ = ('_size', '_cells', '_lock')
+
+    def __init__(self, size):
+        self._size = size
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    def cell(self):
+        cell = self._cells.get(threading.get_ident())
+        if cell is None:
+            # Блокировка нужна только при первом обращении потока
+            with self._lock:
+                cell = self._cells.setdefault(threading.get_ident(), [0.0] * self._size)
+        return cell
+
+    def total(self):
+        totals = [0.0] * self._size
+        for cell in list(self._cells.values()):
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class _CounterChild:
+    __slots__ = ('_shards',)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.cell()[0] += amount
+
+    def samples(self, name, labels):
+        return [(name, labels, self._shards.total()[0])]
+
+
+class _GaugeChild:
+    __slots__ = ('_value',)
+
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = value
+
+    def samples(self, name, labels):
+        return [(name, labels, self._value)]
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_shards')
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # [счётчики по корзинам..., +Inf, сумма]
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value):
+        cell = self._shards.cell()
+        cell[bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    def samples(self, name, labels):
+        totals = self._shards.total()
+        result = []
+        cumulative = 0.0
+        for bound, count in zip(self._buckets + (float('inf'),), totals):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            result.append((f'{name}_bucket', labels + (('le', le),), cumulative))
+        result.append((f'{name}_sum', labels, totals[-1]))
+        result.append((f'{name}_count', labels, cumulative))
+        return result
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """Дочерняя метрика для набора меток. Результат стоит сохранять в переменной."""
+        key = values or tuple(kwargs[name] for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name}: ожидаются метки {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in key), self._new_child())
+                self._children[key] = child
+        return child
+
+    def collect(self):
+        seen = set()
+        samples = []
+        for key, child in list(self._children.items()):
+            if id(child) in seen:
+                continue
+            seen.add(id(child))
+            labels = tuple(zip(self.labelnames, (str(v) for v in key)))
+            samples.extend(child.samples(self.name, labels))
+        return samples
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.collect():
+                if labels:
+                    label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    lines.append(f'{name}{{{label_str}}} {_format_value(value)}')
+                else:
+                    lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# === Метрики приложения ===
+
+BOT_UPDATE_DURATION = Histogram(
+    'bot_update_duration_seconds',
+    'Время обработки входящего Update, по обработчику',
+    ['handler'],
+)
+BOT_HANDLER_ERRORS = Counter(
+    'bot_handler_errors_total',
+    'Исключения в обработчиках бота',
+    ['handler'],
+)
+TELEGRAM_API_DURATION = Histogram(
+    'telegram_api_request_duration_seconds',
+    'Длительность запросов к Telegram Bot API',
+    ['method'],
+)
+TELEGRAM_API_ERRORS = Counter(
+    'telegram_api_errors_total',
+    'Ошибки запросов к Telegram Bot API',
+    ['method', 'error'],
+)
+ORDERS_CREATED = Counter(
+    'orders_created_total',
+    'Созданные заказы по каналу (bot/web/barista)',
+    ['channel'],
+)
+ORDERS_DEDUPLICATED = Counter(
+    'orders_deduplicated_total',
+    'Повторы оформления, вернувшие уже созданный заказ (ключ идемпотентности)',
+    ['channel'],
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds',
+    'Время выполнения SQL-запросов',
+    ['alias', 'statement'],
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Обращения к кэшам приложения (hit/miss)',
+    ['cache', 'result'],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки HTTP-запросов Django, по представлению',
+    ['view', 'method', 'status'],
+)
+BOT_WORKER_UP = Gauge(
+    'bot_worker_up',
+    'Воркер бота (run_bot --workers) запущен: 1/0',
+    ['worker'],
+)
+BOT_WORKER_RESTARTS = Counter(
+    'bot_worker_restarts_total',
+    'Перезапуски воркеров бота супервизором',
+    ['worker'],
+)
+BOT_WORKER_DISPATCHED = Counter(
+    'bot_worker_updates_total',
+    'Апдейты, переданные супервизором воркеру',
+    ['worker'],
+)
+BOT_WORKER_BACKLOG = Gauge(
+    'bot_worker_backlog',
+    'Апдейты, ещё не обработанные воркером (очередь супервизора + очередь воркера)',
+    ['worker'],
+)
+
+
+def record_cache(cache, hit):
+    """Попадание или промах кэша приложения: cache — имя кэша в метке"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, addr='127.0.0.1'):
+    """Поднимает HTTP-листенер /metrics в фоновом потоке (для процесса бота)"""
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,39 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import HTTP_REQUEST_DURATION
+
+
+class MetricsMiddleware:
+    """Замеряет время обработки запроса по имени представления"""
+    # Под ASGI не переключает запрос в поток: async-представления остаются в цикле событий
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    @staticmethod
+    def observe(request, response, start):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(
+            view, request.method, f'{response.status_code // 100}xx'
+        ).observe(time.perf_counter() - start)
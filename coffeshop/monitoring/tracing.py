@@ -0,0 +1,198 @@
+"""
+Лёгкая span-трассировка одного взаимодействия (Update бота).
+
+Трасса начинается в обёртке обработчика, дочерние спаны создают обёртка
+SQL-запросов, запросы к Bot API и функции, помеченные @traced.
+Текущий спан хранится в contextvars, поэтому переживает sync_to_async.
+Готовые трассы попадают в кольцевой буфер процесса (его читает
+manage.py traces --live через сокет управления бота) и, если задан
+settings.TRACE_FILE, дописываются строкой в JSONL-файл фоновым потоком.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('trace_span', default=None)
+
+# Последние завершённые трассы процесса
+BUFFER = deque(maxlen=getattr(settings, 'TRACE_BUFFER_SIZE', 500))
+
+# Очередь записи в TRACE_FILE; при переполнении (диск не успевает) трассы теряются
+WRITE_QUEUE_SIZE = 10000
+
+
+def recent(limit=None):
+    """Последние завершённые трассы процесса, новые — в конце"""
+    records = list(BUFFER.copy())  # copy() атомарна: буфер пополняется из других потоков
+    return records[-limit:] if limit else records
+
+
+class Span:
+    __slots__ = ('trace', 'id', 'parent', 'name', 'attrs', 'start', 'duration')
+
+    def __init__(self, trace, parent, name, attrs):
+        self.trace = trace
+        self.id = len(trace.spans)
+        self.parent = parent
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = None
+        trace.spans.append(self)
+
+
+class Trace:
+    __slots__ = ('id', 'name', 'started_at', 'spans')
+
+    def __init__(self, name):
+        self.id = os.urandom(8).hex()
+        self.name = name
+        self.started_at = time.time()
+        self.spans = []
+
+    def as_dict(self):
+        root = self.spans[0]
+        return {
+            'trace_id': self.id,
+            'name': self.name,
+            'start': self.started_at,
+            'duration_ms': round(root.duration * 1000, 3),
+            'spans': [
+                {
+                    'id': s.id,
+                    'parent': s.parent,
+                    'name': s.name,
+                    'offset_ms': round((s.start - root.start) * 1000, 3),
+                    'duration_ms': round((s.duration or 0) * 1000, 3),
+                    'attrs': s.attrs,
+                }
+                for s in self.spans
+            ],
+        }
+
+
+class _TraceWriter:
+    """Дописывает трассы в JSONL из фонового потока: обработчики не ждут диска"""
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+
+    def put(self, path, record):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+        try:
+            self._queue.put_nowait((path, record))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            self.flush(self._queue.get())
+
+    def flush(self, first=None):
+        """Пишет всё, что накопилось в очереди, одним открытием файла на путь"""
+        batch = [first] if first else []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        lines = {}
+        for path, record in batch:
+            lines.setdefault(path, []).append(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        with self._lock:
+            for path, chunk in lines.items():
+                try:
+                    with open(path, 'a', encoding='utf-8') as f:
+                        f.writelines(chunk)
+                except OSError as e:
+                    logger.warning(f"Не удалось записать {len(chunk)} трасс в {path}: {e}")
+            if self.dropped:
+                logger.warning(f"Очередь записи трасс переполнена, потеряно трасс: {self.dropped}")
+                self.dropped = 0
+
+
+_writer = _TraceWriter(WRITE_QUEUE_SIZE)
+
+
+def _finish(trace):
+    record = trace.as_dict()
+    BUFFER.append(record)
+    if settings.TRACE_FILE:
+        _writer.put(settings.TRACE_FILE, record)
+
+
+@contextmanager
+def start_trace(name, **attrs):
+    """Корневой спан; с вероятностью TRACE_SAMPLE_RATE трасса записывается"""
+    rate = settings.TRACE_SAMPLE_RATE
+    if _current.get() is not None or rate <= 0 or random.random() >= rate:
+        yield None
+        return
+    trace = Trace(name)
+    root = Span(trace, None, name, attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    finally:
+        root.duration = time.perf_counter() - root.start
+        _current.reset(token)
+        _finish(trace)
+
+
+@contextmanager
+def _child(parent, name, attrs):
+    span = Span(parent.trace, parent.id, name, attrs)
+    token = _current.set(span)
+    try:
+        yield span
+    finally:
+        span.duration = time.perf_counter() - span.start
+        _current.reset(token)
+
+
+def span(name, **attrs):
+    """Дочерний спан текущей трассы (или пустой контекст, если трассы нет)"""
+    parent = _current.get()
+    if parent is None:
+        return nullcontext()
+    return _child(parent, name, attrs)
+
+
+def traced(func):
+    """Декоратор: выполнение функции (sync или async) как отдельный спан"""
+    name = func.__name__
+
+    if iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
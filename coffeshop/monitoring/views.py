@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .metrics import CONTENT_TYPE, REGISTRY
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus"""
+    token = settings.METRICS_TOKEN
+    if token:
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not constant_time_compare(provided, token):
+            return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,119 @@
+"""
+Публичное меню для агрегаторов доставки и экранов в зале: GET /api/v1/menu/.
+
+Тело сериализуется один раз на версию меню (bot.menu) и хранится в памяти
+процесса готовыми байтами вместе с gzip-копией. Обычный опрос — это чтение
+версии из кэша и сравнение ETag (304) либо отдача готовых байт: без БД
+и без сериализации.
+"""
+import gzip
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseNotModified
+from django.views.decorators.http import require_safe
+
+from bot.menu import get_menu_version
+from bot.models import Category, MenuItem
+from config.http import accepted_encodings, etag_matches
+from monitoring.metrics import record_cache
+
+CONTENT_TYPE = 'application/json; charset=utf-8'
+
+
+class MenuSnapshot:
+    """Сериализованное меню одной версии: байты, gzip-копия и их ETag"""
+    __slots__ = ('version', 'body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        # Сильные ETag, у каждого представления свой
+        self.etag = f'"menu-{version}-{digest}"'
+        self.gzip_etag = f'"menu-{version}-{digest}-gz"'
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _absolute(url):
+    # Без запроса под рукой: тело одно для всех клиентов
+    return f"{settings.PUBLIC_BASE_URL.rstrip('/')}{url}" if url else None
+
+
+def serialize_menu(version):
+    categories = Category.objects.prefetch_related(
+        Prefetch('items', queryset=MenuItem.objects.filter(is_available=True).order_by('name'))
+    ).order_by('order', 'name')
+    data = {
+        'version': version,
+        'currency': 'RUB',
+        'categories': [
+            {
+                'id': category.id,
+                'slug': category.slug,
+                'name': category.name,
+                'emoji': category.emoji,
+                'items': [
+                    {
+                        'id': item.id,
+                        'name': item.name,
+                        'description': item.description,
+                        'price': item.price,
+                        # Отдельных превью нет — только оригинал; ключ images оставлен под будущие размеры
+                        'images': {'original': _absolute(item.image_url)} if item.image_url else {},
+                    }
+                    for item in category.items.all()
+                ],
+            }
+            for category in categories
+        ],
+    }
+    return json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def get_snapshot():
+    """Снимок текущей версии меню; пересобирается один раз на процесс после изменения меню"""
+    global _snapshot
+    version = get_menu_version()
+    snapshot = _snapshot
+    hit = snapshot is not None and snapshot.version == version
+    if not hit:
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = MenuSnapshot(version, serialize_menu(version))
+            snapshot = _snapshot
+    record_cache('public_menu', hit)
+    return snapshot
+
+
+@require_safe
+def menu(request):
+    """Меню для внешних систем: категории, доступные позиции, цены, картинки"""
+    snapshot = get_snapshot()
+    if 'gzip' in accepted_encodings(request.headers.get('Accept-Encoding', '')):
+        body, etag, encoding = snapshot.gzip_body, snapshot.gzip_etag, 'gzip'
+    else:
+        body, etag, encoding = snapshot.body, snapshot.etag, None
+
+    # 304 — только для того представления, которое отдали бы сейчас
+    if etag_matches(request.headers.get('If-None-Match'), (etag,)):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=CONTENT_TYPE)
+        response['Content-Length'] = str(len(body))
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.MENU_API_MAX_AGE}'
+    response['Vary'] = 'Accept-Encoding'
+    # Экраны в зале и виджеты партнёров читают меню прямо из браузера
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
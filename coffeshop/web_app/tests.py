@@ -1,3 +1,190 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from bot.fts import match_expression, search_menu
+from bot.models import Cart, CartItem, Category, Customer, MenuItem
+from bot.services import MAX_CART_CHANGES, MAX_ITEM_QUANTITY, apply_cart_changes
+
+
+class WebTestCase(TestCase):
+    """Меню и залогиненный покупатель"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Кофе')
+        cls.latte = MenuItem.objects.create(name='Латте', description='Эспрессо и молоко', price=Decimal('200.00'),
+                                            category=cls.category)
+        cls.cookie = MenuItem.objects.create(name='Печенье', description='К латте', price=Decimal('50.00'),
+                                             category=cls.category)
+        cls.user = User.objects.create_user('guest')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+
+class MatchExpressionTests(TestCase):
+    def test_terms_are_quoted_prefixes(self):
+        self.assertEqual(match_expression('Латте'), '"латте"*')
+        self.assertEqual(match_expression('  латте   с  сиропом '), '"латте"* "с"* "сиропом"*')
+
+    def test_fts_syntax_is_escaped(self):
+        cases = {
+            'латте AND чай': '"латте"* "and"* "чай"*',
+            'NEAR(латте чай)': '"near"* "латте"* "чай"*',
+            '-молоко': '"молоко"*',
+            'name:латте': '"name"* "латте"*',
+            '"латте': '"латте"*',
+            'латте*': '"латте"*',
+            '"-:*()': '',
+        }
+        for query, expression in cases.items():
+            with self.subTest(query):
+                self.assertEqual(match_expression(query), expression)
+
+    def test_yo(self):
+        self.assertEqual(match_expression('Ёжик'), '"ежик"*')
+
+    def test_word_limit(self):
+        self.assertEqual(match_expression(' '.join(f'w{n}' for n in range(20))).count('"*'), 8)
+
+
+class MenuSearchTests(WebTestCase):
+    url = reverse('web_app:menu_search')
+
+    def names(self, query):
+        return [item.name for item in search_menu(query)]
+
+    def test_prefix_and_ranking(self):
+        # Совпадение в названии выше, чем в описании
+        self.assertEqual(self.names('лат'), ['Латте', 'Печенье'])
+        self.assertEqual(self.names('латте молоко'), ['Латте'])
+
+    def test_operators_are_plain_words(self):
+        for query in ('латте AND', 'NOT латте', 'латте OR чай', '"', 'name:латте', '-'):
+            with self.subTest(query):
+                # Синтаксическая ошибка FTS5 подняла бы OperationalError
+                search_menu(query)
+        self.assertEqual(self.names('латте OR чай'), [])
+
+    def test_yo_in_menu(self):
+        MenuItem.objects.create(name='Ёжик в тумане', price=Decimal('300.00'), category=self.category)
+        self.assertEqual(self.names('ежик'), ['Ёжик в тумане'])
+        self.assertEqual(self.names('ёж'), ['Ёжик в тумане'])
+
+    def test_index_follows_menu_changes(self):
+        MenuItem.objects.filter(pk=self.latte.pk).update(name='Флэт уайт')
+        self.assertEqual(self.names('флэт'), ['Флэт уайт'])
+        self.assertEqual(self.names('латте'), ['Печенье'])
+        MenuItem.objects.filter(pk=self.cookie.pk).update(is_available=False)
+        self.assertEqual(self.names('латте'), [])
+
+    def test_view(self):
+        response = self.client.get(self.url, {'q': ' лат '})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['query'], 'лат')
+        self.assertEqual(data['results'][0], {
+            'id': self.latte.id, 'name': 'Латте', 'price': '200.00', 'category': 'Кофе', 'image': None,
+        })
+        self.assertEqual(self.client.get(self.url, {'q': '"AND'}).json()['results'], [])
+        self.assertEqual(self.client.get(self.url).json()['results'], [])
+
+
+class CartChangesTests(WebTestCase):
+    url = reverse('web_app:cart_api')
+
+    def setUp(self):
+        super().setUp()
+        self.cart = Cart.objects.create(customer=Customer.objects.create(user=self.user, name='guest'))
+
+    def quantities(self):
+        return dict(self.cart.items.values_list('item_id', 'quantity'))
+
+    def post(self, body):
+        return self.client.post(self.url, body if isinstance(body, str) else json.dumps(body),
+                                content_type='application/json')
+
+    def test_quantity_is_capped(self):
+        apply_cart_changes(self.cart, {self.latte.id: 150, self.cookie.id: 2})
+        self.assertEqual(self.quantities(), {self.latte.id: MAX_ITEM_QUANTITY, self.cookie.id: 2})
+        apply_cart_changes(self.cart, {self.latte.id: 5, self.cookie.id: 3})
+        self.assertEqual(self.quantities(), {self.latte.id: MAX_ITEM_QUANTITY, self.cookie.id: 5})
+
+    def test_line_is_removed_at_zero(self):
+        apply_cart_changes(self.cart, {self.latte.id: 2, self.cookie.id: 1})
+        apply_cart_changes(self.cart, {self.latte.id: -1, self.cookie.id: -5})
+        self.assertEqual(self.quantities(), {self.latte.id: 1})
+        # Уменьшение позиции, которой нет в корзине, ничего не делает
+        self.assertEqual(apply_cart_changes(self.cart, {self.cookie.id: -1}), [])
+        self.assertEqual(self.quantities(), {self.latte.id: 1})
+
+    def test_unavailable_items(self):
+        apply_cart_changes(self.cart, {self.cookie.id: 3})
+        MenuItem.objects.filter(pk__in=[self.latte.pk, self.cookie.pk]).update(is_available=False)
+        missing = 10 ** 6
+        unavailable = apply_cart_changes(self.cart, {self.latte.id: 1, missing: 1, self.cookie.id: -1})
+        self.assertEqual(unavailable, [self.latte.id, missing])
+        # Уже лежащую в корзине позицию можно уменьшить
+        self.assertEqual(self.quantities(), {self.cookie.id: 2})
+
+    def test_updated_at_is_touched(self):
+        old = timezone.now() - datetime.timedelta(days=10)
+        Cart.objects.filter(pk=self.cart.pk).update(updated_at=old)
+        apply_cart_changes(self.cart, {self.latte.id: MAX_ITEM_QUANTITY})
+        self.cart.refresh_from_db()
+        self.assertGreater(self.cart.updated_at, old)
+
+        Cart.objects.filter(pk=self.cart.pk).update(updated_at=old)
+        # Упёрлись в лимит — корзина не изменилась
+        apply_cart_changes(self.cart, {self.latte.id: 1})
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.updated_at, old)
+
+    def test_api(self):
+        response = self.post({'changes': [
+            {'item': self.latte.id, 'delta': 1},
+            {'item': str(self.latte.id), 'delta': 2},
+            {'item': self.cookie.id, 'delta': 1},
+            {'item': self.cookie.id, 'delta': -1},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([(line['id'], line['quantity']) for line in data['items']], [(self.latte.id, 3)])
+        self.assertEqual((data['count'], data['total'], data['unavailable']), (3, '600.00', []))
+        self.assertEqual(self.client.get(self.url).json()['count'], 3)
+
+    def test_api_rejects_bad_input(self):
+        cases = {
+            'too many': {'changes': [{'item': self.latte.id, 'delta': 1}] * (MAX_CART_CHANGES + 1)},
+            'not json': 'changes',
+            'no changes': {},
+            'not a list': {'changes': 5},
+            'no delta': {'changes': [{'item': self.latte.id}]},
+            'bad item': {'changes': [{'item': 'латте', 'delta': 1}]},
+            'bad change': {'changes': ['латте']},
+        }
+        for name, body in cases.items():
+            with self.subTest(name):
+                self.assertEqual(self.post(body).status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
 
-# Create your tests here.
+class MenuApiTests(WebTestCase):
+    def test_versioned_path(self):
+        self.client.logout()
+        url = reverse('menu_api')
+        self.assertEqual(url, '/api/v1/menu/')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        names = [item['name'] for category in response.json()['categories'] for item in category['items']]
+        self.assertEqual(names, ['Латте', 'Печенье'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/api/menu/').status_code, 404)
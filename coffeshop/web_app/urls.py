@@ -5,8 +5,10 @@ app_name = 'web_app'
 
 urlpatterns = [
     path('', views.menu_view, name='menu'),
+    path('search/', views.menu_search, name='menu_search'),
     path('add-to-cart/<int:item_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/', views.cart_view, name='cart'),
+    path('cart/api/', views.cart_api, name='cart_api'),
     path('order/', views.create_order, name='create_order'),
     path('order/success/', views.order_success, name='order_success'),
 ]
\ No newline at end of file
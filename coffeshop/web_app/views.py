@@ -1,72 +1,190 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
+from django.http import JsonResponse
+from bot.fts import search_menu
+from bot.recommendations import RECOMMENDATIONS
 from bot.models import Category, MenuItem, Cart, CartItem, Order, OrderItem, Customer
+from bot.services import (
+    MAX_CART_CHANGES, apply_cart_changes, form_request_key, new_request_token, place_order, placed_order,
+    touch_cart,
+)
 from django.contrib.auth.models import User
 
-@login_required
-def menu_view(request):
-    categories = Category.objects.prefetch_related('items').all()
-    return render(request, 'web_app/menu.html', {'categories': categories})
+# Сколько позиций показывать в подсказках поиска
+SEARCH_LIMIT = 10
 
-@login_required
-def add_to_cart(request, item_id):
-    item = get_object_or_404(MenuItem, id=item_id, is_available=True)
-    
-    # 🔑 Получаем или создаём Customer для request.user
+# Горячие представления асинхронные: под ASGI запрос не занимает поток, пока ждёт БД.
+# Шаблоны рендерятся в потоке — они лениво читают request.user и сессию
+arender = sync_to_async(render)
+
+def get_or_create_customer(user):
     customer, _ = Customer.objects.get_or_create(
-        user=request.user,
-        defaults={'name': request.user.get_full_name() or request.user.username}
+        user=user,
+        defaults={'name': user.get_full_name() or user.username}
     )
-    
-    cart, _ = Cart.objects.get_or_create(customer=customer)  # ← customer, не user!
-    cart_item, created = CartItem.objects.get_or_create(cart=cart, item=item)
+    return customer
+
+async def get_customer(request):
+    return await sync_to_async(get_or_create_customer)(await request.auser())
+
+@sync_to_async
+def get_or_create_cart(user):
+    # Клиент и корзина — за один переход в поток БД, а не за два
+    cart, _ = Cart.objects.get_or_create(customer=get_or_create_customer(user))
+    return cart
+
+async def get_cart(request):
+    return await get_or_create_cart(await request.auser())
+
+@login_required
+async def menu_view(request):
+    query = request.GET.get('q', '').strip()
+    if query:
+        results = await sync_to_async(search_menu)(query, limit=50)
+        return await arender(request, 'web_app/menu.html', {'query': query, 'results': results})
+    categories = [category async for category in Category.objects.prefetch_related('items')]
+    return await arender(request, 'web_app/menu.html', {'categories': categories})
+
+@login_required
+async def menu_search(request):
+    """JSON для строки поиска: вызывается на каждое нажатие клавиши"""
+    query = request.GET.get('q', '').strip()
+    items = await sync_to_async(search_menu)(query, limit=SEARCH_LIMIT) if query else []
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': item.id,
+                'name': item.name,
+                'price': str(item.price),
+                'category': item.category.name,
+                'image': item.image.url if item.image else None,
+            }
+            for item in items
+        ],
+    })
+
+@login_required
+async def add_to_cart(request, item_id):
+    item = await aget_object_or_404(MenuItem, id=item_id, is_available=True)
+    cart = await get_cart(request)
+    cart_item, created = await CartItem.objects.aget_or_create(cart=cart, item=item)
     if not created:
         cart_item.quantity += 1
-        cart_item.save()
+        await cart_item.asave()
+    await sync_to_async(touch_cart)(pk=cart.pk)
     messages.success(request, f"{item.name} добавлен в корзину")
-    return redirect('menu')
+    return redirect('web_app:menu')
+
+def cart_summary(cart):
+    """Содержимое и итоги корзины для JSON API — одним запросом"""
+    entries = list(cart.items.select_related('item').order_by('item__name'))
+    return {
+        'items': [
+            {
+                'id': entry.item_id,
+                'name': entry.item.name,
+                'price': str(entry.item.price),
+                'quantity': entry.quantity,
+                'total': str(entry.total_price()),
+            }
+            for entry in entries
+        ],
+        'count': sum(entry.quantity for entry in entries),
+        'total': str(sum((entry.total_price() for entry in entries), Decimal('0.00'))),
+        # «Часто берут вместе» — из памяти процесса, без запросов (bot.recommendations)
+        'suggestions': [
+            {'id': item_id, 'name': name, 'price': str(price)}
+            for item_id, name, price in RECOMMENDATIONS.suggest([entry.item_id for entry in entries])
+        ] if entries else [],
+    }
+
+@login_required
+async def cart_api(request):
+    """
+    GET — текущая корзина; POST {"changes": [{"item": id, "delta": n}, ...]} —
+    пакет изменений одной транзакцией, в ответ новая корзина.
+    Меню копит нажатия и отправляет их одним запросом, без перезагрузки.
+    """
+    cart = await get_cart(request)
+    if request.method != 'POST':
+        return JsonResponse(await sync_to_async(cart_summary)(cart))
+
+    try:
+        changes = json.loads(request.body)['changes']
+        if len(changes) > MAX_CART_CHANGES:
+            return JsonResponse({'error': f'Не больше {MAX_CART_CHANGES} изменений за запрос'}, status=400)
+        deltas = {}
+        for change in changes:
+            item_id, delta = int(change['item']), int(change['delta'])
+            deltas[item_id] = deltas.get(item_id, 0) + delta
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'error': 'Некорректные изменения корзины'}, status=400)
+
+    unavailable = await sync_to_async(apply_cart_changes)(
+        cart, {item_id: delta for item_id, delta in deltas.items() if delta}
+    )
+    return JsonResponse({**await sync_to_async(cart_summary)(cart), 'unavailable': unavailable})
 
 @login_required
-def cart_view(request):
-    customer, _ = Customer.objects.get_or_create(user=request.user)
-    cart, _ = Cart.objects.get_or_create(customer=customer)
-    return render(request, 'web_app/cart.html', {'cart': cart})
+async def cart_view(request):
+    cart = await get_cart(request)
+    entries = [entry async for entry in cart.items.select_related('item').order_by('item__name')]
+    return await arender(request, 'web_app/cart.html', {
+        'cart': cart,
+        'entries': entries,
+        'total': sum((entry.total_price() for entry in entries), Decimal('0.00')),
+    })
+
+@sync_to_async
+def checkout_cart(customer, cart, order_type, address, lines, key):
+    with transaction.atomic():
+        order = place_order(customer, order_type, address, lines, channel=Order.WEB, idempotency_key=key)
+        cart.items.all().delete()
+    return order
 
 @login_required
-def create_order(request):
-    customer, _ = Customer.objects.get_or_create(user=request.user)
-    cart = get_object_or_404(Cart, customer=customer)
-    
-    if not cart.items.exists():
+async def create_order(request):
+    customer = await get_customer(request)
+
+    if request.method == 'POST':
+        user = await request.auser()
+        key = form_request_key(Order.WEB, user.pk, request.POST.get('request_token'))
+        # Повторная отправка формы (двойной клик, «обновить» после POST) — тот же заказ
+        order = await sync_to_async(placed_order)(key)
+        if order is not None:
+            messages.success(request, f"Заказ #{order.id} создан!")
+            return redirect('web_app:order_success')
+
+    cart = await aget_object_or_404(Cart, customer=customer)
+
+    if not await cart.items.aexists():
         messages.error(request, "Корзина пуста")
-        return redirect('cart')
+        return redirect('web_app:cart')
 
     if request.method == 'POST':
         order_type = request.POST.get('order_type')
-        address = request.POST.get('address') if order_type == 'delivery' else None
-
-        with transaction.atomic():
-            order = Order.objects.create(
-                customer=customer,  # ← customer, не user!
-                order_type=order_type,
-                address=address,
-                total_price=cart.total_price(),
-                status='pending'
-            )
-            for item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    item=item.item,
-                    quantity=item.quantity
-                )
-            cart.items.all().delete()
+        address = request.POST.get('address', '').strip() if order_type == Order.DELIVERY else None
+        if order_type not in dict(Order.ORDER_TYPES):
+            messages.error(request, "Выберите тип заказа")
+            return redirect('web_app:create_order')
+        if order_type == Order.DELIVERY and not address:
+            messages.error(request, "Укажите адрес доставки")
+            return redirect('web_app:create_order')
+        lines = [(cart_item.item, cart_item.quantity) async for cart_item in cart.items.select_related('item')]
+
+        order = await checkout_cart(customer, cart, order_type, address, lines, key)
         messages.success(request, f"Заказ #{order.id} создан!")
-        return redirect('shop:order_success')
+        return redirect('web_app:order_success')
 
-    return render(request, 'web_app/checkout.html', {'cart': cart})
+    return await arender(request, 'web_app/checkout.html', {'cart': cart, 'request_token': new_request_token()})
 
 @login_required
 def order_success(request):
-    return render(request, 'web_app/order_success.html')
\ No newline at end of file
+    return render(request, 'web_app/order_success.html')